@@ -0,0 +1,151 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Allocation counting harness for PiperJoystickAxis and
+# PiperCommandCenter.process()
+#
+# On the board: copy this file to CIRCUITPY next to code.py and run
+# "import allocations" from the REPL. Bytes are measured as gc.mem_free()
+# deltas with the garbage collector disabled, so any heap allocation in the
+# loop shows up.
+#
+# On the host: "python benchmarks/allocations.py" loads code.py into the
+# simulator and measures with tracemalloc, advancing the fake clock 1ms per
+# process() call so that every task runs as on the board. It reports two
+# figures, neither of which shows whether a call allocates on the board:
+#
+#   retained   bytes per call still allocated after the loop (growing lists,
+#              cached objects); temporaries freed within the call don't
+#              count
+#   peak       the most memory any single call had allocated at once,
+#              temporaries included, but CPython boxes every int above 256
+#              and every float, which on the board are small ints and
+#              immediate floats
+#
+# So the host run only catches leaks. The difference between the float and
+# fixed point axis modes, and whether a mode allocates at all, only shows in
+# the board's figures.
+#
+# Compatible with CircuitPython 5.x (no f-strings).
+#
+################################################################################
+import gc
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Keep the board run short: with the collector off a leak would exhaust the heap
+#
+ITERATIONS = 1000 if tracemalloc is None else 10000
+
+# Axis configurations: (label, lookupBits, fixedPoint)
+#
+AXIS_MODES = (
+    ("float", None, False),
+    ("table", 10, False),
+    ("fixed", None, True),
+)
+
+# Bytes per call, and on the host the largest peak of a single call
+#
+def bytesPerCall(fn, iterations=ITERATIONS):
+    fn()
+    if tracemalloc is None:
+        gc.collect()
+        gc.disable()
+        before = gc.mem_free()
+        for _ in range(iterations):
+            fn()
+        used = before - gc.mem_free()
+        gc.enable()
+        return used / iterations, None
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for _ in range(iterations):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / iterations, peak
+
+def report(label, fn):
+    used, peak = bytesPerCall(fn)
+    if peak is None:
+        print("  %-29s %8.1f" % (label, used))
+    else:
+        print("  %-29s %8.1f %8d" % (label, used, peak))
+
+# A pass of the main loop. On the host the fake clock is stepped, so that
+# the tasks come due; on the board real time passes.
+#
+def loopPass(pcc):
+    if tracemalloc is None:
+        return pcc.process
+    from simulator import clock, hardware
+    def process():
+        clock.advance_ns(1000000)
+        hardware.apply_script()
+        pcc.process()
+    return process
+
+def loadCode():
+    if tracemalloc is None:
+        import code
+        return code
+    import os
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import simulator
+    from simulator import hardware
+    # Wired joystick, pushed right and slightly up
+    hardware.set_analog(simulator.board.A4, 60000)
+    hardware.set_analog(simulator.board.A3, 30000)
+    return simulator.load("code.py")
+
+def main():
+    cc = loadCode()
+    pcc = cc.PiperCommandCenter()
+    process = loopPass(pcc)
+    if tracemalloc is None:
+        print("bytes per call (gc.mem_free)")
+    else:
+        print("host bytes (tracemalloc, leaks only: see the notes at the top)")
+        print("  %-29s %8s %8s" % ("", "retained", "peak"))
+    for label, lookupBits, fixedPoint in AXIS_MODES:
+        for axis in (pcc.x_axis, pcc.y_axis):
+            axis.lookupBits = lookupBits
+            axis.fixedPoint = fixedPoint
+        report("%-6s readJoystickAxis" % label, pcc.x_axis.readJoystickAxis)
+        pcc.state = cc._JOYSTICK
+        report("%-6s process() _JOYSTICK" % label, process)
+        # The joystick is pushed, so the wiring detector keeps it unwired
+        pcc.state = cc._UNWIRED
+        report("%-6s process() _UNWIRED" % label, process)
+
+main()
@@ -0,0 +1,152 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator comparison of the two ways of running PiperCommandCenter's
+# tasks: calling process() in a loop, and PiperAsyncRuntime's asyncio tasks.
+#
+# demos/gamecontroller.py runs unwired, in mouse (_JOYSTICK) mode and in
+# Minecraft mode with the joystick pushed and the DPAD pressed in chords
+# (unwired, the joystick inputs float instead). Work takes
+# simulated time: the host time of each process() call or task step times
+# --cpu-scale (about how much slower the board's interpreter is). For each
+# way it reports:
+#
+#   late p50/p99/max us   how long after its deadline the input task ran
+#   missed                input task deadlines skipped
+#   idle %                time the CPU could sleep; the process() loop
+#                         never does, even with no task due
+#   reports               HID reports sent
+#   led                   status LED writes
+#   deferred              LED frames put off because the input task was due
+#
+# The late times change a little from run to run with the host's load. The
+# check fails if the asyncio runtime doesn't write the LED, writes it less
+# than half as often as the process() loop, or puts off a frame more than
+# once. Unwired, the wiring detector's bursts keep the input task due
+# almost all the time under asyncio, so there every other LED run is put off.
+#
+#   python benchmarks/async_runtime.py [--seconds S] [--cpu-scale N]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+DPAD = [board.D1, board.D0, board.D3, board.D4]
+
+def script(seconds, wired=True):
+    if not wired:
+        hardware.set_analog(board.A4, floating(1))
+        hardware.set_analog(board.A3, floating(2))
+        return
+    hardware.set_analog(board.A4, 60000)
+    t = 0.0
+    n = 0
+    while t < seconds:
+        hardware.at(t, hardware.press, DPAD[n % len(DPAD)])
+        hardware.at(t + 0.05, hardware.unpress, DPAD[n % len(DPAD)])
+        t += 0.2
+        n += 1
+
+def floating(seed):
+    state = [seed]
+    def read():
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return state[0] >> 15
+    return read
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# Record how late the input task starts against its deadline
+#
+def watchInputTask(pcc):
+    task = pcc.inputTask
+    function = task.function
+    late = []
+    def timed():
+        late.append(clock.monotonic_ns() - task.due * 1000000)
+        function()
+    task.function = timed
+    return late
+
+def spin(pcc, seconds):
+    end = clock.monotonic_ns() + int(seconds * 1000000000)
+    while clock.monotonic_ns() < end:
+        hardware.apply_script()
+        start = clock.thread_time_ns()
+        pcc.process()
+        # Even a pass with nothing due takes some time
+        clock.advance_ns(max(1000, int((clock.thread_time_ns() - start) * clock.cpu_scale)))
+    return 0
+
+def measure(gc_module, state, useAsync, seconds):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = state
+    script(seconds, state != gc_module._UNWIRED)
+    late = watchInputTask(pcc)
+    hardware.record_hid()
+    if useAsync:
+        idle_ns, _ = simulator.run_async(gc_module.PiperAsyncRuntime(pcc.scheduler).main(), seconds)
+    else:
+        idle_ns = spin(pcc, seconds)
+    ordered = sorted(late)
+    return (percentile(ordered, 0.5) / 1000, percentile(ordered, 0.99) / 1000, ordered[-1] / 1000,
+            pcc.inputTask.missed, 100.0 * idle_ns / (seconds * 1000000000), len(hardware.hid_log),
+            pcc.led.writes, pcc.led.deferred)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0, help="simulated time per run")
+    parser.add_argument("--cpu-scale", type=float, default=20.0, help="board time per unit of host time")
+    args = parser.parse_args()
+
+    clock.cpu_scale = args.cpu_scale
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-10s %-9s %8s %8s %8s %7s %7s %8s %5s %8s" % ("mode", "runtime", "late p50", "p99 us", "max us", "missed", "idle %", "reports", "led", "deferred"))
+    failed = []
+    for label, state in (("unwired", gc_module._UNWIRED), ("mouse", gc_module._JOYSTICK), ("minecraft", gc_module._MINECRAFT)):
+        rows = {}
+        for runtime, useAsync in (("process", False), ("asyncio", True)):
+            rows[runtime] = measure(gc_module, state, useAsync, args.seconds)
+            print("%-10s %-9s %8.0f %8.0f %8.0f %7d %7.1f %8d %5d %8d" % ((label, runtime) + rows[runtime]))
+        writes, deferred = rows["asyncio"][6:]
+        if writes == 0 or 2 * writes < rows["process"][6] or deferred > writes + 1:
+            failed.append(label)
+    clock.cpu_scale = 0
+    simulator.reset()
+    if failed:
+        print("FAILED: asyncio runtime holds up the LED in %s" % ", ".join(failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Host benchmark for the PiperJoystickAxis filter stage (oversampling,
+# exponential moving average and hysteresis around deadbandCutoff).
+#
+# Reports the cost of readJoystickAxis() per call for each filter setting,
+# then replays a noisy joystick trace through demos/gamecontroller.py in
+# keyboard mode and counts the HID reports per second and the arrow key
+# presses it generates. Unfiltered, ADC noise with the stick resting near the
+# edge of the deadband makes the arrow keys chatter; the filters should cut
+# the reports without losing the deliberate pushes in the trace.
+#
+# The default input is synthetic, not recorded: the X axis rests at a series
+# of offsets around the deadband edge with roughly 200 count (16 bit)
+# Gaussian-ish noise and occasional 800 count spikes, with one full push per
+# rest. For it the benchmark also reports how many pushes made it through and
+# how long after the push started the arrow went down. A trace recorded on
+# the board (a JSON list of AnalogIn.value readings, replayed one per read)
+# can be used instead with --trace.
+#
+# The check fails if an axis with hysteresis doesn't return to 0 once the
+# stick is back at center, or if hysteresis at least as wide as the deadband
+# is accepted (such an axis would never return to 0).
+#
+#   python benchmarks/axis_filter.py [--trace FILE] [--seconds S] [--samples N]
+#
+################################################################################
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+# (label, oversample, smoothing, hysteresis)
+#
+FILTERS = [
+    ("none", 1, 0, 0.0),
+    ("oversample 4", 4, 0, 0.0),
+    ("smoothing 2", 1, 2, 0.0),
+    ("smoothing 3", 1, 3, 0.0),
+    ("hysteresis .02", 1, 0, 0.02),
+    ("smooth 2 + hyst .02", 1, 2, 0.02),
+    ("all", 4, 2, 0.02),
+]
+
+# The synthetic stick rests at each of these offsets from center (16 bit
+# counts) for SEGMENT ms, pushed to full deflection for PUSH ms in the middle
+#
+RESTS = [0, 1500, 2600, 3000, 3300, 3700, 4000, 4500, 5100, 5600]
+SEGMENT = 4000
+PUSH = 400
+
+def pushes():
+    return [(i * SEGMENT + SEGMENT // 2) * 1000000 for i in range(len(RESTS))]
+
+# Reads follow the simulated clock rather than a sample index, so that
+# oversampling sees the same stick movement, just with more noise samples
+#
+def syntheticStick():
+    state = [12345]
+    def rand():
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return state[0] >> 15
+    def read():
+        ms = (clock.monotonic_ns() // 1000000) % (SEGMENT * len(RESTS))
+        if SEGMENT // 2 <= ms % SEGMENT < SEGMENT // 2 + PUSH:
+            value = 32768 + 30000
+        else:
+            value = 32768 + RESTS[ms // SEGMENT]
+        # Sum of four uniforms, sd about 200 counts
+        value += sum(rand() % 693 for _ in range(4)) - 1386
+        if rand() % 100 == 0:
+            value += 800 if rand() & 1 else -800
+        return min(65535, max(0, value))
+    return read
+
+def costPerRead(cc, oversample, smoothing, hysteresis, source, samples):
+    axis = cc.PiperJoystickAxis(board.A4, lookupBits=10, oversample=oversample, smoothing=smoothing, hysteresis=hysteresis)
+    # Replay pre-generated samples so the source itself costs next to nothing
+    read = source()
+    hardware.set_analog(board.A4, hardware.trace([read() for _ in range(4096)]))
+    read = axis.readJoystickAxis
+    start = time.perf_counter()
+    for _ in range(samples):
+        read()
+    elapsed = time.perf_counter() - start
+    return 1000000 * elapsed / samples
+
+def keyboardReports(gc_module, oversample, smoothing, hysteresis, source, seconds):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter(oversample=oversample, smoothing=smoothing, hysteresis=hysteresis)
+    pcc.state = gc_module._KEYBOARD
+    hardware.set_analog(board.A4, source())
+    hardware.record_hid()
+    simulator.run(pcc, seconds=seconds, step=0.001)
+    # Right arrow state changes, to see how soon each push was reported
+    right = gc_module.Keycode.RIGHT_ARROW
+    changes = []
+    held = False
+    for when, device, report in hardware.hid_log:
+        if device == "KEYBOARD" and (right in report[2:]) != held:
+            held = not held
+            changes.append((when, held))
+    return len(hardware.hid_log) / seconds, changes
+
+# Pushes where the arrow was down before the push ended, and the longest
+# delay from the start of a push until it was (zero if already held)
+#
+def pushLatency(changes, seconds):
+    seen = 0
+    worst = 0
+    for start in pushes():
+        if start >= seconds * 1000000000:
+            break
+        held = False
+        down = None
+        for when, pressed in changes:
+            if when > start:
+                if pressed and when < start + PUSH * 1000000:
+                    down = when - start
+                break
+            held = pressed
+        if held:
+            down = 0
+        if down is not None:
+            seen += 1
+            worst = max(worst, down)
+    return seen, worst / 1000000
+
+# Push the stick fully and let it go, then try hysteresis as wide as the
+# deadband, both when constructing the axis and when changing either value
+#
+def hysteresisErrors(cc):
+    errors = []
+    axis = cc.PiperJoystickAxis(board.A4, deadbandCutoff=0.05, hysteresis=0.02)
+    hardware.set_analog(board.A4, 65535)
+    axis.readJoystickAxis()
+    hardware.set_analog(board.A4, 32768)
+    if axis.readJoystickAxis() != 0:
+        errors.append("not released at center")
+    for name, value in (("deadbandCutoff", 0.02), ("hysteresis", 0.1)):
+        try:
+            setattr(axis, name, value)
+            errors.append("%s=%g accepted" % (name, value))
+        except ValueError:
+            pass
+    if axis.deadbandCutoff != 0.05 or axis.hysteresis != 0.02:
+        errors.append("rejected value kept")
+    axis.deinit()
+    try:
+        axis = cc.PiperJoystickAxis(board.A4, deadbandCutoff=0.05, hysteresis=0.1)
+        axis.deinit()
+        errors.append("constructed with hysteresis=0.1, deadbandCutoff=0.05")
+    except ValueError:
+        pass
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trace", help="JSON list of recorded ADC readings to replay on the X axis")
+    parser.add_argument("--seconds", type=float, default=40.0, help="simulated time to replay the trace for")
+    parser.add_argument("--samples", type=int, default=100000, help="reads per cost measurement")
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace) as f:
+            samples = json.load(f)
+        source = lambda: hardware.trace(samples)
+    else:
+        source = syntheticStick
+
+    gc_module = simulator.load("demos/gamecontroller.py")
+    if args.trace:
+        print("%-22s %10s %12s" % ("filter", "us/read", "reports/s"))
+    else:
+        print("%-22s %10s %12s %8s %12s" % ("filter", "us/read", "reports/s", "pushes", "max push ms"))
+    for label, oversample, smoothing, hysteresis in FILTERS:
+        simulator.reset()
+        us = costPerRead(gc_module, oversample, smoothing, hysteresis, source, args.samples)
+        rate, changes = keyboardReports(gc_module, oversample, smoothing, hysteresis, source, args.seconds)
+        if args.trace:
+            print("%-22s %10.2f %12.1f" % (label, us, rate))
+        else:
+            seen, latency = pushLatency(changes, args.seconds)
+            print("%-22s %10.2f %12.1f %5d/%-2d %12.1f" % (label, us, rate, seen, len(pushes()), latency))
+    simulator.reset()
+    errors = hysteresisErrors(gc_module)
+    hardware.reset()
+    if errors:
+        print("FAILED: hysteresis: %s" % ", ".join(errors))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Host benchmark for the PiperJoystickAxis lookup table and fixed point modes.
+#
+# Checks that the default (10 bit) table and the Q13 fixed point pipeline
+# agree with the exact cubic scaled deadband to within one count over the
+# whole 16 bit ADC range, then reports samples per second for the exact
+# path, the fixed point path and each table size. Smaller tables are
+# reported for information: with steep curves (large outputScale, weight
+# near 1) 8 bits can be two counts out near full deflection. A scale too
+# large for 16 bit table entries has to build and match the exact curve at
+# each bucket's midpoint.
+#
+#   python benchmarks/axis_lookup.py [--samples N]
+#
+################################################################################
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+# (outputScale, deadbandCutoff, weight) combinations to validate
+#
+CURVES = [
+    (20.0, 0.1, 0.2),
+    (10.0, 0.05, 0.5),
+    (40.0, 0.2, 0.0),
+    (127.0, 0.1, 1.0),
+]
+
+LOOKUP_BITS = [None, 8, 10]
+DEFAULT_LOOKUP_BITS = 10
+
+def max_error(axis, exact):
+    worst = 0
+    for value in range(65536):
+        hardware.set_analog(board.A4, value)
+        worst = max(worst, abs(axis.readJoystickAxis() - exact._scaleAxis(value)))
+    return worst
+
+def samples_per_second(axis, samples):
+    # Sweep the ADC range so the table is not always hit in the same place
+    #
+    trace = [(i * 2654435761) & 0xFFFF for i in range(1024)]
+    position = [0]
+    def replay():
+        position[0] = (position[0] + 1) & 1023
+        return trace[position[0]]
+    hardware.set_analog(board.A4, replay)
+    read = axis.readJoystickAxis
+    start = time.perf_counter()
+    for _ in range(samples):
+        read()
+    return samples / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=200000)
+    args = parser.parse_args()
+
+    cc = simulator.load("piper_axis.py")
+    failed = False
+
+    print("Max error against the exact curve (counts):")
+    for curve in CURVES:
+        outputScale, deadbandCutoff, weight = curve
+        exact = cc.PiperJoystickAxis(board.A4, outputScale, deadbandCutoff, weight)
+        exact.deinit()
+        for bits in LOOKUP_BITS[1:]:
+            axis = cc.PiperJoystickAxis(board.A4, outputScale, deadbandCutoff, weight, lookupBits=bits)
+            error = max_error(axis, exact)
+            axis.deinit()
+            if bits == DEFAULT_LOOKUP_BITS:
+                failed = failed or error > 1
+            print("  scale=%-6g deadband=%-5g weight=%-4g lookupBits=%-3d %d" % (outputScale, deadbandCutoff, weight, bits, error))
+        axis = cc.PiperJoystickAxis(board.A4, outputScale, deadbandCutoff, weight, fixedPoint=True)
+        error = max_error(axis, exact)
+        axis.deinit()
+        failed = failed or error > 1
+        print("  scale=%-6g deadband=%-5g weight=%-4g fixedPoint     %d" % (outputScale, deadbandCutoff, weight, error))
+
+    # Changing a parameter has to rebuild the table
+    #
+    axis = cc.PiperJoystickAxis(board.A4, lookupBits=DEFAULT_LOOKUP_BITS)
+    axis.outputScale = 5.0
+    exact = cc.PiperJoystickAxis(board.A5, outputScale=5.0)
+    error = max_error(axis, exact)
+    axis.deinit()
+    exact.deinit()
+    failed = failed or error > 1
+    print("  after outputScale change                           %d" % error)
+
+    # A curve beyond 16 bit table entries has to build (wider entries) and
+    # read the exact curve at each bucket's midpoint
+    #
+    axis = cc.PiperJoystickAxis(board.A4, outputScale=40000, lookupBits=DEFAULT_LOOKUP_BITS)
+    shift = 16 - DEFAULT_LOOKUP_BITS
+    error = 0
+    for i in range(1 << DEFAULT_LOOKUP_BITS):
+        value = (i << shift) + (1 << (shift - 1))
+        hardware.set_analog(board.A4, value)
+        error = max(error, abs(axis.readJoystickAxis() - axis._scaleAxis(value)))
+    axis.deinit()
+    failed = failed or error > 0
+    print("  scale=40000 at bucket midpoints                    %d" % error)
+
+    print("Samples per second:")
+    for bits in LOOKUP_BITS:
+        axis = cc.PiperJoystickAxis(board.A4, lookupBits=bits)
+        rate = samples_per_second(axis, args.samples)
+        axis.deinit()
+        print("  lookupBits=%-5s %10.0f" % (bits, rate))
+    axis = cc.PiperJoystickAxis(board.A4, fixedPoint=True)
+    rate = samples_per_second(axis, args.samples)
+    axis.deinit()
+    print("  fixedPoint       %10.0f" % rate)
+
+    hardware.reset()
+    if failed:
+        print("FAIL: lookup table or fixed point differs from the exact curve by more than one count")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Host benchmark for PiperButtons, the bitmask debouncer shared by all the
+# Command Center buttons, and PiperKeypadButtons (keypad.Keys scanning in the
+# background) against one adafruit_debouncer.Debouncer per pin.
+#
+# Eight buttons are pressed and released at random with a burst of contact
+# bounce on every transition. Every debouncer has to report exactly one
+# press and one release per real press, with no edges from the bounce. Then
+# it reports Python calls and microseconds per update (the whole set of eight
+# pins), and how long after a button starts to change each edge is reported.
+#
+#   python benchmarks/debounce.py [--updates N] [--step SECONDS]
+#
+################################################################################
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+from adafruit_debouncer import Debouncer
+from digitalio import DigitalInOut, Pull
+from piper_inputs import PiperButtons, PiperKeypadButtons
+
+board = simulator.board
+
+PINS = [board.D1, board.D0, board.D3, board.D4, board.D2, board.SCK, board.MOSI, board.MISO]
+
+# Contacts bounce for up to 3ms, changing every 0.3ms
+#
+BOUNCE_S = 0.003
+BOUNCE_PERIOD_S = 0.0003
+
+def noise(seed):
+    state = [seed]
+    def next_value(n):
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return (state[0] >> 8) % n
+    return next_value
+
+# Schedule presses (held 30..200ms, 30..300ms apart) on every pin, each
+# transition starting with a bounce burst. Returns the presses per pin and
+# the start times of each pin's transitions.
+#
+def scriptButtons(seconds):
+    rand = noise(7)
+    presses = []
+    starts = []
+    for pin in PINS:
+        t = 0.01 + rand(100) / 1000
+        count = 0
+        starts.append([])
+        while t < seconds - 0.5:
+            for action in (hardware.press, hardware.unpress):
+                other = hardware.unpress if action is hardware.press else hardware.press
+                bounce = 0.0
+                while bounce < BOUNCE_S:
+                    hardware.at(t + bounce, action, pin)
+                    hardware.at(t + bounce + BOUNCE_PERIOD_S / 2, other, pin)
+                    bounce += BOUNCE_PERIOD_S
+                hardware.at(t + bounce, action, pin)
+                starts[-1].append(t)
+                t += bounce + (30 + rand(170)) / 1000
+            count += 1
+            t += (30 + rand(270)) / 1000
+        presses.append(count)
+    return presses, starts
+
+def run(kind, seconds, step):
+    simulator.reset()
+    if kind == "Debouncer":
+        pins = []
+        for pin in PINS:
+            io = DigitalInOut(pin)
+            io.switch_to_input(pull=Pull.UP)
+            pins.append(io)
+        debouncers = [Debouncer(io) for io in pins]
+        def update():
+            for debouncer in debouncers:
+                debouncer.update()
+        def edges():
+            return [(n, debouncer.fell) for n, debouncer in enumerate(debouncers) if debouncer.fell or debouncer.rose]
+        def deinit():
+            for io in pins:
+                io.deinit()
+    else:
+        buttons = PiperButtons() if kind == "PiperButtons" else PiperKeypadButtons()
+        for n, pin in enumerate(PINS):
+            buttons.add(n, pin)
+        update = buttons.update
+        def edges():
+            changed = buttons.changed
+            return [(n, buttons.state & (1 << n) != 0) for n in range(len(PINS)) if changed & (1 << n)]
+        deinit = buttons.deinit
+
+    presses, starts = scriptButtons(seconds)
+    pressed = [0] * len(PINS)
+    released = [0] * len(PINS)
+    delays = []
+    calls = [0]
+    def profiler(frame, event, arg):
+        if event == "call":
+            calls[0] += 1
+    step_ns = int(step * 1000000000)
+    updates = 0
+    elapsed = 0
+    started = [0] * len(PINS)
+    while clock.monotonic() < seconds:
+        hardware.apply_script()
+        # Count calls on every 10th update, time the others
+        if updates % 10 == 0:
+            sys.setprofile(profiler)
+            update()
+            sys.setprofile(None)
+        else:
+            start = time.perf_counter_ns()
+            update()
+            elapsed += time.perf_counter_ns() - start
+        updates += 1
+        for n, down in edges():
+            if down:
+                pressed[n] += 1
+            else:
+                released[n] += 1
+            while started[n] < len(starts[n]) - 1 and starts[n][started[n] + 1] <= clock.monotonic():
+                started[n] += 1
+            delays.append(clock.monotonic() - starts[n][started[n]])
+        clock.advance_ns(step_ns)
+    deinit()
+    ok = pressed == presses and released == presses
+    return {
+        "ok": ok,
+        "edges": sum(pressed) + sum(released),
+        "expected": 2 * sum(presses),
+        "calls": calls[0] / ((updates + 9) // 10),
+        "us": elapsed / (updates - (updates + 9) // 10) / 1000,
+        "delay_ms": 1000 * sum(delays) / max(1, len(delays)),
+        "max_delay_ms": 1000 * max(delays) if delays else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=30.0, help="simulated time to run for")
+    parser.add_argument("--step", type=float, default=0.0005, help="simulated seconds per update")
+    args = parser.parse_args()
+
+    failed = False
+    print("%-13s %8s %8s %8s %8s %10s %10s" % ("debouncer", "edges", "expected", "calls", "us", "delay ms", "max ms"))
+    for kind in ("Debouncer", "PiperButtons", "PiperKeypad"):
+        result = run(kind, args.seconds, args.step)
+        failed = failed or not result["ok"]
+        print("%-13s %8d %8d %8.1f %8.2f %10.2f %10.2f" % (kind, result["edges"], result["expected"], result["calls"],
+                                                           result["us"], result["delay_ms"], result["max_delay_ms"]))
+    hardware.reset()
+    if failed:
+        print("FAIL: a debouncer missed a press or reported bounce as an edge")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator comparison of USB traffic in keyboard, Minecraft and gamepad
+# mode.
+#
+# demos/gamecontroller.py is run with the gamepad enabled as boot.py would
+# (piper_usb.enableDevices()) while the DPAD and Minecraft buttons are
+# pressed in overlapping chords, first with the joystick held to one side,
+# then with it sweeping back and forth across its range. For each mode it
+# reports the HID reports and bytes sent per second of simulated time, over
+# all devices, and how many distinct X positions the host saw: at most 3
+# with the keyboard arrows (left, none, right), while in Minecraft mode the
+# joystick moves the mouse pointer instead.
+#
+#   python benchmarks/gamepad_reports.py [--seconds S]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+STATES = ["_KEYBOARD", "_MINECRAFT", "_GAMEPAD"]
+BUTTONS = [board.D1, board.D0, board.D3, board.D4, board.SCK, board.MOSI]
+
+# Triangle wave across the whole ADC range, one sweep per second
+#
+def sweep(seconds):
+    t = 0.0
+    while t < seconds:
+        phase = int(t * 1000) % 1000
+        value = phase * 131 if phase < 500 else (1000 - phase) * 131
+        hardware.at(t, hardware.set_analog, board.A4, min(65535, value))
+        hardware.at(t, hardware.set_analog, board.A3, 65535 - min(65535, value))
+        t += 0.01
+
+def chords(seconds):
+    t = 0.0
+    n = 0
+    while t < seconds:
+        first = BUTTONS[n % len(BUTTONS)]
+        second = BUTTONS[(n + 2) % len(BUTTONS)]
+        hardware.at(t, hardware.press, first)
+        hardware.at(t + 0.02, hardware.press, second)
+        hardware.at(t + 0.06, hardware.unpress, first)
+        hardware.at(t + 0.08, hardware.unpress, second)
+        t += 0.1
+        n += 1
+
+def traffic(gc_module, piper_usb, state, seconds, sweeping):
+    simulator.reset()
+    piper_usb.enableDevices()
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = getattr(gc_module, state)
+    if sweeping:
+        sweep(seconds)
+    else:
+        hardware.set_analog(board.A4, 60000)
+    chords(seconds)
+    hardware.record_hid()
+    simulator.run(pcc, seconds=seconds, step=0.001)
+    reports = len(hardware.hid_log)
+    sent = sum(len(report) for _, _, report in hardware.hid_log)
+    if state == "_GAMEPAD":
+        positions = len(set(report[2] | report[3] << 8 for _, device, report in hardware.hid_log if device == "GAMEPAD"))
+    elif state == "_KEYBOARD":
+        positions = 3 if sweeping else 1
+    else:
+        positions = 0
+    return reports / seconds, sent / seconds, positions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0, help="simulated time per mode")
+    args = parser.parse_args()
+
+    gc_module = simulator.load("demos/gamecontroller.py")
+    import piper_usb
+    for label, sweeping in (("buttons, joystick held", False), ("buttons, joystick sweeping", True)):
+        print(label)
+        print("  %-12s %10s %10s %10s" % ("mode", "reports/s", "bytes/s", "x values"))
+        for state in STATES:
+            reports, sent, positions = traffic(gc_module, piper_usb, state, args.seconds, sweeping)
+            print("  %-12s %10.1f %10.1f %10d" % (state, reports, sent, positions))
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check of the HID queue under host back-pressure.
+#
+# demos/gamecontroller.py runs in Minecraft mode with the joystick pushed
+# and the DPAD pressed in chords while the host polls every 8ms for a
+# second, then only every 50ms for a second, then suspends the bus for a
+# second, then polls every 8ms again. It runs with each send waiting for the
+# host (hidQueue=False) and with PiperHIDQueue, and reports:
+#
+#   blocked ms   time process() spent inside usb_hid send_report()
+#   longest ms   the longest single process() call
+#   missed       input task deadlines skipped (debouncing, mode timers)
+#   errors       OSErrors that reached the main loop (on the board these
+#                end in supervisor.reload())
+#   sent, coalesced, dropped, waited   the queue's counters (waited: sends
+#                that still blocked, until the queue picked up the host's
+#                slower polling)
+#   final ok     the last keyboard and mouse reports match the buttons once
+#                they are all released
+#
+#   python benchmarks/hid_backpressure.py
+#
+################################################################################
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+STEP_NS = 1000000
+DPAD = [board.D1, board.D0, board.D3, board.D4]
+
+def script():
+    hardware.slow_host(0.008)
+    hardware.at(1.0, hardware.slow_host, 0.05)
+    hardware.at(2.0, hardware.suspend_host, True)
+    hardware.at(3.0, hardware.suspend_host, False)
+    hardware.at(3.0, hardware.slow_host, 0.008)
+    hardware.set_analog(board.A4, 60000)
+    t = 0.0
+    n = 0
+    while t < 3.8:
+        hardware.at(t, hardware.press, DPAD[n % len(DPAD)])
+        hardware.at(t + 0.03, hardware.press, DPAD[(n + 1) % len(DPAD)])
+        hardware.at(t + 0.07, hardware.unpress, DPAD[n % len(DPAD)])
+        hardware.at(t + 0.09, hardware.unpress, DPAD[(n + 1) % len(DPAD)])
+        t += 0.1
+        n += 1
+    hardware.at(3.8, hardware.set_analog, board.A4, 32768)
+
+def backpressure(gc_module, hidQueue):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter(hidQueue=hidQueue)
+    pcc.state = gc_module._MINECRAFT
+    script()
+    hardware.record_hid()
+    end = clock.monotonic_ns() + 4 * 1000000000
+    longest = 0
+    errors = 0
+    while clock.monotonic_ns() < end:
+        hardware.apply_script()
+        start = clock.monotonic_ns()
+        try:
+            pcc.process()
+        except OSError:
+            errors += 1
+        longest = max(longest, clock.monotonic_ns() - start)
+        clock.advance_ns(STEP_NS)
+    last = {}
+    for _, device, report in hardware.hid_log:
+        last[device] = report
+    ok = last.get("KEYBOARD", bytes(8)) == bytes(8) and last.get("MOUSE", bytes(4))[0] == 0
+    queue = pcc.hidQueue
+    counters = (queue.sent, queue.coalesced, queue.dropped, queue.waited) if queue is not None else (len(hardware.hid_log), 0, 0, 0)
+    return (hardware.hid_blocked_ns // 1000000, longest // 1000000, pcc.inputTask.missed, errors) + counters + (ok,)
+
+def main():
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-6s %10s %10s %7s %7s %6s %10s %8s %7s %9s" % ("queue", "blocked ms", "longest ms", "missed", "errors", "sent", "coalesced", "dropped", "waited", "final ok"))
+    for label, hidQueue in (("off", False), ("on", True)):
+        print("%-6s %10d %10d %7d %7d %6d %10d %8d %7d %9s" % ((label,) + backpressure(gc_module, hidQueue)))
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Host microbenchmark for the button input layer of demos/gamecontroller.py:
+# polling every pressed/released predicate on each pass (how the mode
+# handlers used to read the buttons) against reading the PiperEventQueue
+# filled by update().
+#
+# For each approach it reports Python method calls per pass, which are
+# exactly repeatable and are what a pass costs on the board's interpreter,
+# and microseconds per pass. Both run with the buttons idle and with a
+# button changing every few passes, and the event queue has to report the
+# same presses and releases the predicates see.
+#
+#   python benchmarks/input_events.py [--source demos/gamecontroller.py] [--passes N]
+#
+################################################################################
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+PINS = [board.D1, board.D0, board.D3, board.D4, board.D2, board.SCK, board.MOSI, board.MISO]
+
+def predicates(pcc):
+    # Every edge predicate, as (source, edge, method)
+    result = []
+    for source, owner, name in (
+            (0, pcc.dpad, "up"), (1, pcc.dpad, "down"), (2, pcc.dpad, "left"), (3, pcc.dpad, "right"),
+            (4, pcc.joy_z, "z"), (5, pcc.minecraftbuttons, "top"), (6, pcc.minecraftbuttons, "middle"),
+            (7, pcc.minecraftbuttons, "bottom")):
+        result.append((source, 1, getattr(owner, name + "PressedEvent")))
+        result.append((source, 0, getattr(owner, name + "ReleasedEvent")))
+    return result
+
+def pollPredicates(pcc, polled, seen):
+    pcc.events.clear()
+    pcc.buttons.update()
+    for source, edge, predicate in polled:
+        if predicate():
+            seen.append((source, edge))
+
+def readEvents(pcc, polled, seen):
+    events = pcc.events
+    events.clear()
+    pcc.buttons.update()
+    for i in range(events.count):
+        event = events.event(i)
+        seen.append((event >> 1, event & 1))
+
+def buttonScript(period):
+    def script(i):
+        if period and i % period == 0:
+            pin = PINS[(i // period) % len(PINS)]
+            if pin in hardware.levels:
+                hardware.unpress(pin)
+            else:
+                hardware.press(pin)
+    return script
+
+def measure(gc_module, consume, passes, period):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    polled = predicates(pcc)
+    script = buttonScript(period)
+    seen = []
+    calls = [0]
+    def profiler(frame, event, arg):
+        if event == "call":
+            calls[0] += 1
+
+    # Count calls on one run, time a second identical one
+    for i in range(passes):
+        script(i)
+        hardware.apply_script()
+        sys.setprofile(profiler)
+        consume(pcc, polled, seen)
+        sys.setprofile(None)
+        clock.advance_ns(1000000)
+
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    polled = predicates(pcc)
+    elapsed = 0
+    for i in range(passes):
+        script(i)
+        hardware.apply_script()
+        start = time.perf_counter_ns()
+        consume(pcc, polled, [])
+        elapsed += time.perf_counter_ns() - start
+        clock.advance_ns(1000000)
+    return calls[0] / passes, elapsed / passes / 1000, seen
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="demos/gamecontroller.py", help="program defining PiperCommandCenter")
+    parser.add_argument("--passes", type=int, default=20000)
+    args = parser.parse_args()
+
+    gc_module = simulator.load(args.source)
+    failed = False
+    print("%-12s %-11s %10s %10s %8s" % ("buttons", "input", "calls", "us", "edges"))
+    for label, period in (("idle", 0), ("every 25", 25)):
+        results = {}
+        for name, consume in (("predicates", pollPredicates), ("events", readEvents)):
+            calls, us, seen = measure(gc_module, consume, args.passes, period)
+            results[name] = seen
+            print("%-12s %-11s %10.1f %10.2f %8d" % (label, name, calls, us, len(seen)))
+        if sorted(results["predicates"]) != sorted(results["events"]):
+            failed = True
+
+    hardware.reset()
+    if failed:
+        print("FAIL: the event queue and the predicates saw different edges")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
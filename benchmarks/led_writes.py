@@ -0,0 +1,97 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator count of DotStar writes (SPI transfers on the board) per second.
+#
+# Runs demos/gamecontroller.py for a few seconds in each state, with the
+# joystick and buttons moving as in loop_latency.py, and reports the LED
+# writes per second of simulated time. Unwired mode animates the LED so it
+# keeps writing; the other modes only need a write when the color changes.
+# Run it on two trees to compare.
+#
+# It then runs unwired mode with the main loop going round every 1ms to
+# 20ms. The animation writes a new frame at the same rate and is at the same
+# point in its pattern afterwards however fast the loop is.
+#
+#   python benchmarks/led_writes.py [--seconds S]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+STATES = ["_UNWIRED", "_JOYSTICK", "_KEYBOARD", "_MINECRAFT"]
+DPAD = [board.D1, board.D0, board.D3, board.D4]
+
+def scriptInputs(seconds):
+    t = 0.0
+    n = 0
+    while t < seconds:
+        hardware.at(t, hardware.set_analog, board.A4, 58000 if n % 2 else 8000)
+        hardware.at(t, hardware.press, DPAD[n % len(DPAD)])
+        hardware.at(t + 0.05, hardware.unpress, DPAD[n % len(DPAD)])
+        t += 0.1
+        n += 1
+
+def ledWrites(gc_module, state, seconds):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = getattr(gc_module, state)
+    scriptInputs(seconds)
+    simulator.run(pcc, seconds=seconds, step=0.001)
+    return pcc.dotstar_led.writes / seconds
+
+def animation(gc_module, step, seconds):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    # Off center, so it stays unwired
+    hardware.set_analog(board.A4, 60000)
+    simulator.run(pcc, seconds=seconds, step=step)
+    return pcc.dotstar_led.writes / seconds, pcc.led._frame
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0, help="simulated time per state")
+    args = parser.parse_args()
+
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-12s %10s" % ("state", "writes/s"))
+    for state in STATES:
+        print("%-12s %10.1f" % (state, ledWrites(gc_module, state, args.seconds)))
+    print()
+    print("%-12s %10s %8s" % ("loop ms", "writes/s", "frame"))
+    for step in (0.001, 0.002, 0.005, 0.01, 0.02):
+        writes, frame = animation(gc_module, step, args.seconds)
+        print("%-12g %10.1f %8d" % (step * 1000, writes, frame))
+    hardware.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check that timing stays exact after days of uptime.
+#
+# The fake clock is started hours to months after power on, with monotonic()
+# rounded to CircuitPython's 30 bit floats, and demos/gamecontroller.py is
+# timed doing things that depend on the clock:
+#
+#   hold ms      joystick button held until mouse mode switches to keyboard
+#                mode (1000ms hold time)
+#   debounce ms  DPAD button pressed until its key is reported, with the
+#                polled debouncer
+#   pointer ms   the distinct intervals between mouse reports with the
+#                joystick pushed (5ms pacing)
+#   led/s        LED writes per second in the unwired state (the joystick
+#                inputs floating), where the LED ramps up every 2 seconds
+#                in 64 steps
+#
+# Every row has to match the one for a freshly booted board, and the LED
+# has to be written, or the check fails. Run it on an older tree to see
+# float timing fall apart.
+#
+#   python benchmarks/long_uptime.py [--no-float30]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+DAY = 86400
+UPTIMES = [("boot", 0), ("1 hour", 3600), ("1 day", DAY), ("6.2 days", 536871), ("1 week", 7 * DAY),
+           ("49.7 days", 4294968), ("1 year", 365 * DAY)]
+STEP = 0.001
+
+def holdTime(gc_module, start_ns):
+    simulator.reset(start_ns)
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = gc_module._JOYSTICK
+    simulator.run(pcc, seconds=0.1, step=STEP)
+    hardware.press(board.D2)
+    pressed = clock.monotonic_ns()
+    while pcc.state == gc_module._JOYSTICK and clock.monotonic_ns() - pressed < 3000000000:
+        simulator.run(pcc, iterations=1, step=STEP)
+    return (clock.monotonic_ns() - pressed) // 1000000
+
+def debounceDelay(gc_module, start_ns):
+    simulator.reset(start_ns)
+    pcc = gc_module.PiperCommandCenter(backgroundScan=False)
+    pcc.state = gc_module._KEYBOARD
+    simulator.run(pcc, seconds=0.1, step=STEP)
+    hardware.record_hid()
+    hardware.press(board.D1)
+    pressed = clock.monotonic_ns()
+    while not hardware.hid_log and clock.monotonic_ns() - pressed < 1000000000:
+        simulator.run(pcc, iterations=1, step=STEP)
+    return (clock.monotonic_ns() - pressed) // 1000000
+
+def pointerIntervals(gc_module, start_ns):
+    simulator.reset(start_ns)
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = gc_module._JOYSTICK
+    hardware.set_analog(board.A4, 65535)
+    simulator.run(pcc, seconds=0.1, step=STEP)
+    hardware.record_hid()
+    simulator.run(pcc, seconds=1.0, step=STEP)
+    times = [when for when, device, _ in hardware.hid_log if device == "MOUSE"]
+    return sorted(set((b - a) // 1000000 for a, b in zip(times, times[1:])))
+
+# Unwired joystick: the inputs read anywhere in the range
+#
+def floating(seed):
+    state = [seed]
+    def read():
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return state[0] >> 15
+    return read
+
+def ledRate(gc_module, start_ns):
+    simulator.reset(start_ns)
+    pcc = gc_module.PiperCommandCenter()
+    hardware.set_analog(board.A4, floating(1))
+    hardware.set_analog(board.A3, floating(2))
+    simulator.run(pcc, seconds=0.1, step=STEP)
+    writes = pcc.dotstar_led.writes
+    simulator.run(pcc, seconds=1.0, step=STEP)
+    if pcc.state != gc_module._UNWIRED:
+        return 0
+    return pcc.dotstar_led.writes - writes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-float30", action="store_true", help="keep monotonic() at host float precision")
+    args = parser.parse_args()
+
+    clock.circuitpython_floats = not args.no_float30
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-10s %8s %12s %12s %6s" % ("uptime", "hold ms", "debounce ms", "pointer ms", "led/s"))
+    expected = None
+    failed = False
+    for label, seconds in UPTIMES:
+        start_ns = seconds * 1000000000
+        row = (holdTime(gc_module, start_ns), debounceDelay(gc_module, start_ns), pointerIntervals(gc_module, start_ns), ledRate(gc_module, start_ns))
+        if expected is None:
+            expected = row
+        mark = "" if row == expected else "  <-- differs from boot"
+        if row[3] == 0:
+            mark += "  <-- LED not written"
+        failed = failed or row != expected or row[3] == 0
+        print("%-10s %8d %12d %12s %6d%s" % (label, row[0], row[1], ",".join(str(i) for i in row[2]), row[3], mark))
+    clock.circuitpython_floats = False
+    hardware.reset()
+    if failed:
+        print("FAILED: timing depends on uptime or the LED is not written")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Loop latency benchmark for PiperCommandCenter.process()
+#
+# Forces the command center into each state, drives it with an input trace
+# and records how long every process() call takes. Reports p50/p99/max
+# latency, iterations per second, HID reports per second and, for programs
+# with a scheduler, missed task deadlines per state (plus, on the host,
+# Python calls and bytecodes per iteration), and writes the numbers as JSON
+# so runs can be compared (e.g. between the firmware images in firmware/ or
+# before/after a change).
+#
+# *** On the host (simulator, scripted input traces):
+#
+#   python benchmarks/loop_latency.py --output after.json
+#   python benchmarks/loop_latency.py --source before.py --output before.json
+#   python benchmarks/loop_latency.py --compare before.json after.json
+#
+# By default this measures the _UNWIRED, _JOYSTICK, _KEYBOARD and _MINECRAFT
+# states of demos/gamecontroller.py plus the _USERCODE handoff of code.py.
+# The fake clock advances --step seconds per iteration, so reports per second
+# are in simulated time while latency and iterations per second are real.
+#
+# *** On the board:
+#
+# Copy this file to CIRCUITPY and run "import loop_latency" from the REPL.
+# It measures whichever program is installed as code.py with
+# time.monotonic_ns() and the live inputs (move the joystick/press buttons
+# while it runs). The _USERCODE handoff runs usercode.py so it is only
+# measured on the host. Results are written to /loop_latency.json when the
+# filesystem is writable from CircuitPython (see boot.py), and printed
+# either way.
+#
+# Compatible with CircuitPython 5.x (no f-strings).
+#
+################################################################################
+from array import array
+import json
+import os
+import sys
+import time
+
+# The simulator lives next to this directory on the host; the board has
+# neither it nor os.path
+#
+try:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import simulator
+    from simulator import board, clock, hardware
+except (AttributeError, ImportError):
+    simulator = None
+
+ITERATIONS = 2000
+STEP = 0.001
+
+# now_ns() times process() calls, clock_ns() is the clock the program sees
+#
+if simulator is None:
+    now_ns = time.monotonic_ns
+    clock_ns = time.monotonic_ns
+else:
+    now_ns = time.perf_counter_ns
+    clock_ns = clock.monotonic_ns
+
+# Counts reports on their way to the real (or simulated) usb_hid device
+#
+class CountingDevice:
+    def __init__(self, device):
+        self.device = device
+        self.usage_page = device.usage_page
+        self.usage = device.usage
+        self.reports = 0
+
+    def send_report(self, report, report_id=None):
+        self.reports += 1
+        self.device.send_report(report)
+
+def countReports(pcc):
+    counters = []
+    for hid, attr in ((pcc.keyboard, "_keyboard_device"), (pcc.mouse, "_mouse_device")):
+        device = getattr(hid, attr)
+        if not isinstance(device, CountingDevice):
+            device = CountingDevice(device)
+            setattr(hid, attr, device)
+        device.reports = 0
+        counters.append(device)
+    return counters
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(samples, elapsed_ns, clock_elapsed_ns, reports):
+    ordered = sorted(samples)
+    iterations = len(ordered)
+    return {
+        "iterations": iterations,
+        "p50_us": percentile(ordered, 0.50) / 1000,
+        "p99_us": percentile(ordered, 0.99) / 1000,
+        "max_us": ordered[-1] / 1000,
+        "mean_us": sum(ordered) / iterations / 1000,
+        "iterations_per_second": iterations * 1e9 / elapsed_ns,
+        "hid_reports": reports,
+        "reports_per_second": reports * 1e9 / clock_elapsed_ns,
+    }
+
+################################################################################
+# Run process() in the given state. script(i), when given, changes the
+# simulated inputs before iteration i (and background scanned inputs see the
+# change). On the host the fake clock is stepped after each call.
+#
+def measureState(pcc, state, iterations, step, script=None):
+    counters = countReports(pcc)
+    samples = array("L", (0 for _ in range(iterations)))
+    step_ns = int(step * 1e9)
+    pcc.state = state
+    scheduler = getattr(pcc, "scheduler", None)
+    missed = scheduler.missed if scheduler is not None else 0
+    clock_start = clock_ns()
+    elapsed = 0
+    for i in range(iterations):
+        if script is not None:
+            script(i)
+            hardware.apply_script()
+        start = now_ns()
+        pcc.process()
+        samples[i] = now_ns() - start
+        elapsed += samples[i]
+        if simulator is not None:
+            clock.advance_ns(step_ns)
+    result = summarize(samples, elapsed, clock_ns() - clock_start, sum([c.reports for c in counters]))
+    if scheduler is not None:
+        result["missed_deadlines"] = scheduler.missed - missed
+    if simulator is not None:
+        result.update(countWork(pcc, script, iterations, min(iterations, 2000), step_ns))
+    return result
+
+################################################################################
+# Host only: count Python function calls and the bytecodes executed in the
+# command center's own code (not the Adafruit libraries or the simulator) per
+# process() call. Unlike wall clock time on a shared PC these are exactly
+# repeatable, and calls and bytecodes are what an iteration costs on the
+# board's interpreter.
+#
+def countWork(pcc, script, first, iterations, step_ns):
+    counts = [0, 0]
+    excluded = (os.path.dirname(os.__file__), os.path.join(simulator.ROOT, "simulator"), os.path.join(simulator.ROOT, "benchmarks"))
+    def tracer(frame, event, arg):
+        if event == "call":
+            counts[0] += 1
+            if frame.f_code.co_filename.startswith(excluded):
+                return None
+            frame.f_trace_opcodes = True
+            frame.f_trace_lines = False
+        elif event == "opcode":
+            counts[1] += 1
+        return tracer
+    for i in range(first, first + iterations):
+        if script is not None:
+            script(i)
+            hardware.apply_script()
+        sys.settrace(tracer)
+        pcc.process()
+        sys.settrace(None)
+        clock.advance_ns(step_ns)
+    return {"calls_per_iteration": counts[0] / iterations, "bytecodes_per_iteration": counts[1] / iterations}
+
+################################################################################
+# Scripted input traces for the simulator. Integer-only pseudo random numbers
+# keep runs repeatable.
+#
+def noise(seed):
+    state = [seed]
+    def next_value():
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return state[0] >> 15
+    return next_value
+
+def floatingScript():
+    # Unwired: the ADC inputs float anywhere in range
+    hardware.set_analog(board.A4, noise(1))
+    hardware.set_analog(board.A3, noise(2))
+    def script(i):
+        pass
+    return script
+
+def buttonScript(pins, period):
+    # Press each pin in turn for half of its period
+    def script(i):
+        phase = i % period
+        for n, pin in enumerate(pins):
+            if phase == n * period // len(pins):
+                hardware.press(pin)
+            elif phase == n * period // len(pins) + period // (2 * len(pins)):
+                hardware.unpress(pin)
+    return script
+
+def sweepScript(pins, period):
+    # Joystick traces a square wave through the deadband on both axes while
+    # the buttons are exercised
+    buttons = buttonScript(pins, period)
+    def script(i):
+        hardware.set_analog(board.A4, 58000 if (i // 97) % 2 else 8000)
+        hardware.set_analog(board.A3, 32768 if (i // 131) % 3 else 61000)
+        buttons(i)
+    return script
+
+def runHost(args):
+    results = {}
+    hardware.reset()
+    gc_module = simulator.load(args.source)
+    scenarios = [
+        ("_UNWIRED", floatingScript),
+        ("_JOYSTICK", lambda: sweepScript([board.D3, board.D4, board.D1], 300)),
+        ("_KEYBOARD", lambda: sweepScript([board.D1, board.D0, board.D3, board.D4], 200)),
+        ("_MINECRAFT", lambda: sweepScript([board.D1, board.D3, board.SCK, board.MOSI], 200)),
+    ]
+    for name, make_script in scenarios:
+        if not hasattr(gc_module, name):
+            continue
+        simulator.reset()
+        pcc = gc_module.PiperCommandCenter()
+        results[name] = measureState(pcc, getattr(gc_module, name), args.iterations, args.step, make_script())
+
+    if args.usercode:
+        results["_USERCODE"] = measureHandoff(args.usercode, max(1, args.iterations // 100))
+    return results
+
+################################################################################
+# The _USERCODE state releases every pin, runs usercode.py and takes the pins
+# back (or reloads if it can't), so each sample is one handoff on a fresh
+# command center (see benchmarks/usercode_handoff.py for the round trip)
+#
+def measureHandoff(source, repeats):
+    module = simulator.load(source)
+    if not hasattr(module, "_USERCODE"):
+        return None
+    samples = []
+    stdout = sys.stdout
+    for _ in range(repeats):
+        simulator.reset()
+        sys.modules.pop("usercode", None)
+        pcc = module.PiperCommandCenter()
+        pcc.state = module._USERCODE
+        sys.stdout = open(os.devnull, "w")
+        start = now_ns()
+        try:
+            pcc.process()
+        except hardware.ReloadRequested:
+            pass
+        finally:
+            samples.append(now_ns() - start)
+            sys.stdout.close()
+            sys.stdout = stdout
+    return summarize(samples, sum(samples), sum(samples), 0)
+
+def runBoard():
+    import code
+    pcc = code.PiperCommandCenter()
+    results = {}
+    for name in ("_UNWIRED", "_JOYSTICK", "_KEYBOARD", "_MINECRAFT"):
+        if hasattr(code, name):
+            print("Measuring", name)
+            results[name] = measureState(pcc, getattr(code, name), ITERATIONS, STEP)
+    return results
+
+def report(results):
+    print("%-12s %10s %10s %10s %12s %12s %8s %8s %10s" % ("state", "p50 us", "p99 us", "max us", "iter/s", "reports/s", "missed", "calls", "bytecodes"))
+    for name in sorted(results):
+        r = results[name]
+        if r is None:
+            continue
+        print("%-12s %10.1f %10.1f %10.1f %12.0f %12.1f %8d %8.1f %10.1f" % (name, r["p50_us"], r["p99_us"], r["max_us"], r["iterations_per_second"], r["reports_per_second"],
+                                                                            r.get("missed_deadlines", 0), r.get("calls_per_iteration", 0), r.get("bytecodes_per_iteration", 0)))
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print("%-12s %-10s %10s %10s %8s" % ("state", "metric", "before", "after", "change"))
+    for name in sorted(after["states"]):
+        if name not in before["states"] or after["states"][name] is None or before["states"][name] is None:
+            continue
+        for metric, label in (("p50_us", "p50 us"), ("p99_us", "p99 us"), ("max_us", "max us"), ("iterations_per_second", "iter/s"), ("reports_per_second", "reports/s"),
+                              ("missed_deadlines", "missed"), ("calls_per_iteration", "calls"), ("bytecodes_per_iteration", "bytecodes")):
+            if metric not in before["states"][name] or metric not in after["states"][name]:
+                continue
+            b = before["states"][name][metric]
+            a = after["states"][name][metric]
+            change = (a - b) / b * 100 if b else 0.0
+            print("%-12s %-10s %10.1f %10.1f %+7.1f%%" % (name, label, b, a, change))
+
+def main():
+    if simulator is None:
+        results = runBoard()
+        output = {"platform": sys.platform, "firmware": os.uname().version, "step": STEP, "states": results}
+        report(results)
+        try:
+            with open("/loop_latency.json", "w") as f:
+                json.dump(output, f)
+        except OSError:
+            pass
+        print(json.dumps(output))
+        return
+
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="demos/gamecontroller.py", help="program to measure the mode states of")
+    parser.add_argument("--usercode", default="code.py", help="program to measure the _USERCODE handoff of ('' to skip)")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--step", type=float, default=STEP, help="simulated seconds per iteration")
+    parser.add_argument("--label", default="", help="free text stored in the result file, e.g. a firmware image")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = runHost(args)
+    report(results)
+    if args.output:
+        output = {"platform": "simulator", "source": args.source, "label": args.label, "step": args.step, "states": results}
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+
+if simulator is not None:
+    if __name__ == "__main__":
+        main()
+else:
+    main()
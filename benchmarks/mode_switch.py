@@ -0,0 +1,103 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator count of the HID reports sent by mode switches.
+#
+# Each scenario holds some buttons and the joystick in one mode of
+# demos/gamecontroller.py, then performs a mode switch, and counts the
+# keyboard and mouse reports sent by the pass of the main loop that switched
+# (including the first keys of the new mode). Every report is a blocking
+# usb_hid send, so this is the stall a mode switch adds to the loop. Run it
+# on two trees to compare.
+#
+#   python benchmarks/mode_switch.py
+#
+################################################################################
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+JOY_Z = board.D2
+UP, DOWN, LEFT, RIGHT = board.D1, board.D0, board.D3, board.D4
+TOP, MIDDLE, BOTTOM = board.SCK, board.MOSI, board.MISO
+
+# (name, starting state, script as (seconds, action, pin or None))
+#
+SCENARIOS = [
+    ("keyboard -> mouse", "_KEYBOARD", [
+        (0.1, hardware.press, UP), (0.1, hardware.press, LEFT), (0.1, "joystick", None),
+        (0.2, hardware.press, JOY_Z),
+    ]),
+    ("keyboard -> minecraft", "_KEYBOARD", [
+        (0.1, hardware.press, UP), (0.1, hardware.press, RIGHT), (0.1, "joystick", None),
+        (0.2, hardware.press, BOTTOM), (0.2, hardware.press, JOY_Z),
+    ]),
+    ("minecraft -> sprinting", "_MINECRAFT", [
+        (0.1, hardware.press, TOP), (0.1, hardware.press, MIDDLE), (0.1, hardware.press, DOWN),
+        (0.2, hardware.press, BOTTOM), (0.3, hardware.press, UP), (0.4, hardware.unpress, UP),
+        (0.5, hardware.unpress, BOTTOM),
+    ]),
+    ("minecraft -> mouse", "_MINECRAFT", [
+        (0.1, hardware.press, TOP), (0.1, hardware.press, MIDDLE),
+        (0.2, hardware.press, UP), (0.2, hardware.press, DOWN), (0.2, hardware.press, LEFT), (0.2, hardware.press, RIGHT),
+        (0.3, hardware.press, JOY_Z),
+    ]),
+]
+
+def switchReports(gc_module, state, script):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = getattr(gc_module, state)
+    for seconds, action, pin in script:
+        if action == "joystick":
+            hardware.at(seconds, hardware.set_analog, board.A4, 65535)
+        else:
+            hardware.at(seconds, action, pin)
+    hardware.record_hid()
+    mode = (pcc.state, pcc.mc_mode)
+    for _ in range(3000):
+        sent = len(hardware.hid_log)
+        simulator.run(pcc, iterations=1)
+        if (pcc.state, pcc.mc_mode) != mode:
+            reports = hardware.hid_log[sent:]
+            return (sum(1 for _, device, _ in reports if device == "KEYBOARD"),
+                    sum(1 for _, device, _ in reports if device == "MOUSE"))
+    raise RuntimeError("no mode switch")
+
+def main():
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-24s %9s %7s" % ("switch", "keyboard", "mouse"))
+    for name, state, script in SCENARIOS:
+        keyboard, mouse = switchReports(gc_module, state, script)
+        print("%-24s %9d %7d" % (name, keyboard, mouse))
+    hardware.reset()
+
+if __name__ == "__main__":
+    main()
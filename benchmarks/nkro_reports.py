@@ -0,0 +1,127 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator comparison of the boot protocol keyboard (PiperKeyboard) and the
+# N-key rollover keyboard (PiperNKROKeyboard).
+#
+# First the two are driven directly with the Minecraft keys (W, A, S, D,
+# SPACE, Q, E, CONTROL, LEFT_SHIFT, F5) pressed one more per frame until all
+# are held, then released one per frame, flushing once per frame. Past the
+# sixth non-modifier key the boot report is full: adafruit_hid drops the
+# oldest key (older versions raise ValueError), so the host sees fewer keys
+# held than are pressed.
+#
+# Then demos/gamecontroller.py runs in Minecraft mode with sprinting (CONTROL
+# held) while the DPAD and joystick button are pressed in chords, with
+# minecraftNKRO off and on, and counts the keyboard reports and bytes.
+#
+#   python benchmarks/nkro_reports.py [--seconds S]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+CHORD = ["W", "A", "S", "D", "SPACE", "Q", "E", "CONTROL", "LEFT_SHIFT", "F5"]
+BUTTONS = [board.D1, board.D0, board.D3, board.D4, board.D2]
+
+# Keys held according to a report: modifier bits, then the 6 key slots of
+# the boot report or the bitmap of the NKRO one
+#
+def keysHeld(report):
+    held = bin(report[0]).count("1")
+    if len(report) == 8:
+        return held + sum(1 for key in report[2:] if key)
+    return held + sum(bin(bits).count("1") for bits in report[1:])
+
+def ramp(keyboard, keycodes):
+    hardware.record_hid()
+    for keycode in keycodes:
+        try:
+            keyboard.press(keycode)
+        except ValueError:
+            pass
+        keyboard.flush()
+    held = keysHeld(keyboard.report)
+    for keycode in keycodes:
+        keyboard.release(keycode)
+        keyboard.flush()
+    log = hardware.hid_log
+    return len(log), len(log[0][2]), sum(len(report) for _, _, report in log), held
+
+def chords(seconds):
+    t = 0.0
+    n = 0
+    while t < seconds:
+        for i in range(n % len(BUTTONS) + 1):
+            hardware.at(t + 0.01 * i, hardware.press, BUTTONS[i])
+            hardware.at(t + 0.06 + 0.005 * i, hardware.unpress, BUTTONS[i])
+        t += 0.1
+        n += 1
+
+def minecraft(gc_module, piper_usb, nkro, seconds):
+    simulator.reset()
+    piper_usb.enableDevices()
+    pcc = gc_module.PiperCommandCenter(minecraftNKRO=nkro)
+    pcc.state = gc_module._MINECRAFT
+    pcc.mc_mode = gc_module._MC_SPRINTING
+    pcc.mcKeyboard.press(gc_module.Keycode.CONTROL)
+    chords(seconds)
+    hardware.record_hid()
+    simulator.run(pcc, seconds=seconds, step=0.001)
+    log = [report for _, device, report in hardware.hid_log if device in ("KEYBOARD", "NKRO_KEYBOARD")]
+    return len(log) / seconds, sum(len(report) for report in log) / seconds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0, help="simulated time per run")
+    args = parser.parse_args()
+
+    gc_module = simulator.load("demos/gamecontroller.py")
+    import piper_hid
+    import piper_usb
+    keycodes = [getattr(gc_module.Keycode, name) for name in CHORD]
+
+    print("%d key chord, pressed and released one key per frame" % len(CHORD))
+    print("  %-10s %8s %12s %8s %8s" % ("keyboard", "reports", "report bytes", "bytes", "held"))
+    for label, cls in (("boot", piper_hid.PiperKeyboard), ("nkro", piper_hid.PiperNKROKeyboard)):
+        simulator.reset()
+        piper_usb.enableDevices()
+        print("  %-10s %8d %12d %8d %8d" % ((label,) + ramp(cls(simulator.usb_hid.devices), keycodes)))
+
+    print("Minecraft mode, sprinting, DPAD chords")
+    print("  %-10s %10s %10s" % ("keyboard", "reports/s", "bytes/s"))
+    for label, nkro in (("boot", False), ("nkro", True)):
+        print("  %-10s %10.1f %10.1f" % ((label,) + minecraft(gc_module, piper_usb, nkro, args.seconds)))
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check of pointer speed against main loop rate.
+#
+# Holds the joystick at a few X deflections in mouse mode of
+# demos/gamecontroller.py and measures the cursor speed (counts per second
+# of simulated time) and mouse reports per second with the loop running at
+# different rates, as it does when process() has more or less to do. The
+# speed for a deflection should not depend on the loop rate, and small
+# deflections just outside the deadband should still move the cursor.
+# Run it on two trees to compare.
+#
+#   python benchmarks/pointer_speed.py [--seconds S]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import hardware
+
+board = simulator.board
+
+DEFLECTIONS = [36600, 37500, 40000, 65535]
+STEPS = [0.001, 0.003, 0.007, 0.020]
+
+def pointerSpeed(gc_module, value, step, seconds):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter()
+    pcc.state = gc_module._JOYSTICK
+    hardware.set_analog(board.A4, value)
+    simulator.run(pcc, seconds=0.5, step=step)
+    hardware.record_hid()
+    simulator.run(pcc, seconds=seconds, step=step)
+    moved = 0
+    reports = 0
+    for _, device, report in hardware.hid_log:
+        if device == "MOUSE":
+            moved += report[1] - 256 if report[1] > 127 else report[1]
+            reports += 1
+    return moved / seconds, reports / seconds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0, help="simulated time per measurement")
+    args = parser.parse_args()
+
+    gc_module = simulator.load("demos/gamecontroller.py")
+    print("%-8s %8s %12s %12s" % ("X", "loop ms", "counts/s", "reports/s"))
+    for value in DEFLECTIONS:
+        for step in STEPS:
+            speed, rate = pointerSpeed(gc_module, value, step, args.seconds)
+            print("%-8d %8.0f %12.1f %12.1f" % (value, step * 1000, speed, rate))
+    hardware.reset()
+
+if __name__ == "__main__":
+    main()
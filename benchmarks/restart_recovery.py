@@ -0,0 +1,114 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator comparison of getting back to work after supervisor.reload(),
+# with and without the snapshot kept across the restart (piper_snapshot.py).
+#
+# code.py is put in joystick mode, and demos/gamecontroller.py in Minecraft
+# mode sprinting, with a wider deadband than the default. Then the program is
+# restarted, with the snapshot memory wiped for the "none" runs, and the new
+# command center runs for --seconds with the joystick centered and the DPAD
+# right button tapped every 100ms. For each it reports:
+#
+#   first report ms   simulated time from the restart to the first HID
+#                     report (a right click in joystick mode, the sprint key
+#                     in Minecraft mode)
+#   mode back ms      time until it was back in the mode it was in, with the
+#                     same Minecraft mode ("-" if never)
+#   deadband          the x axis deadbandCutoff after the restart
+#   reports           HID reports sent by type
+#
+#   python benchmarks/restart_recovery.py [--seconds S]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+STEP = 0.001
+
+def taps(seconds):
+    t = 0.0
+    while t < seconds:
+        hardware.at(t, hardware.press, board.D4)
+        hardware.at(t + 0.05, hardware.unpress, board.D4)
+        t += 0.1
+
+def session(path, state, mcMode):
+    simulator.reset()
+    cc = simulator.load(path)
+    pcc = cc.PiperCommandCenter()
+    simulator.run(pcc, seconds=0.6, step=STEP)
+    pcc.x_axis.deadbandCutoff = 0.15
+    pcc.state = getattr(cc, state)
+    if mcMode is not None:
+        pcc._setMinecraftMode(getattr(cc, mcMode))
+    simulator.run(pcc, seconds=0.2, step=STEP)
+
+def restart(path, state, mcMode, keep, seconds):
+    session(path, state, mcMode)
+    if not keep:
+        hardware.sleep_memory[:] = bytes(len(hardware.sleep_memory))
+    restarted = clock.monotonic_ns()
+    cc = simulator.restart(path)
+    pcc = cc.PiperCommandCenter()
+    hardware.record_hid()
+    taps(seconds)
+    back = None
+    end = restarted + int(seconds * 1000000000)
+    while clock.monotonic_ns() < end:
+        hardware.apply_script()
+        pcc.process()
+        if back is None and pcc.state == getattr(cc, state) and (mcMode is None or pcc.mc_mode == getattr(cc, mcMode)):
+            back = clock.monotonic_ns() - restarted
+        clock.advance(STEP)
+    log = hardware.hid_log
+    first = (log[0][0] - restarted) / 1000000 if log else None
+    counts = {}
+    for _, device, _ in log:
+        counts[device] = counts.get(device, 0) + 1
+    return first, None if back is None else back / 1000000, pcc.x_axis.deadbandCutoff, counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0, help="simulated time after the restart")
+    args = parser.parse_args()
+
+    print("%-28s %-9s %16s %13s %9s  %s" % ("program", "snapshot", "first report ms", "mode back ms", "deadband", "reports"))
+    for path, state, mcMode in (("code.py", "_JOYSTICK", None), ("demos/gamecontroller.py", "_MINECRAFT", "_MC_SPRINTING")):
+        for label, keep in (("none", False), ("kept", True)):
+            first, back, deadband, counts = restart(path, state, mcMode, keep, args.seconds)
+            print("%-28s %-9s %16s %13s %9.3f  %s" % (path, label, "-" if first is None else "%.1f" % first, "-" if back is None else "%.1f" % back,
+                deadband, " ".join("%s %d" % item for item in sorted(counts.items()))))
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check that button edges survive a stalled main loop.
+#
+# The DPAD buttons are tapped (30ms down, 30ms up, each button in turn)
+# while demos/gamecontroller.py runs in keyboard mode, and every so often a
+# pass through the loop stalls for longer than several taps, as a slow LED
+# write, HID back pressure or user code would. It counts the button events
+# the mode handlers get with the polled debouncer (PiperButtons) and with
+# background scanning (keypad.Keys, PiperKeypadButtons). Polling loses the
+# taps that start and end inside a stall; background scanning has to deliver
+# every one of them, late but in order, or the check fails.
+#
+#   python benchmarks/stalled_loop.py [--seconds S] [--stall S] [--every N]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+DPAD = [board.D1, board.D0, board.D3, board.D4]
+TAP_S = 0.030
+
+def scriptTaps(seconds):
+    taps = 0
+    t = 0.5
+    while t < seconds - 0.5:
+        pin = DPAD[taps % len(DPAD)]
+        hardware.at(t, hardware.press, pin)
+        hardware.at(t + TAP_S, hardware.unpress, pin)
+        t += 2 * TAP_S
+        taps += 1
+    return taps
+
+def run(gc_module, backgroundScan, seconds, stall, every):
+    simulator.reset()
+    pcc = gc_module.PiperCommandCenter(backgroundScan=backgroundScan)
+    pcc.state = gc_module._KEYBOARD
+    taps = scriptTaps(seconds)
+    counts = {"passes": 0, "pressed": 0, "released": 0, "late_ms": 0}
+    def process():
+        pcc.process()
+        events = pcc.events
+        for i in range(events.count):
+            if events.event(i) & 1:
+                counts["pressed"] += 1
+            else:
+                counts["released"] += 1
+            late = (clock.monotonic_ns() // 1000000 - events.time(i)) & ((1 << 29) - 1)
+            counts["late_ms"] = max(counts["late_ms"], late)
+        counts["passes"] += 1
+        if counts["passes"] % every == 0:
+            clock.advance(stall)
+    simulator.run(process, seconds=seconds, step=0.001)
+    counts["taps"] = taps
+    counts["queue_dropped"] = pcc.events.dropped
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="demos/gamecontroller.py", help="program defining PiperCommandCenter")
+    parser.add_argument("--seconds", type=float, default=20.0, help="simulated time to run for")
+    parser.add_argument("--stall", type=float, default=0.25, help="length of each stall in seconds")
+    parser.add_argument("--every", type=int, default=100, help="stall after this many passes")
+    args = parser.parse_args()
+
+    gc_module = simulator.load(args.source)
+    failed = False
+    print("%-10s %6s %8s %9s %9s %9s" % ("buttons", "taps", "pressed", "released", "dropped", "late ms"))
+    for label, backgroundScan in (("polled", False), ("keypad", True)):
+        counts = run(gc_module, backgroundScan, args.seconds, args.stall, args.every)
+        dropped = 2 * counts["taps"] - counts["pressed"] - counts["released"]
+        print("%-10s %6d %8d %9d %9d %9d" % (label, counts["taps"], counts["pressed"], counts["released"], dropped, counts["late_ms"]))
+        if backgroundScan and (dropped or counts["queue_dropped"]):
+            failed = True
+
+    hardware.reset()
+    if failed:
+        print("FAIL: background scanning dropped button edges while the loop was stalled")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check of user code running alongside code.py's joystick mode.
+#
+# The joystick is pushed and the DPAD left button tapped every 100ms while a
+# user program borrows the left button's pin (claimPin()) and counts the taps
+# itself, for --seconds. Each step of the program "works" (the fake clock is
+# advanced) for --work ms, and every 25th for --spike ms. After it ends the
+# taps go on for a second. Runs without a user program, with just the
+# regular work and with the spikes, and reports:
+#
+#   steps, overruns, worst ms   the user program's steps, those over the
+#                               2ms slice and the longest
+#   late p99 us, missed         how late the input task ran and the
+#                               deadlines it skipped
+#   mouse/s                     mouse reports per second while it ran
+#   user taps, clicks           taps the program counted, and left clicks
+#                               the command center sent, while it ran
+#   clicks after                left clicks once it had ended and the pin
+#                               was back
+#
+#   python benchmarks/user_task.py [--seconds S] [--work MS] [--spike MS]
+#
+################################################################################
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+def taps(seconds):
+    t = 0.0
+    while t < seconds:
+        hardware.at(t, hardware.press, board.D3)
+        hardware.at(t + 0.05, hardware.unpress, board.D3)
+        t += 0.1
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def userProgram(pcc, seconds, work, spike, counted):
+    from digitalio import DigitalInOut, Direction, Pull
+    pcc.claimPin(board.D3)
+    with DigitalInOut(board.D3) as left:
+        left.direction = Direction.INPUT
+        left.pull = Pull.UP
+        end = clock.monotonic_ns() + int(seconds * 1000000000)
+        step = 0
+        was = False
+        while clock.monotonic_ns() < end:
+            pressed = not left.value
+            if pressed and not was:
+                counted[0] += 1
+            was = pressed
+            step += 1
+            clock.advance(spike if step % 25 == 0 else work)
+            yield
+
+def leftClicks(start):
+    clicks = 0
+    held = False
+    for when, device, report in hardware.hid_log:
+        if device != "MOUSE" or when < start:
+            continue
+        if report[0] & 1 and not held:
+            clicks += 1
+        held = report[0] & 1 != 0
+    return clicks
+
+def run(cc, seconds, work, spike, user):
+    simulator.reset()
+    pcc = cc.PiperCommandCenter()
+    pcc.state = cc._JOYSTICK
+    hardware.set_analog(board.A4, 60000)
+    taps(seconds + 1.0)
+    hardware.record_hid()
+    task = pcc.inputTask
+    function = task.function
+    late = []
+    def timed():
+        late.append(clock.monotonic_ns() - task.due * 1000000)
+        function()
+    task.function = timed
+    counted = [0]
+    if user:
+        pcc.startUsercode(userProgram(pcc, seconds, work, spike, counted))
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        simulator.run(pcc, seconds=seconds, step=0.0002)
+        during = hardware.hid_log
+        hardware.record_hid()
+        simulator.run(pcc, seconds=1.0, step=0.0002)
+        after = leftClicks(0)
+        hardware.hid_log = during
+        clicks = leftClicks(0)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    mouse = sum(1 for _, device, _ in during if device == "MOUSE")
+    ordered = sorted(late)
+    userTask = pcc.userTask
+    return (userTask.steps, userTask.overruns, userTask.worst / 1000000, percentile(ordered, 0.99) / 1000, task.missed,
+            mouse / seconds, counted[0], clicks, after)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0, help="simulated time the user program runs")
+    parser.add_argument("--work", type=float, default=0.3, help="ms of work per step")
+    parser.add_argument("--spike", type=float, default=4.0, help="ms of work every 25th step")
+    args = parser.parse_args()
+
+    cc = simulator.load("code.py")
+    print("%-8s %6s %9s %9s %12s %7s %8s %10s %7s %12s" % ("user", "steps", "overruns", "worst ms", "late p99 us", "missed", "mouse/s", "user taps", "clicks", "clicks after"))
+    for label, user, spike in (("none", False, 0), ("steady", True, args.work), ("spikes", True, args.spike)):
+        print("%-8s %6d %9d %9.1f %12.0f %7d %8.1f %10d %7d %12d" % ((label,) + run(cc, args.seconds, args.work / 1000, spike / 1000, user)))
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator comparison of the round trip from joystick mode to usercode.py
+# and back, with code.py taking its pins back in place and with a restart.
+#
+# The user code opens every pin code.py released and returns straight away.
+# In the "reclaim" run it closes them again, so code.py takes them back and
+# carries on. In the "reload" run it leaves the DPAD left pin open, which
+# makes code.py fall back to supervisor.reload(), as every handoff used to:
+# the restart is modelled by freeing every pin and loading code.py and the
+# piper_* and Adafruit modules afresh, then running the new command center
+# until it is back in joystick mode (straight away, from the snapshot kept
+# across the restart). For each it reports:
+#
+#   host ms      host time of the handoff pass plus, for the restart, loading
+#                the modules and constructing the command center (the board's
+#                own restart, resetting the interpreter and reading the
+#                modules from flash, is not included)
+#   resume ms    simulated time from the user code returning to the command
+#                center being back in joystick mode
+#   missed       input task deadlines skipped over the round trip
+#
+#   python benchmarks/usercode_handoff.py [--repeats N]
+#
+################################################################################
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+STEP_NS = 1000000
+
+USERCODE = """import board
+from analogio import AnalogIn
+from digitalio import DigitalInOut
+
+def main():
+    with DigitalInOut(board.D1) as up, DigitalInOut(board.D0) as down, \\
+            DigitalInOut(board.D4) as right, DigitalInOut(board.D2) as joy_z, \\
+            AnalogIn(board.A3) as y, AnalogIn(board.A4) as x:
+        left = DigitalInOut(board.D3)
+        %s
+"""
+
+def writeUsercode(directory, leak):
+    with open(os.path.join(directory, "usercode.py"), "w") as f:
+        f.write(USERCODE % ("pass" if leak else "left.deinit()"))
+
+# Modules a restart loads again
+#
+def unloadModules():
+    for name in list(sys.modules):
+        if name.startswith(("piper_", "adafruit_", "usercode", "sim_code")):
+            del sys.modules[name]
+
+def roundTrip(leak):
+    simulator.reset()
+    unloadModules()
+    cc = simulator.load("code.py")
+    pcc = cc.PiperCommandCenter()
+    simulator.run(pcc, seconds=0.1)
+    pcc.state = cc._JOYSTICK
+    simulator.run(pcc, seconds=0.1)
+    missed = pcc.inputTask.missed
+
+    pcc.state = cc._USERCODE
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    start = clock.perf_counter_ns()
+    try:
+        pcc.process()
+        restarted = False
+    except hardware.ReloadRequested:
+        restarted = True
+        hardware.restart()
+        unloadModules()
+        cc = simulator.load("code.py")
+        missed -= pcc.inputTask.missed
+        pcc = cc.PiperCommandCenter()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    host_ns = clock.perf_counter_ns() - start
+    returned = clock.monotonic_ns()
+    while pcc.state != cc._JOYSTICK:
+        clock.advance_ns(STEP_NS)
+        hardware.apply_script()
+        pcc.process()
+    return restarted, host_ns, clock.monotonic_ns() - returned, pcc.inputTask.missed - missed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=20, help="round trips per way, the median is shown")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    try:
+        print("%-8s %10s %10s %10s %7s" % ("path", "restarted", "host ms", "resume ms", "missed"))
+        for label, leak in (("reclaim", False), ("reload", True)):
+            writeUsercode(directory, leak)
+            runs = sorted([roundTrip(leak) for _ in range(args.repeats)], key=lambda run: run[1])
+            restarted, host_ns, resume_ns, missed = runs[len(runs) // 2]
+            print("%-8s %10s %10.2f %10.1f %7d" % (label, restarted, host_ns / 1000000, resume_ns / 1000000, missed))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+    simulator.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulator check of how code.py tells a wired joystick from unwired ADC
+# inputs at startup: the wiring detector (piper_wiring.py) against the old
+# rule of both axes reading centered for half a second.
+#
+# Each trace drives both joystick axes for up to --seconds after power up,
+# --runs times with different seeds, and the benchmark reports how many runs
+# reached joystick mode and how long that took (median and worst). Wired
+# traces should get there, and fast; floating ones never (each that does is
+# a false start, the cursor wandering off on its own). The check fails if
+# the detector starts on any trace that should stay.
+#
+# The traces are synthetic, modelled on readings from the board:
+#
+#   wired centered     a centered stick, a little off center, with about
+#                      200 count ADC noise and occasional 800 count spikes
+#   wired noisy        the same with about 600 counts of noise
+#   wired near edge    resting just inside the deadband edge
+#   wired noisy edge   the same with about 500 counts of noise
+#   wired pushed       held off center (must not start)
+#   floating noise     readings anywhere in the range
+#   floating drift     wandering over the range, up to 1500 counts per ms
+#   floating slow      the same at 200 counts per ms, which can hold still
+#                      enough around the middle to pass for a centered
+#                      stick
+#   floating hum       50Hz mains pickup
+#   floating mid       settled near the middle, as a floating input that
+#                      holds its charge can; no statistic tells this from a
+#                      centered stick, so both methods start (either)
+#
+# A trace recorded on the board can be added with --trace: a JSON object
+# {"wired": true, "x": [...], "y": [...]} of AnalogIn.value readings,
+# replayed one per read.
+#
+#   python benchmarks/wiring_detection.py [--runs N] [--seconds S] [--trace FILE]
+#
+################################################################################
+import argparse
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import clock, hardware
+
+board = simulator.board
+
+STEP = 0.001
+
+def random(seed):
+    state = [seed]
+    def rand():
+        state[0] = (state[0] * 1103515245 + 12345) & 0x7FFFFFFF
+        return state[0] >> 15
+    return rand
+
+def clamp(value):
+    return min(65535, max(0, int(value)))
+
+# A resting stick: offset from center plus roughly Gaussian noise of about
+# sd counts (sum of four uniforms) and spikes of 800 counts, one read in 100
+#
+def wired(offset, sd):
+    def make(seed):
+        rand = random(seed)
+        width = int(sd * 1.73) + 1
+        def read():
+            value = 32768 + offset + sum(rand() % width for _ in range(4)) - 2 * width
+            if rand() % 100 == 0:
+                value += 800 if rand() & 1 else -800
+            return clamp(value)
+        return read
+    return make
+
+def floatingNoise(seed):
+    rand = random(seed)
+    return lambda: rand() * 2 % 65536
+
+# A random walk over time, up to rate counts per ms, bouncing off the ends
+#
+def floatingDrift(rate):
+    def make(seed):
+        rand = random(seed)
+        return drift(rand, rate)
+    return make
+
+def drift(rand, rate):
+    state = [32768 + (rand() % 20000) - 10000, clock.monotonic_ns() // 1000000]
+    def read():
+        ms = clock.monotonic_ns() // 1000000
+        while state[1] < ms:
+            state[0] += (rand() % (2 * rate + 1)) - rate
+            if state[0] < 0 or state[0] > 65535:
+                state[0] = -state[0] if state[0] < 0 else 131070 - state[0]
+            state[1] += 1
+        return clamp(state[0] + (rand() % 201) - 100)
+    return read
+
+def floatingHum(seed):
+    rand = random(seed)
+    phase = rand() % 1000 / 1000 * 2 * math.pi
+    def read():
+        t = clock.monotonic_ns() / 1000000000
+        return clamp(32768 + 12000 * math.sin(2 * math.pi * 50 * t + phase) + (rand() % 801) - 400)
+    return read
+
+TRACES = [
+    ("wired centered", True, wired(300, 200), wired(-200, 200)),
+    ("wired noisy", True, wired(300, 600), wired(-200, 600)),
+    ("wired near edge", True, wired(2900, 200), wired(-200, 200)),
+    ("wired noisy edge", True, wired(2900, 500), wired(-200, 500)),
+    ("wired pushed", False, wired(20000, 200), wired(-200, 200)),
+    ("floating noise", False, floatingNoise, floatingNoise),
+    ("floating drift", False, floatingDrift(1500), floatingDrift(1500)),
+    ("floating slow", False, floatingDrift(200), floatingDrift(200)),
+    ("floating hum", False, floatingHum, floatingHum),
+    ("floating mid", None, wired(500, 150), wired(400, 150)),
+]
+
+SHOULD = {True: "start", False: "stay", None: "either"}
+
+def recorded(path):
+    with open(path) as f:
+        trace = json.load(f)
+    return (os.path.basename(path), trace.get("wired", True), lambda seed: hardware.trace(trace["x"]), lambda seed: hardware.trace(trace["y"]))
+
+def timeToJoystick(cc, detector, x, y, seed, seconds):
+    simulator.reset()
+    pcc = cc.PiperCommandCenter(wiringDetector=detector)
+    hardware.set_analog(board.A4, x(seed))
+    hardware.set_analog(board.A3, y(seed + 1000))
+    steps = int(seconds / STEP)
+    for step in range(steps):
+        hardware.apply_script()
+        pcc.process()
+        if pcc.state == cc._JOYSTICK:
+            return step * STEP
+        clock.advance(STEP)
+    return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10, help="seeds per trace")
+    parser.add_argument("--seconds", type=float, default=2.0, help="simulated time allowed to reach joystick mode")
+    parser.add_argument("--trace", action="append", default=[], help="recorded trace (JSON) to add")
+    args = parser.parse_args()
+
+    cc = simulator.load("code.py")
+    traces = TRACES + [recorded(path) for path in args.trace]
+    print("%-18s %-6s %-9s %8s %10s %9s" % ("trace", "should", "method", "started", "median ms", "worst ms"))
+    falseStarts = []
+    for label, should, x, y in traces:
+        for method, detector in (("detector", True), ("hold", False)):
+            times = [timeToJoystick(cc, detector, x, y, seed, args.seconds) for seed in range(1, args.runs + 1)]
+            started = sorted(t for t in times if t is not None)
+            median = "%.0f" % (started[len(started) // 2] * 1000) if started else "-"
+            worst = "%.0f" % (started[-1] * 1000) if started else "-"
+            print("%-18s %-6s %-9s %5d/%-2d %10s %9s" % (label, SHOULD[should], method, len(started), len(times), median, worst))
+            if detector and should is False and started:
+                falseStarts.append(label)
+    simulator.reset()
+    if falseStarts:
+        print("FAILED: the detector started on %s" % ", ".join(falseStarts))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
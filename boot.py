@@ -5,6 +5,8 @@ import board
 from digitalio import DigitalInOut, Direction, Pull
 import storage
 
+import piper_usb
+
 # Use DPAD switches to control filesystem mode 
 #
 left_pin = DigitalInOut(board.D3)
@@ -46,3 +48,9 @@ else:
 # readonly (bool) – True when the filesystem should be readonly to CircuitPython
 #
 storage.remount("/", readonly)
+
+# Add the gamepad and the N-key rollover keyboard to the USB HID devices
+# (CircuitPython 7 and later)
+#
+if not piper_usb.enableDevices():
+    print("usb_hid.enable() not supported, gamepad and NKRO keyboard unavailable")
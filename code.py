@@ -23,86 +23,70 @@
 #
 ################################################################################
 # This file enables the Piper Command Center to function as a
-# joystick. This does not rely on anything in the lib directory, it's
-# using only built-in libraries and is otherwise self-contained.
+# joystick. Besides the Adafruit libraries in the lib directory it needs the
+# piper_*.py support modules copied next to it on CIRCUITPY.
 #
-from adafruit_debouncer import Debouncer
 import adafruit_dotstar
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
 from adafruit_hid.keycode import Keycode
 from adafruit_hid.mouse import Mouse
-from analogio import AnalogIn
 import board
-from digitalio import DigitalInOut, Direction, Pull
-from math import copysign
+from digitalio import DigitalInOut, Direction
 import supervisor
-import time
+import sys
 import usb_hid
 
-################################################################################
-# This function allows a user to manage joystick handling themselves.
-# See http://www.mimirgames.com/articles/games/joystick-input-and-using-deadbands/
-# for the motivation and theory
-#
-class PiperJoystickAxis:
-    def __init__(self, pin, outputScale=20.0, deadbandCutoff=0.1, weight=0.2):
-        self.pin = AnalogIn(pin)
-        self.outputScale = outputScale
-        self.deadbandCutoff = deadbandCutoff
-        self.weight = weight
-        self.alpha = self._Cubic(self.deadbandCutoff)
-
-    def deinit(self):
-        self.pin.deinit()
-
-    # Cubic function to map input to output in such a way as to give more precision
-    # for lower values
-    def _Cubic(self, x):
-        return self.weight * x ** 3 + (1.0 - self.weight) * x
-
-    # Eliminate the jump present in the deadband, but use the cubic function to give
-    # more precision to lower values
-    #
-    def _cubicScaledDeadband(self, x):
-        if abs(x) < self.deadbandCutoff:
-            return 0
-        else:
-            return (self._Cubic(x) - (copysign(1,x)) * self.alpha) / (1.0-self.alpha)
-
-    # The analog joystick output is an unsigned number 0 to 2^16, which we
-    # will scale to -1 to +1 for compatibility with the cubic scaled
-    # deadband article. This will then remap and return a value
-    # still in the range -1 to +1. Finally we multiply by the requested scaler
-    # an return an integer which can be used with the mouse HID.
-    #
-    def readJoystickAxis(self):
-        return int(self._cubicScaledDeadband((self.pin.value / 2**15) - 1)*self.outputScale)
+from piper_axis import PiperJoystickAxis
+from piper_hid import PiperHIDQueue, PiperMouse, PiperPointer
+from piper_inputs import newButtons, PiperEventQueue, PRESSED, BIT_UP, BIT_DOWN, BIT_LEFT, BIT_RIGHT, BIT_Z, SOURCE_UP, SOURCE_DOWN, SOURCE_LEFT, SOURCE_RIGHT, SOURCE_Z
+from piper_led import PiperLED, rampPattern, solidPattern
+from piper_resources import PiperDevice, PiperPinTable, PiperResources
+from piper_scheduler import PiperScheduler
+from piper_snapshot import PiperSnapshot
+from piper_wiring import PiperWiringDetector
+from piper_statemachine import PiperStateMachine, PiperTransition
+from piper_usertask import PiperUserTask
+
+try:
+    from piper_async import PiperAsyncRuntime
+except ImportError:
+    # No asyncio library (CircuitPython 6 and earlier)
+    PiperAsyncRuntime = None
 
 ################################################################################
 # Joystick button handled separately
 #
 class PiperJoystickZ:
-    def __init__(self, joy_z_pin=board.D2):
-        self.joy_z_pin = DigitalInOut(joy_z_pin)
-        self.joy_z_pin.direction = Direction.INPUT
-        self.joy_z_pin.pull = Pull.UP
-        self.joy_z = Debouncer(self.joy_z_pin)
+    def __init__(self, joy_z_pin=board.D2, events=None, buttons=None):
+        # Debounced by the buttons shared with the other inputs if given,
+        # otherwise by our own
+        self.ownsButtons = buttons is None
+        if buttons is None:
+            buttons = newButtons(events=events)
+        self.buttons = buttons
+        buttons.add(SOURCE_Z, joy_z_pin)
 
     def deinit(self):
-        self.joy_z_pin.deinit()
+        if self.ownsButtons:
+            self.buttons.deinit()
+
+    def reclaim(self):
+        if self.ownsButtons:
+            self.buttons.reclaim()
 
     def update(self):
-        self.joy_z.update()
+        if self.ownsButtons:
+            self.buttons.update()
 
     def zPressed(self):
-        return not self.joy_z.value
+        return self.buttons.state & BIT_Z != 0
 
     def zPressedEvent(self):
-        return self.joy_z.fell
+        return self.buttons.changed & self.buttons.state & BIT_Z != 0
 
     def zReleasedEvent(self):
-        return self.joy_z.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_Z != 0
 
 ################################################################################
 # This class allows a user to manage DPAD handling.
@@ -117,212 +101,420 @@ class PiperJoystickZ:
 # leftReleasedEvent, rightReleasedEvent, upReleasedEvent, upReleasedEvent:
 #   Indicates if the corresponding button was just released
 #
+# Pass the buttons object (piper_inputs.newButtons()) shared by all the inputs
+# as buttons, in which case its owner calls its update instead. Otherwise
+# update debounces these buttons alone and, if a PiperEventQueue is passed as
+# events, pushes an event for each one that changed (see piper_inputs.py).
+#
 class PiperDpad:
-    def __init__(self, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0):
-        # Setup DPAD
+    def __init__(self, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, events=None, buttons=None):
+        # Setup DPAD, debounced by the buttons shared with the other inputs
+        # if given, otherwise by our own
         #
-        self.left_pin = DigitalInOut(dpad_l_pin)
-        self.left_pin.direction = Direction.INPUT
-        self.left_pin.pull = Pull.UP
-        self.left = Debouncer(self.left_pin)
-
-        self.right_pin = DigitalInOut(dpad_r_pin)
-        self.right_pin.direction = Direction.INPUT
-        self.right_pin.pull = Pull.UP
-        self.right = Debouncer(self.right_pin)
-
-        self.up_pin = DigitalInOut(dpad_u_pin)
-        self.up_pin.direction = Direction.INPUT
-        self.up_pin.pull = Pull.UP
-        self.up = Debouncer(self.up_pin)
-
-        self.down_pin = DigitalInOut(dpad_d_pin)
-        self.down_pin.direction = Direction.INPUT
-        self.down_pin.pull = Pull.UP
-        self.down = Debouncer(self.down_pin)
+        self.ownsButtons = buttons is None
+        if buttons is None:
+            buttons = newButtons(events=events)
+        self.buttons = buttons
+        buttons.add(SOURCE_UP, dpad_u_pin)
+        buttons.add(SOURCE_DOWN, dpad_d_pin)
+        buttons.add(SOURCE_LEFT, dpad_l_pin)
+        buttons.add(SOURCE_RIGHT, dpad_r_pin)
 
     def deinit(self):
-        self.up_pin.deinit()
-        self.down_pin.deinit()
-        self.left_pin.deinit()
-        self.right_pin.deinit()
+        if self.ownsButtons:
+            self.buttons.deinit()
+
+    def reclaim(self):
+        if self.ownsButtons:
+            self.buttons.reclaim()
 
     def update(self):
-        self.left.update()
-        self.right.update()
-        self.up.update()
-        self.down.update()
+        if self.ownsButtons:
+            self.buttons.update()
 
     def leftPressed(self):
-        return not self.left.value
+        return self.buttons.state & BIT_LEFT != 0
 
     def leftPressedEvent(self):
-        return self.left.fell
+        return self.buttons.changed & self.buttons.state & BIT_LEFT != 0
 
     def leftReleasedEvent(self):
-        return self.left.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_LEFT != 0
 
     def rightPressed(self):
-        return not self.right.value
+        return self.buttons.state & BIT_RIGHT != 0
 
     def rightPressedEvent(self):
-        return self.right.fell
+        return self.buttons.changed & self.buttons.state & BIT_RIGHT != 0
 
     def rightReleasedEvent(self):
-        return self.right.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_RIGHT != 0
 
     def upPressed(self):
-        return not self.up.value
+        return self.buttons.state & BIT_UP != 0
 
     def upPressedEvent(self):
-        return self.up.fell
+        return self.buttons.changed & self.buttons.state & BIT_UP != 0
 
     def upReleasedEvent(self):
-        return self.up.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_UP != 0
 
     def downPressed(self):
-        return not self.down.value
+        return self.buttons.state & BIT_DOWN != 0
 
     def downPressedEvent(self):
-        return self.down.fell
+        return self.buttons.changed & self.buttons.state & BIT_DOWN != 0
 
     def downReleasedEvent(self):
-        return self.down.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_DOWN != 0
 
 ################################################################################
 # Handle all Piper Command Center joystick functionality
 #
 
-# States
+# States. Waiting for the joystick to settle and for the button to be held
+# is handled by hold timers on the transition rules.
 #
 _UNWIRED        = 0
-_WAITING        = 1
 _JOYSTICK       = 2
-_JWAITING       = 3
 _USERCODE       = 4
 
+# LED patterns for the modes
+#
+_UNWIRED_PATTERN  = rampPattern((255, 0, 0), 2.0)
+_JOYSTICK_PATTERN = solidPattern((0, 255, 0))
+
+# The joystick axes read in 1/2^_POINTER_BITS mouse counts, so that slow
+# pointer movement is carried over between reports rather than truncated
+#
+_POINTER_BITS   = 4
+
+# Task rates in seconds: inputs and the mode logic, the scroll wheel while
+# it is held, the HID reports they produce and the LED
+#
+_INPUT_PERIOD   = 0.001
+_HID_PERIOD     = 0.001
+_WHEEL_PERIOD   = 0.1
+_LED_PERIOD     = 0.02
+
+# User code running alongside joystick mode gets one step per _USER_PERIOD,
+# which should take no more than _USER_SLICE
+#
+_USER_PERIOD    = 0.01
+_USER_SLICE     = 0.002
+
+# How often the snapshot kept across a restart is brought up to date (it is
+# only written when something changed)
+#
+_SNAPSHOT_PERIOD = 0.1
+
+# Owners in the pin table
+#
+_CONTROLLER     = "controller"
+_USER           = "usercode"
+
+# The host polls the HID endpoint every 8ms, so queued reports go out no
+# faster than that
+#
+_HID_INTERVAL   = 0.008
+
+# Output driven low, as a ground for the joystick
+#
+def _groundPin(pin):
+    io = DigitalInOut(pin)
+    io.direction = Direction.OUTPUT
+    io.value = 0
+    return io
+
 class PiperCommandCenter:
-    def __init__(self, joy_x_pin=board.A4, joy_y_pin=board.A3, joy_z_pin=board.D2, joy_gnd_pin=board.A5, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, outputScale=20.0, deadbandCutoff=0.1, weight=0.2):
-        self.x_axis = PiperJoystickAxis(joy_x_pin, outputScale=outputScale, deadbandCutoff=deadbandCutoff, weight=weight)
-        self.y_axis = PiperJoystickAxis(joy_y_pin, outputScale=outputScale, deadbandCutoff=deadbandCutoff, weight=weight)
-        self.joy_z = PiperJoystickZ(joy_z_pin)
-        self.dpad = PiperDpad(dpad_l_pin, dpad_r_pin, dpad_u_pin, dpad_d_pin)
+    def __init__(self, joy_x_pin=board.A4, joy_y_pin=board.A3, joy_z_pin=board.D2, joy_gnd_pin=board.A5, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, outputScale=20.0, deadbandCutoff=0.1, weight=0.2, lookupBits=10, oversample=1, smoothing=2, hysteresis=0.02, backgroundScan=True, ledStrips=(), hidQueue=True, wiringDetector=True):
+        # Everything holding a pin goes in resources, so the pins can be
+        # handed to usercode.py and taken back
+        #
+        self.resources = PiperResources()
+        self.x_axis = self.resources.add(PiperJoystickAxis(joy_x_pin, outputScale=outputScale * (1 << _POINTER_BITS), deadbandCutoff=deadbandCutoff, weight=weight, lookupBits=lookupBits, oversample=oversample, smoothing=smoothing, hysteresis=hysteresis))
+        self.y_axis = self.resources.add(PiperJoystickAxis(joy_y_pin, outputScale=outputScale * (1 << _POINTER_BITS), deadbandCutoff=deadbandCutoff, weight=weight, lookupBits=lookupBits, oversample=oversample, smoothing=smoothing, hysteresis=hysteresis))
+        self.events = PiperEventQueue()
+        self.buttons = self.resources.add(newButtons(events=self.events, background=backgroundScan))
+        self.joy_z = PiperJoystickZ(joy_z_pin, buttons=self.buttons)
+        self.dpad = PiperDpad(dpad_l_pin, dpad_r_pin, dpad_u_pin, dpad_d_pin, buttons=self.buttons)
 
         # Drive pin low if requested for easier joystick wiring
         if joy_gnd_pin is not None:
             # Provide a ground for the joystick - this is to facilitate
             # easier wiring
-            self.joystick_gnd = DigitalInOut(joy_gnd_pin)
-            self.joystick_gnd.direction = Direction.OUTPUT
-            self.joystick_gnd.value = 0
+            self.joystick_gnd = self.resources.add(PiperDevice(lambda: _groundPin(joy_gnd_pin)))
 
         self.keyboard = Keyboard(usb_hid.devices)
         self.keyboard_layout = KeyboardLayoutUS(self.keyboard)  # Change for non-US
-        self.mouse = Mouse(usb_hid.devices)
+        # Reports go through a queue that never blocks the loop (unless
+        # hidQueue is False, then every send waits for the host)
+        if hidQueue:
+            self.hidQueue = PiperHIDQueue(usb_hid.devices, interval=_HID_INTERVAL)
+            devices = self.hidQueue.devices
+        else:
+            self.hidQueue = None
+            devices = usb_hid.devices
+        self.mouse = PiperMouse(devices)
+        self.pointer = PiperPointer(self.mouse, fractionBits=_POINTER_BITS)
 
         # State
         #
-        self.state = _UNWIRED
-        self.timer = time.monotonic()
-        self.last_mouse_wheel = time.monotonic()
-        self.last_mouse = time.monotonic()
-        self.dotstar_led = adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1)
-        self.dotstar_led.brightness = 0.2
+        self.dx = 0
+        self.dy = 0
+        self.dwheel = 0
+        self.dotstar = self.resources.add(PiperDevice(lambda: adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1), self._attachDotStar))
+        self.dotstar_led = self.dotstar.device
+        self.led = PiperLED(self.dotstar_led, brightness=0.2, patterns=(_UNWIRED_PATTERN, _JOYSTICK_PATTERN), strips=ledStrips)
+
+        # Who owns each pin. User code running alongside (startUsercode())
+        # can borrow the joystick's and DPAD's, not the DotStar's.
+        #
+        self.pins = PiperPinTable()
+        self.pins.add(joy_x_pin, _CONTROLLER, self.x_axis.deinit, self.x_axis.reclaim)
+        self.pins.add(joy_y_pin, _CONTROLLER, self.y_axis.deinit, self.y_axis.reclaim)
+        for source, pin in ((SOURCE_Z, joy_z_pin), (SOURCE_UP, dpad_u_pin), (SOURCE_DOWN, dpad_d_pin), (SOURCE_LEFT, dpad_l_pin), (SOURCE_RIGHT, dpad_r_pin)):
+            self._addButtonPin(source, pin)
+        if joy_gnd_pin is not None:
+            self.pins.add(joy_gnd_pin, _CONTROLLER, self.joystick_gnd.deinit, self.joystick_gnd.reclaim)
+        self.pins.add(board.APA102_SCK, _CONTROLLER)
+        self.pins.add(board.APA102_MOSI, _CONTROLLER)
+        self.userTask = PiperUserTask(timeSlice=_USER_SLICE)
         self.up_pressed = False
         self.down_pressed = False
         self.left_pressed = False
         self.right_pressed = False
 
-    def process(self):
-        # Call the debouncing library frequently
-        self.joy_z.update()
-        self.dpad.update()
+        # The joystick counts as wired once the wiring detector has found it
+        # centered (see piper_wiring.py), or without it once it has read
+        # centered for half a second
+        #
+        if wiringDetector:
+            self.wiring = PiperWiringDetector((self.x_axis, self.y_axis))
+            wired = PiperTransition(self._joystickWired, _JOYSTICK)
+        else:
+            self.wiring = None
+            wired = PiperTransition(self._joystickCentered, _JOYSTICK, holdTime=0.5)
 
-        dx = self.x_axis.readJoystickAxis()
-        dy = self.y_axis.readJoystickAxis()
+        # Hold the joystick button for a second to hand over to usercode.py
+        #
+        self.stateMachine = PiperStateMachine(_UNWIRED)
+        self.stateMachine.addState(_UNWIRED, self._unwiredMode, (
+            wired,
+        ))
+        self.stateMachine.addState(_JOYSTICK, self._joystickMode, (
+            PiperTransition(None, _USERCODE, holdTime=1.0, action=self.releaseJoystickHID),
+        ), guard=self.joy_z.zPressed)
+        self.stateMachine.addState(_USERCODE, self._usercodeMode)
+
+        # After a restart, carry on where the last session stopped
+        #
+        self.snapshot = PiperSnapshot()
+        self._restore()
 
-        # Command Center State Machine
+        # Each kind of work runs at its own rate
+        #
+        self.scheduler = PiperScheduler()
+        self.inputTask = self.scheduler.addTask(self._inputTask, _INPUT_PERIOD)
+        self.scheduler.addTask(self._wheelTask, _WHEEL_PERIOD)
+        self.scheduler.addTask(self._hidTask, _HID_PERIOD)
+        self.scheduler.addTask(self._ledTask, _LED_PERIOD)
+        self.scheduler.addTask(self._userTask, _USER_PERIOD)
+        self.scheduler.addTask(self._snapshotTask, _SNAPSHOT_PERIOD)
+
+    @property
+    def state(self):
+        return self.stateMachine.state
+
+    @state.setter
+    def state(self, state):
+        self.stateMachine.state = state
+
+    def releaseJoystickHID(self):
+        self.mouse.release_all()
+        self.dwheel = 0
+
+    def _joystickCentered(self):
+        return self.dx == 0 and self.dy == 0
+
+    def _joystickWired(self):
+        return self.wiring.centered
+
+    def _unwiredMode(self):
+        self.led.play(_UNWIRED_PATTERN)
+        if self.wiring is not None:
+            self.wiring.update()
+
+    def _joystickMode(self):
+        self.led.play(_JOYSTICK_PATTERN)
+
+        # Determine mouse wheel direction, _wheelTask turns it
         #
-        if self.state == _UNWIRED:
-            self.dotstar_led[0] = ((time.monotonic_ns() >> 23) % 256, 0, 0)
-            if dx == 0 and dy == 0:
-                self.state = _WAITING
-                self.timer = time.monotonic()
-        elif self.state == _WAITING:
-            self.dotstar_led[0] = ((time.monotonic_ns() >> 23) % 256, 0, 0)
-            if dx != 0 or dy != 0:
-                self.state = _UNWIRED
+        dwheel = 0
+        if self.dpad.upPressed():
+            dwheel=-1
+        elif self.dpad.downPressed():
+            dwheel=1
+        self.dwheel = dwheel
+
+        # Mouse movement, at the same speed however fast the loop runs
+        #
+        self.pointer.update(self.dx, self.dy)
+
+        # Left and right DPAD buttons are the mouse buttons
+        #
+        events = self.events
+        for i in range(events.count):
+            event = events.event(i)
+            source = event >> 1
+            if source == SOURCE_LEFT:
+                button = Mouse.LEFT_BUTTON
+            elif source == SOURCE_RIGHT:
+                button = Mouse.RIGHT_BUTTON
             else:
-                if time.monotonic() - self.timer > 0.5:
-                    self.state = _JOYSTICK
-        elif self.state == _JOYSTICK:
-            self.dotstar_led[0] = (0, 255, 0)
-            if self.joy_z.zPressed():
-                self.timer = time.monotonic()
-                self.state = _JWAITING
-        elif self.state == _JWAITING:
-            if not self.joy_z.zPressed():
-                self.state = _JOYSTICK
+                continue
+            if event & PRESSED:
+                self.mouse.press(button)
             else:
-                if time.monotonic() - self.timer > 1.0:
-                    self.mouse.release(Mouse.LEFT_BUTTON)
-                    self.mouse.release(Mouse.RIGHT_BUTTON)
-                    self.state = _USERCODE
-        elif self.state == _USERCODE:
-            self.dotstar_led[0] = (0, 0, 0)
-            self.dotstar_led.deinit()
-            self.joystick_gnd.deinit()
-            self.x_axis.deinit()
-            self.y_axis.deinit()
-            self.dpad.deinit()
-            self.joy_z.deinit()
-            try:
-                # Load usercode.py
-                __import__("usercode")
-            except ImportError:
-                print("Missing usercode.py file")
-            # If we get here due to an exception or the user code exiting
-            # then restart as it's probably going to by the most stable
-            # strategy
-            #
+                self.mouse.release(button)
+
+    # The last session's joystick response and, if it found the joystick
+    # wired, joystick mode straight away rather than waiting for the
+    # joystick to settle (see piper_snapshot.py)
+    #
+    def _restore(self):
+        snapshot = self.snapshot
+        if not snapshot.load():
+            return
+        snapshot.restoreAxes(self.x_axis, self.y_axis)
+        if snapshot.wired:
+            self.state = _JOYSTICK
+
+    def _attachDotStar(self, pixels):
+        self.dotstar_led = pixels
+        self.led.attach(pixels)
+
+    def _addButtonPin(self, source, pin):
+        buttons = self.buttons
+        self.pins.add(pin, _CONTROLLER, lambda: buttons.disable(source), lambda: buttons.enable(source))
+
+    # Run a generator alongside joystick mode, one step per _USER_PERIOD
+    # (see piper_usertask.py). Pins it takes with claimPin() are no longer
+    # read by the command center, and are handed back when it ends.
+    #
+    def startUsercode(self, generator):
+        self.stopUsercode()
+        self.userTask.start(generator)
+
+    def stopUsercode(self):
+        self.userTask.stop()
+        self._returnPins()
+
+    def claimPin(self, pin):
+        self.pins.claim(pin, _USER)
+
+    def _returnPins(self):
+        try:
+            self.pins.releaseAll(_USER)
+        except ValueError as e:
+            print("usercode.py left a pin in use:", repr(e))
+
+    # Run usercode.py. If it has a task(pcc) generator function, that runs
+    # alongside joystick mode (startUsercode()) until it ends or the
+    # joystick button is held again. Otherwise every pin is handed to it
+    # and its main() runs, or its top level if it has no main() (it is
+    # imported afresh each time). When that returns, or stops with an
+    # exception, the pins are taken back and joystick mode resumes. A pin
+    # that user code left in use can only be freed by restarting.
+    #
+    def _usercodeMode(self):
+        if self.userTask.running:
+            self.stopUsercode()
+            self.state = _JOYSTICK
+            return
+        self.dotstar_led[0] = (0, 0, 0)
+        self.resources.release()
+        task = None
+        try:
+            # Load usercode.py
+            sys.modules.pop("usercode", None)
+            usercode = __import__("usercode")
+            if hasattr(usercode, "task"):
+                task = usercode.task
+            elif hasattr(usercode, "main"):
+                usercode.main()
+        except Exception as e:
+            print("usercode.py stopped:", repr(e))
+        try:
+            self.resources.reclaim()
+        except ValueError as e:
+            print("usercode.py left a pin in use, restarting:", repr(e))
+            self._snapshotTask()
             supervisor.reload()
+        if task is not None:
+            self.startUsercode(task(self))
+        self.scheduler.restart()
+        self.state = _JOYSTICK
+
+    # Periodic tasks, run by the scheduler
+    #
+    def _inputTask(self):
+        # Events are only kept for one pass
+        self.events.clear()
+
+        # Debounce all the buttons at once, frequently
+        self.buttons.update()
+
+        self.dx = self.x_axis.readJoystickAxis()
+        self.dy = self.y_axis.readJoystickAxis()
 
-        # Command Center Joystick Handling
+        # Command Center State Machine
         #
-        if self.state == _JOYSTICK or self.state == _JWAITING:
-            # Determine mouse wheel direction
-            #
-            dwheel = 0
-            if self.dpad.upPressed():
-                dwheel=-1
-            elif self.dpad.downPressed():
-                dwheel=1
-
-            # Initial quick and dirty mouse movement pacing
-            #
-            if time.monotonic() - self.last_mouse > 0.005:
-                self.last_mouse = time.monotonic()
-                self.mouse.move(x=dx, y=dy)
-
-            # Initial quick and dirty mouse scroll wheel pacing
-            #
-            if time.monotonic() - self.last_mouse_wheel > 0.1:
-                self.last_mouse_wheel = time.monotonic()
-                self.mouse.move(wheel=dwheel)
-
-            if self.dpad.leftPressedEvent():
-                    self.mouse.press(Mouse.LEFT_BUTTON)
-            elif self.dpad.leftReleasedEvent():
-                    self.mouse.release(Mouse.LEFT_BUTTON)
-
-            if self.dpad.rightPressedEvent():
-                    self.mouse.press(Mouse.RIGHT_BUTTON)
-            elif self.dpad.rightReleasedEvent():
-                    self.mouse.release(Mouse.RIGHT_BUTTON)
+        self.stateMachine.process()
+
+    def _wheelTask(self):
+        if self.dwheel:
+            self.mouse.move(wheel=self.dwheel)
+
+    # One mouse report for everything the other tasks changed
+    #
+    def _hidTask(self):
+        self.mouse.flush()
+
+    # The animation only gets the time left before the next input scan
+    #
+    def _ledTask(self):
+        self.led.update(self.inputTask.due)
+
+    def _userTask(self):
+        if self.userTask.running and not self.userTask.step():
+            self._returnPins()
+
+    # User code counts as joystick mode, and being past the unwired state
+    # shows the joystick is wired
+    #
+    def _snapshotTask(self):
+        wired = self.state != _UNWIRED
+        self.snapshot.save(_JOYSTICK if wired else _UNWIRED, 0, wired, self.x_axis, self.y_axis)
+
+    def process(self):
+        self.scheduler.process()
+
+    # Run the tasks for ever, as asyncio tasks that sleep until they are due
+    # when the asyncio library is installed, otherwise by calling process()
+    # in a loop
+    #
+    def run(self):
+        if PiperAsyncRuntime is not None:
+            PiperAsyncRuntime(self.scheduler).run()
+        while True:
+            self.process()
 
 ################################################################################
 # Start up the joystick handler
+# (code.py runs as __main__ on the board, importing it from the host
+# simulator only defines the classes)
 #
-pcc = PiperCommandCenter()
-while True:
-    pcc.process()
+if __name__ == "__main__":
+    pcc = PiperCommandCenter()
+    pcc.run()
@@ -90,8 +90,9 @@ from analogio import AnalogIn
 import usb_hid
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
-from adafruit_hid.keycode import Keycode
 from adafruit_debouncer import Debouncer
+from piper_hid import PiperKeyboard
+from piper_mapping import PiperButtonMap, loadLayouts
 import touchio
 
 # Which player 1 or 2?
@@ -99,6 +100,22 @@ import touchio
 #
 player = 1
 
+# Keys for each player, see piper_mapping.py. A /mappings.json on CIRCUITPY
+# can replace either layout.
+#
+SOURCES = ("up", "down", "left", "right", "space")
+LAYOUTS = {
+    "player1": {
+        "up": ["UP_ARROW"], "down": ["DOWN_ARROW"], "left": ["LEFT_ARROW"], "right": ["RIGHT_ARROW"],
+        "space": ["SPACE"],
+    },
+    "player2": {
+        "up": ["K", "W"], "down": ["M", "S"], "left": ["A"], "right": ["D"],
+        "space": ["LEFT_SHIFT"],
+    },
+}
+LAYOUTS.update(loadLayouts())
+
 # Directional pad pins need pull-ups enabled
 #
 right_pin = DigitalInOut(board.D7)
@@ -135,15 +152,16 @@ y = AnalogIn(board.A3)
 touch_right = touchio.TouchIn(board.D11) # Requires 1 Mohm pulldown
 touch_left = touchio.TouchIn(board.D12)  # Requires 1 Mohm pulldown
 
-# We'll use these to detect button/joystick presses/movement
-up_state    = False
-down_state  = False
-left_state  = False
-right_state = False
-space_state = False
+# We'll use this to detect button/joystick presses/movement, one bit per
+# entry in SOURCES
+state = 0
 
-keyboard = Keyboard(usb_hid.devices)
-keyboard_layout = KeyboardLayoutUS(keyboard)  # Change for non-US
+# Key changes are sent as one report per pass
+keyboard = PiperKeyboard(usb_hid.devices)
+keyboard_layout = KeyboardLayoutUS(Keyboard(usb_hid.devices))  # Change for non-US
+
+buttonMap = PiperButtonMap(SOURCES, LAYOUTS, keyboard=keyboard)
+buttonMap.select("player%d" % player)
 
 while True:
     # Placeholder
@@ -204,71 +222,11 @@ while True:
     # For each type of key, we press it down,
     # release it, or leave it in its current state.
     #
-    if not up_state and up_pressed:
-        if player == 1:
-            keyboard.press(Keycode.UP_ARROW)
-        else:
-            keyboard.press(Keycode.K)
-            keyboard.press(Keycode.W)
-        up_state = True
-    elif up_state and not up_pressed:
-        if player == 1:
-            keyboard.release(Keycode.UP_ARROW)
-        else:
-            keyboard.release(Keycode.K)
-            keyboard.release(Keycode.W)
-        up_state = False
-
-    if not down_state and down_pressed:
-        if player == 1:
-            keyboard.press(Keycode.DOWN_ARROW)
-        else:
-            keyboard.press(Keycode.M)
-            keyboard.press(Keycode.S)
-        down_state = True
-    elif down_state and not down_pressed:
-        if player == 1:
-            keyboard.release(Keycode.DOWN_ARROW)
-        else:
-            keyboard.release(Keycode.M)
-            keyboard.release(Keycode.S)
-        down_state = False
-
-    if not left_state and left_pressed:
-        if player == 1:
-            keyboard.press(Keycode.LEFT_ARROW)
-        else:
-            keyboard.press(Keycode.A)
-        left_state = True
-    elif left_state and not left_pressed:
-        if player == 1:
-            keyboard.release(Keycode.LEFT_ARROW)
-        else:
-            keyboard.release(Keycode.A)
-        left_state = False
-
-    if not right_state and right_pressed:
-        if player == 1:
-            keyboard.press(Keycode.RIGHT_ARROW)
-        else:
-            keyboard.press(Keycode.D)
-        right_state = True
-    elif right_state and not right_pressed:
-        if player == 1:
-            keyboard.release(Keycode.RIGHT_ARROW)
-        else:
-            keyboard.release(Keycode.D)
-        right_state = False
-
-    if not space_state and space_pressed:
-        if player == 1:
-            keyboard.press(Keycode.SPACE)
-        else:
-            keyboard.press(Keycode.LEFT_SHIFT)
-        space_state = True
-    elif space_state and not space_pressed:
-        if player == 1:
-            keyboard.release(Keycode.SPACE)
-        else:
-            keyboard.release(Keycode.LEFT_SHIFT)
-        space_state = False
+    pressed = up_pressed | down_pressed << 1 | left_pressed << 2 | right_pressed << 3 | space_pressed << 4
+    changed = pressed ^ state
+    if changed:
+        state = pressed
+        for source in range(len(SOURCES)):
+            if changed & (1 << source):
+                buttonMap.dispatch(source, pressed & (1 << source))
+        keyboard.flush()
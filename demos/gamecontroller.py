@@ -26,9 +26,9 @@
 # Press the joystick for one second to toggle between controller modes.
 #
 # Inactive (RED LED):
-#   The joystick must remain relatively centered for one second to exit this mode. This
-#   is to prevent undesirable HID controls in the event that the joystick is not
-#   wired
+#   The joystick must be found steady and centered to exit this mode, which takes a
+#   few tens of milliseconds. This is to prevent undesirable HID controls in the event
+#   that the joystick is not wired
 #
 # In Mouse Mode (GREEN LED):
 #   The joystick controls cursor movement.
@@ -43,81 +43,68 @@
 #   Description TBD
 #   Requires 3 additional buttons to be wired to SCK, MOSI, MISO
 #
+# In Gamepad Mode (PURPLE LED):
+#   Entered from Mouse Mode by holding the joystick and the bottom Minecraft
+#   button for one second, left by holding the joystick for one second.
+#   A USB gamepad: the joystick is the X and Y axes, the DPAD, joystick and
+#   Minecraft buttons are buttons 1 to 8, all sent in one report.
+#   Requires CircuitPython 7 or later with boot.py from this repository.
+#
 ################################################################################
 
-from adafruit_debouncer import Debouncer
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
 from adafruit_hid.keycode import Keycode
-from adafruit_hid.mouse import Mouse
-from analogio import AnalogIn
-from digitalio import DigitalInOut, Direction, Pull
-from math import copysign
+from digitalio import DigitalInOut, Direction
+from piper_axis import PiperJoystickAxis
+from piper_inputs import newButtons, PiperEventQueue, BIT_UP, BIT_DOWN, BIT_LEFT, BIT_RIGHT, BIT_Z, BIT_TOP, BIT_MIDDLE, BIT_BOTTOM, PRESSED, RELEASED, SOURCE_NAMES, SOURCE_UP, SOURCE_DOWN, SOURCE_LEFT, SOURCE_RIGHT, SOURCE_Z, SOURCE_TOP, SOURCE_MIDDLE, SOURCE_BOTTOM
+from piper_hid import PiperGamepad, PiperHIDQueue, PiperKeyboard, PiperMouse, PiperNKROKeyboard, PiperPointer
+from piper_led import PiperLED, rampPattern, solidPattern
+from piper_mapping import PiperButtonMap, loadLayouts
 import adafruit_dotstar
 import board
 import supervisor
-import time
+import sys
 import usb_hid
 
-__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+from piper_scheduler import PiperScheduler
+from piper_snapshot import PiperSnapshot
+from piper_wiring import PiperWiringDetector
+from piper_statemachine import PiperStateMachine, PiperTransition
 
-################################################################################
-# This function allows a user to manage joystick handling themselves.
-# See http://www.mimirgames.com/articles/games/joystick-input-and-using-deadbands/
-# for the motivation and theory
-#
-class PiperJoystickAxis:
-    def __init__(self, pin, outputScale=20.0, deadbandCutoff=0.1, weight=0.2):
-        self.pin = AnalogIn(pin)
-        self.outputScale = outputScale
-        self.deadbandCutoff = deadbandCutoff
-        self.weight = weight
-        self.alpha = self._Cubic(self.deadbandCutoff)
-
-    # Cubic function to map input to output in such a way as to give more precision
-    # for lower values
-    def _Cubic(self, x):
-        return self.weight * x ** 3 + (1.0 - self.weight) * x
-
-    # Eliminate the jump present in the deadband, but use the cubic function to give
-    # more precision to lower values
-    #
-    def _cubicScaledDeadband(self, x):
-        if abs(x) < self.deadbandCutoff:
-            return 0
-        else:
-            return (self._Cubic(x) - (copysign(1,x)) * self.alpha) / (1.0-self.alpha)
+try:
+    from piper_async import PiperAsyncRuntime
+except ImportError:
+    # No asyncio library (CircuitPython 6 and earlier)
+    PiperAsyncRuntime = None
 
-    # The analog joystick output is an unsigned number 0 to 2^16, which we
-    # will scale to -1 to +1 for compatibility with the cubic scaled
-    # deadband article. This will then remap and return a value
-    # still in the range -1 to +1. Finally we multiply by the requested scaler
-    # an return an integer which can be used with the mouse HID.
-    #
-    def readJoystickAxis(self):
-        return int(self._cubicScaledDeadband((self.pin.value / 2**15) - 1)*self.outputScale)
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
 
 ################################################################################
 # Joystick button handled separately
 #
 class PiperJoystickZ:
-    def __init__(self, joy_z_pin=board.D2):
-        self.joy_z_pin = DigitalInOut(joy_z_pin)
-        self.joy_z_pin.direction = Direction.INPUT
-        self.joy_z_pin.pull = Pull.UP
-        self.joy_z = Debouncer(self.joy_z_pin)
+    def __init__(self, joy_z_pin=board.D2, events=None, buttons=None):
+        # Debounced by the buttons shared with the other inputs if given,
+        # otherwise by our own
+        self.ownsButtons = buttons is None
+        if buttons is None:
+            buttons = newButtons(events=events)
+        self.buttons = buttons
+        buttons.add(SOURCE_Z, joy_z_pin)
 
     def update(self):
-        self.joy_z.update()
+        if self.ownsButtons:
+            self.buttons.update()
 
     def zPressed(self):
-        return not self.joy_z.value
+        return self.buttons.state & BIT_Z != 0
 
     def zPressedEvent(self):
-        return self.joy_z.fell
+        return self.buttons.changed & self.buttons.state & BIT_Z != 0
 
     def zReleasedEvent(self):
-        return self.joy_z.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_Z != 0
 
 ################################################################################
 # This class allows a user to manage DPAD handling.
@@ -132,71 +119,64 @@ class PiperJoystickZ:
 # leftReleasedEvent, rightReleasedEvent, upReleasedEvent, upReleasedEvent:
 #   Indicates if the corresponding button was just released
 #
+# Pass the buttons object (piper_inputs.newButtons()) shared by all the inputs
+# as buttons, in which case its owner calls its update instead. Otherwise
+# update debounces these buttons alone and, if a PiperEventQueue is passed as
+# events, pushes an event for each one that changed (see piper_inputs.py).
+#
 class PiperDpad:
-    def __init__(self, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0):
-        # Setup DPAD
+    def __init__(self, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, events=None, buttons=None):
+        # Setup DPAD, debounced by the buttons shared with the other inputs
+        # if given, otherwise by our own
         #
-        self.left_pin = DigitalInOut(dpad_l_pin)
-        self.left_pin.direction = Direction.INPUT
-        self.left_pin.pull = Pull.UP
-        self.left = Debouncer(self.left_pin)
-
-        self.right_pin = DigitalInOut(dpad_r_pin)
-        self.right_pin.direction = Direction.INPUT
-        self.right_pin.pull = Pull.UP
-        self.right = Debouncer(self.right_pin)
-
-        self.up_pin = DigitalInOut(dpad_u_pin)
-        self.up_pin.direction = Direction.INPUT
-        self.up_pin.pull = Pull.UP
-        self.up = Debouncer(self.up_pin)
-
-        self.down_pin = DigitalInOut(dpad_d_pin)
-        self.down_pin.direction = Direction.INPUT
-        self.down_pin.pull = Pull.UP
-        self.down = Debouncer(self.down_pin)
+        self.ownsButtons = buttons is None
+        if buttons is None:
+            buttons = newButtons(events=events)
+        self.buttons = buttons
+        buttons.add(SOURCE_UP, dpad_u_pin)
+        buttons.add(SOURCE_DOWN, dpad_d_pin)
+        buttons.add(SOURCE_LEFT, dpad_l_pin)
+        buttons.add(SOURCE_RIGHT, dpad_r_pin)
 
     def update(self):
-        self.left.update()
-        self.right.update()
-        self.up.update()
-        self.down.update()
+        if self.ownsButtons:
+            self.buttons.update()
 
     def leftPressed(self):
-        return not self.left.value
+        return self.buttons.state & BIT_LEFT != 0
 
     def leftPressedEvent(self):
-        return self.left.fell
+        return self.buttons.changed & self.buttons.state & BIT_LEFT != 0
 
     def leftReleasedEvent(self):
-        return self.left.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_LEFT != 0
 
     def rightPressed(self):
-        return not self.right.value
+        return self.buttons.state & BIT_RIGHT != 0
 
     def rightPressedEvent(self):
-        return self.right.fell
+        return self.buttons.changed & self.buttons.state & BIT_RIGHT != 0
 
     def rightReleasedEvent(self):
-        return self.right.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_RIGHT != 0
 
     def upPressed(self):
-        return not self.up.value
+        return self.buttons.state & BIT_UP != 0
 
     def upPressedEvent(self):
-        return self.up.fell
+        return self.buttons.changed & self.buttons.state & BIT_UP != 0
 
     def upReleasedEvent(self):
-        return self.up.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_UP != 0
 
     def downPressed(self):
-        return not self.down.value
+        return self.buttons.state & BIT_DOWN != 0
 
     def downPressedEvent(self):
-        return self.down.fell
+        return self.buttons.changed & self.buttons.state & BIT_DOWN != 0
 
     def downReleasedEvent(self):
-        return self.down.rose
+        return self.buttons.changed & ~self.buttons.state & BIT_DOWN != 0
 
 ################################################################################
 # Minecraft button handling
@@ -211,111 +191,107 @@ class PiperDpad:
 # topReleasedEvent, middleReleasedEvent, bottomReleasedEvent
 #   Indicates if the corresponding button was just released
 #
+# Pass the buttons object (piper_inputs.newButtons()) shared by all the inputs
+# as buttons, in which case its owner calls its update instead. Otherwise
+# update debounces these buttons alone and, if a PiperEventQueue is passed as
+# events, pushes an event for each one that changed (see piper_inputs.py).
+#
 class PiperMineCraftButtons:
-    def __init__(self, mc_top_pin=board.SCK, mc_middle_pin=board.MOSI, mc_bottom_pin=board.MISO):
-        # Setup Minecraft Buttons
+    def __init__(self, mc_top_pin=board.SCK, mc_middle_pin=board.MOSI, mc_bottom_pin=board.MISO, events=None, buttons=None):
+        # Setup Minecraft Buttons, debounced by the buttons shared with the
+        # other inputs if given, otherwise by our own. Unwired ones (None)
+        # always read as released.
         #
+        self.ownsButtons = buttons is None
+        if buttons is None:
+            buttons = newButtons(events=events)
+        self.buttons = buttons
         if mc_top_pin is not None:
-            self.mc_top_pin = DigitalInOut(mc_top_pin)
-            self.mc_top_pin.direction = Direction.INPUT
-            self.mc_top_pin.pull = Pull.UP
-            self.mc_top = Debouncer(self.mc_top_pin)
-        else:
-            self.mc_top = None
-
+            buttons.add(SOURCE_TOP, mc_top_pin)
         if mc_middle_pin is not None:
-            self.mc_middle_pin = DigitalInOut(mc_middle_pin)
-            self.mc_middle_pin.direction = Direction.INPUT
-            self.mc_middle_pin.pull = Pull.UP
-            self.mc_middle = Debouncer(self.mc_middle_pin)
-        else:
-            self.mc_middle = None
-
+            buttons.add(SOURCE_MIDDLE, mc_middle_pin)
         if mc_bottom_pin is not None:
-            self.mc_bottom_pin = DigitalInOut(mc_bottom_pin)
-            self.mc_bottom_pin.direction = Direction.INPUT
-            self.mc_bottom_pin.pull = Pull.UP
-            self.mc_bottom = Debouncer(self.mc_bottom_pin)
-        else:
-            self.mc_bottom = None
+            buttons.add(SOURCE_BOTTOM, mc_bottom_pin)
 
     def update(self):
-        if self.mc_top:
-            self.mc_top.update()
-        if self.mc_middle:
-            self.mc_middle.update()
-        if self.mc_bottom:
-            self.mc_bottom.update()
+        if self.ownsButtons:
+            self.buttons.update()
 
     def topPressed(self):
-        if self.mc_top:
-            return not self.mc_top.value
-        else:
-            return False
+        return self.buttons.state & BIT_TOP != 0
 
     def topPressedEvent(self):
-        if self.mc_top:
-            return self.mc_top.fell
-        else:
-            return False
+        return self.buttons.changed & self.buttons.state & BIT_TOP != 0
 
     def topReleasedEvent(self):
-        if self.mc_top:
-            return self.mc_top.rose
-        else:
-            return False
+        return self.buttons.changed & ~self.buttons.state & BIT_TOP != 0
 
     def middlePressed(self):
-        if self.mc_middle:
-            return not self.mc_middle.value
-        else:
-            return False
+        return self.buttons.state & BIT_MIDDLE != 0
 
     def middlePressedEvent(self):
-        if self.mc_middle:
-            return self.mc_middle.fell
-        else:
-            return False
+        return self.buttons.changed & self.buttons.state & BIT_MIDDLE != 0
 
     def middleReleasedEvent(self):
-        if self.mc_middle:
-            return self.mc_middle.rose
-        else:
-            return False
+        return self.buttons.changed & ~self.buttons.state & BIT_MIDDLE != 0
 
     def bottomPressed(self):
-        if self.mc_bottom:
-            return not self.mc_bottom.value
-        else:
-            return False
+        return self.buttons.state & BIT_BOTTOM != 0
 
     def bottomPressedEvent(self):
-        if self.mc_bottom:
-            return self.mc_bottom.fell
-        else:
-            return False
+        return self.buttons.changed & self.buttons.state & BIT_BOTTOM != 0
 
     def bottomReleasedEvent(self):
-        if self.mc_bottom:
-            return self.mc_bottom.rose
-        else:
-            return False
+        return self.buttons.changed & ~self.buttons.state & BIT_BOTTOM != 0
 
 ################################################################################
 # Handle all Piper Command Center built-in functionality
 #
 
-# States
+# States. Holding a button combination to switch modes is handled by hold
+# timers on the transition rules rather than separate waiting states.
 #
 _UNWIRED        = 0
-_WAITING        = 1
 _JOYSTICK       = 2
-_JWAITING       = 3
 _KEYBOARD       = 4
-_KWAITING_TO_J  = 5
-_KWAITING_TO_MC = 6
 _MINECRAFT      = 7
-_MWAITING       = 8
+_GAMEPAD        = 8
+
+# LED patterns for the modes
+#
+_UNWIRED_PATTERN  = rampPattern((255, 0, 0), 2.0)
+_JOYSTICK_PATTERN = solidPattern((0, 255, 0))
+_KEYBOARD_PATTERN = solidPattern((0, 0, 255))
+_GAMEPAD_PATTERN  = solidPattern((128, 0, 255))
+
+# Full scale of the gamepad axes
+#
+_GAMEPAD_AXIS   = 32767
+
+# The joystick axes read in 1/2^_POINTER_BITS mouse counts, so that slow
+# pointer movement is carried over between reports rather than truncated
+#
+_POINTER_BITS   = 4
+
+# Task rates in seconds: inputs and the mode logic, the scroll wheel while
+# it is held, the HID reports they produce, the LED and, with serialCommands,
+# the serial console
+#
+_INPUT_PERIOD   = 0.001
+_HID_PERIOD     = 0.001
+_WHEEL_PERIOD   = 0.1
+_LED_PERIOD     = 0.02
+_SERIAL_PERIOD  = 0.05
+
+# How often the snapshot kept across a restart is brought up to date (it is
+# only written when something changed)
+#
+_SNAPSHOT_PERIOD = 0.1
+
+# The host polls the HID endpoint every 8ms, so queued reports go out no
+# faster than that
+#
+_HID_INTERVAL   = 0.008
 
 # Minecraft modes
 #
@@ -325,17 +301,69 @@ _MC_SPRINTING   = 2
 _MC_CROUCHING   = 3
 _MC_UTILITY     = 4
 
-# Keycodes for joystick button press
-#                 _MC_DEFAULT    _MC_FLYINGDOWN      _MC_SPRINTING  _MC_CROUCHING  _MC_UTILITY
-_MC_JOYSTICK_Z = [Keycode.SPACE, Keycode.LEFT_SHIFT, Keycode.SPACE, Keycode.SPACE, Keycode.F5]
+# Button mappings, see piper_mapping.py for the action names. Any of these
+# layouts can be replaced by putting a /mappings.json on CIRCUITPY.
+#
+# Input sources, indexes into the dispatch tables. The joy_* sources are the
+# joystick treated as four arrow buttons.
+#
+_SOURCES = SOURCE_NAMES + ("joy_left", "joy_right", "joy_up", "joy_down")
+_JOY_LEFT = len(SOURCE_NAMES)
+
+_LAYOUTS = {
+    "mouse": {
+        "left": ["MOUSE_LEFT"], "right": ["MOUSE_RIGHT"],
+    },
+    "keyboard": {
+        "up": ["SPACE"], "down": ["X"], "left": ["Z"], "right": ["C"],
+        "joy_left": ["LEFT_ARROW"], "joy_right": ["RIGHT_ARROW"], "joy_up": ["UP_ARROW"], "joy_down": ["DOWN_ARROW"],
+    },
+    "minecraft": {
+        "z": ["SPACE"], "up": ["W"], "down": ["S"], "left": ["A"], "right": ["D"],
+        "top": ["MOUSE_LEFT"], "middle": ["MOUSE_RIGHT"],
+    },
+    "minecraft_flyingdown": {
+        "z": ["LEFT_SHIFT"], "up": ["W"], "down": ["S"], "left": ["A"], "right": ["D"],
+        "top": ["MOUSE_LEFT"], "middle": ["MOUSE_RIGHT"],
+    },
+    "minecraft_utility": {
+        "z": ["F5"], "up": ["WHEEL_UP"], "down": ["WHEEL_DOWN"], "left": ["E"], "right": ["ESCAPE"],
+        "top": ["MOUSE_LEFT"], "middle": ["MOUSE_RIGHT"],
+    },
+    # While the modifier (bottom button) is held the joystick button and DPAD
+    # select the next mode instead of generating key presses
+    "minecraft_modifier": {
+        "top": ["Q"], "middle": ["MOUSE_MIDDLE"],
+    },
+    "minecraft_modifier_mouse": {
+        "top": ["MOUSE_LEFT"], "middle": ["MOUSE_RIGHT"],
+    },
+}
+
+# Layouts per Minecraft mode, without and with the modifier held
+#                        _MC_DEFAULT           _MC_FLYINGDOWN              _MC_SPRINTING               _MC_CROUCHING               _MC_UTILITY
+_MC_LAYOUTS          = ["minecraft",          "minecraft_flyingdown",     "minecraft",                "minecraft",                "minecraft_utility"]
+_MC_MODIFIER_LAYOUTS = ["minecraft_modifier", "minecraft_modifier_mouse", "minecraft_modifier_mouse", "minecraft_modifier_mouse", "minecraft_modifier_mouse"]
+
+# Mode requested by pressing a button while holding the modifier
+#
+_MC_REQUESTS = {SOURCE_Z: _MC_FLYINGDOWN, SOURCE_UP: _MC_SPRINTING, SOURCE_DOWN: _MC_CROUCHING, SOURCE_LEFT: _MC_UTILITY}
+
+# LED patterns
+#                 _MC_DEFAULT    _MC_FLYINGDOWN      _MC_SPRINTING    _MC_CROUCHING    _MC_UTILITY
+_MC_COLORS     = [(0, 255, 255), (255, 0, 255),      (255, 128, 128), (255, 165, 0),   (255, 255, 0)]
+#                 cyan           magenta             pink             orange           yellow
+_MC_PATTERNS   = [solidPattern(color) for color in _MC_COLORS]
 
 class PiperCommandCenter:
-    def __init__(self, joy_x_pin=board.A4, joy_y_pin=board.A3, joy_z_pin=board.D2, joy_gnd_pin=board.A5, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, mc_top_pin=board.SCK, mc_middle_pin=board.MOSI, mc_bottom_pin=board.MISO, outputScale=20.0, deadbandCutoff=0.1, weight=0.2):
-        self.x_axis = PiperJoystickAxis(joy_x_pin, outputScale=outputScale, deadbandCutoff=deadbandCutoff, weight=weight)
-        self.y_axis = PiperJoystickAxis(joy_y_pin, outputScale=outputScale, deadbandCutoff=deadbandCutoff, weight=weight)
-        self.joy_z = PiperJoystickZ(joy_z_pin)
-        self.dpad = PiperDpad(dpad_l_pin, dpad_r_pin, dpad_u_pin, dpad_d_pin)
-        self.minecraftbuttons = PiperMineCraftButtons(mc_top_pin, mc_middle_pin, mc_bottom_pin)
+    def __init__(self, joy_x_pin=board.A4, joy_y_pin=board.A3, joy_z_pin=board.D2, joy_gnd_pin=board.A5, dpad_l_pin=board.D3, dpad_r_pin=board.D4, dpad_u_pin=board.D1, dpad_d_pin=board.D0, mc_top_pin=board.SCK, mc_middle_pin=board.MOSI, mc_bottom_pin=board.MISO, outputScale=20.0, deadbandCutoff=0.1, weight=0.2, lookupBits=10, oversample=1, smoothing=2, hysteresis=0.02, backgroundScan=True, ledStrips=(), keyboardNKRO=False, minecraftNKRO=True, hidQueue=True, wiringDetector=True, serialCommands=False):
+        self.x_axis = PiperJoystickAxis(joy_x_pin, outputScale=outputScale * (1 << _POINTER_BITS), deadbandCutoff=deadbandCutoff, weight=weight, lookupBits=lookupBits, oversample=oversample, smoothing=smoothing, hysteresis=hysteresis)
+        self.y_axis = PiperJoystickAxis(joy_y_pin, outputScale=outputScale * (1 << _POINTER_BITS), deadbandCutoff=deadbandCutoff, weight=weight, lookupBits=lookupBits, oversample=oversample, smoothing=smoothing, hysteresis=hysteresis)
+        self.events = PiperEventQueue()
+        self.buttons = newButtons(events=self.events, background=backgroundScan)
+        self.joy_z = PiperJoystickZ(joy_z_pin, buttons=self.buttons)
+        self.dpad = PiperDpad(dpad_l_pin, dpad_r_pin, dpad_u_pin, dpad_d_pin, buttons=self.buttons)
+        self.minecraftbuttons = PiperMineCraftButtons(mc_top_pin, mc_middle_pin, mc_bottom_pin, buttons=self.buttons)
 
         # Drive pin low if requested for easier joystick wiring
         if joy_gnd_pin is not None:
@@ -345,401 +373,367 @@ class PiperCommandCenter:
             self.joystick_gnd.direction = Direction.OUTPUT
             self.joystick_gnd.value = 0
 
-        self.keyboard = Keyboard(usb_hid.devices)
-        self.keyboard_layout = KeyboardLayoutUS(self.keyboard)  # Change for non-US
-        self.mouse = Mouse(usb_hid.devices)
+        # Reports go through a queue that never blocks the loop (unless
+        # hidQueue is False, then every send waits for the host)
+        if hidQueue:
+            self.hidQueue = PiperHIDQueue(usb_hid.devices, interval=_HID_INTERVAL)
+            devices = self.hidQueue.devices
+        else:
+            self.hidQueue = None
+            devices = usb_hid.devices
+
+        # Key presses and releases are collected into one report per pass,
+        # typing through keyboard_layout goes out immediately
+        self.keyboard = PiperKeyboard(devices)
+        self.keyboard_layout = KeyboardLayoutUS(Keyboard(usb_hid.devices))  # Change for non-US
+        self.mouse = PiperMouse(devices)
+        self.pointer = PiperPointer(self.mouse, fractionBits=_POINTER_BITS)
+
+        # Only there if boot.py enabled them
+        try:
+            self.gamepad = PiperGamepad(devices)
+        except ValueError:
+            self.gamepad = None
+        try:
+            self.nkroKeyboard = PiperNKROKeyboard(devices)
+        except ValueError:
+            self.nkroKeyboard = None
+
+        # Keyboard and Minecraft modes each use the N-key rollover keyboard
+        # if asked to and it is there, otherwise the 6 key boot keyboard
+        self.kbKeyboard = self.keyboard
+        if keyboardNKRO and self.nkroKeyboard is not None:
+            self.kbKeyboard = self.nkroKeyboard
+        self.mcKeyboard = self.keyboard
+        if minecraftNKRO and self.nkroKeyboard is not None:
+            self.mcKeyboard = self.nkroKeyboard
+        self.axisRange = int(outputScale) << _POINTER_BITS
 
         # State
         #
-        self.state = _UNWIRED
-        self.timer = time.monotonic()
-        self.last_mouse_wheel = time.monotonic()
-        self.last_mouse = time.monotonic()
+        self.dx = 0
+        self.dy = 0
+        self.dwheel = 0
         self.dotstar_led = adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1)
-        self.dotstar_led.brightness = 0.2
-        self.up_pressed = False
-        self.down_pressed = False
-        self.left_pressed = False
-        self.right_pressed = False
+        self.led = PiperLED(self.dotstar_led, brightness=0.2, patterns=[_UNWIRED_PATTERN, _JOYSTICK_PATTERN, _KEYBOARD_PATTERN, _GAMEPAD_PATTERN] + _MC_PATTERNS, strips=ledStrips)
+        self.joy_levels = 0
         self.mc_mode = _MC_DEFAULT
-        self.mc_flyingdown_req = False
-        self.mc_sprinting_req = False
-        self.mc_crouching_req = False
-        self.mc_utility_req = False
-
-#    def process_repl_cmds(self):
-#        # Assume that the command will be pasted, because input()
-#        # will block until end of line
-#        #
-#        if supervisor.runtime.serial_bytes_available:
-#            cmd = input()
-#            exec(cmd)
+        self.mc_request = _MC_DEFAULT
+
+        # Button mapping tables, compiled once
+        #
+        layouts = dict(_LAYOUTS)
+        layouts.update(loadLayouts())
+        keyboards = {"keyboard": self.kbKeyboard}
+        for name in _MC_LAYOUTS + _MC_MODIFIER_LAYOUTS:
+            keyboards[name] = self.mcKeyboard
+        self.buttonMap = PiperButtonMap(_SOURCES, layouts, keyboard=self.keyboard, mouse=self.mouse, keyboards=keyboards)
+
+        # The joystick counts as wired once the wiring detector has found it
+        # centered (see piper_wiring.py), or without it once it has read
+        # centered for half a second
+        #
+        if wiringDetector:
+            self.wiring = PiperWiringDetector((self.x_axis, self.y_axis))
+            wired = PiperTransition(self._joystickWired, _JOYSTICK)
+        else:
+            self.wiring = None
+            wired = PiperTransition(self._joystickCentered, _JOYSTICK, holdTime=0.5)
+
+        # Mode switching: hold the joystick button for a second to go from
+        # mouse to keyboard to mouse, plus the bottom Minecraft button to go
+        # from keyboard to Minecraft or from mouse to gamepad, and everything
+        # at once to leave Minecraft
+        #
+        self.stateMachine = PiperStateMachine(_UNWIRED)
+        self.stateMachine.addState(_UNWIRED, self._unwiredMode, (
+            wired,
+        ))
+        self.stateMachine.addState(_JOYSTICK, self._joystickMode, (
+            PiperTransition(self._keyboardRequested, _KEYBOARD, holdTime=1.0, action=self.releaseJoystickHID),
+            PiperTransition(self._gamepadRequested, _GAMEPAD, holdTime=1.0, action=self.releaseJoystickHID),
+        ), guard=self.joy_z.zPressed)
+        self.stateMachine.addState(_KEYBOARD, self._keyboardMode, (
+            PiperTransition(self._noModifier, _JOYSTICK, holdTime=1.0, action=self.releaseKeyboardHID),
+            PiperTransition(self.minecraftbuttons.bottomPressed, _MINECRAFT, holdTime=1.0, action=self.releaseKeyboardHID),
+        ), guard=self.joy_z.zPressed)
+        self.stateMachine.addState(_MINECRAFT, self._minecraftMode, (
+            PiperTransition(self._dpadAllPressed, _JOYSTICK, holdTime=1.0, action=self.releaseMinecraftHID),
+        ), guard=self.joy_z.zPressed)
+        self.stateMachine.addState(_GAMEPAD, self._gamepadMode, (
+            PiperTransition(None, _JOYSTICK, holdTime=1.0, action=self.releaseGamepadHID),
+        ), guard=self.joy_z.zPressed)
+
+        # After a restart, carry on where the last session stopped
+        #
+        self.snapshot = PiperSnapshot()
+        self._restore()
+
+        # Each kind of work runs at its own rate
+        #
+        self.scheduler = PiperScheduler()
+        self.inputTask = self.scheduler.addTask(self._inputTask, _INPUT_PERIOD)
+        self.scheduler.addTask(self._wheelTask, _WHEEL_PERIOD)
+        self.scheduler.addTask(self._hidTask, _HID_PERIOD)
+        self.scheduler.addTask(self._ledTask, _LED_PERIOD)
+        self.scheduler.addTask(self._snapshotTask, _SNAPSHOT_PERIOD)
+        self.serialLine = ""
+        if serialCommands:
+            self.scheduler.addTask(self._serialTask, _SERIAL_PERIOD)
+
+    @property
+    def state(self):
+        return self.stateMachine.state
+
+    @state.setter
+    def state(self, state):
+        self.stateMachine.state = state
 
     def releaseJoystickHID(self):
-        self.mouse.release(Mouse.LEFT_BUTTON)
-        self.mouse.release(Mouse.RIGHT_BUTTON)
+        self.mouse.release_all()
+        self.dwheel = 0
 
     def releaseKeyboardHID(self):
-        self.keyboard.release(Keycode.UP_ARROW)
-        self.keyboard.release(Keycode.DOWN_ARROW)
-        self.keyboard.release(Keycode.LEFT_ARROW)
-        self.keyboard.release(Keycode.RIGHT_ARROW)
-        self.keyboard.release(Keycode.SPACE)
-        self.keyboard.release(Keycode.X)
-        self.keyboard.release(Keycode.Z)
-        self.keyboard.release(Keycode.C)
+        self.kbKeyboard.release_all()
+        self.joy_levels = 0
 
     def releaseMinecraftHID(self):
-        self.mouse.release(Mouse.LEFT_BUTTON)
-        self.mouse.release(Mouse.MIDDLE_BUTTON)
-        self.mouse.release(Mouse.RIGHT_BUTTON)
-
-        self.keyboard.release(Keycode.A)
-        self.keyboard.release(Keycode.CONTROL)
-        self.keyboard.release(Keycode.D)
-        self.keyboard.release(Keycode.E)
-        self.keyboard.release(Keycode.ESCAPE)
-        self.keyboard.release(Keycode.F5)
-        self.keyboard.release(Keycode.LEFT_SHIFT)
-        self.keyboard.release(Keycode.Q)
-        self.keyboard.release(Keycode.S)
-        self.keyboard.release(Keycode.SPACE)
-        self.keyboard.release(Keycode.W)
+        self.mouse.release_all()
+        self.mcKeyboard.release_all()
 
-    def process(self):
-        #self.process_repl_cmds()
+    def releaseGamepadHID(self):
+        self.gamepad.release_all()
 
-        # Call the debouncing library frequently
-        self.joy_z.update()
-        self.dpad.update()
-        self.minecraftbuttons.update()
+    # Transition conditions (all but _joystickCentered are only checked while
+    # the joystick button is held)
+    #
+    def _joystickCentered(self):
+        return self.dx == 0 and self.dy == 0
 
-        dx = self.x_axis.readJoystickAxis()
-        dy = self.y_axis.readJoystickAxis()
+    def _joystickWired(self):
+        return self.wiring.centered
 
-        # Command Center State Machine
+    def _noModifier(self):
+        return not self.minecraftbuttons.bottomPressed()
+
+    # Without a gamepad the bottom Minecraft button makes no difference when
+    # leaving mouse mode
+    #
+    def _keyboardRequested(self):
+        return self.gamepad is None or not self.minecraftbuttons.bottomPressed()
+
+    def _gamepadRequested(self):
+        return self.gamepad is not None and self.minecraftbuttons.bottomPressed()
+
+    def _dpadAllPressed(self):
+        return self.dpad.upPressed() and self.dpad.downPressed() and self.dpad.leftPressed() and self.dpad.rightPressed()
+
+    # Run the selected layout's actions for this pass's button events
+    #
+    def _dispatchButtons(self, layout):
+        self.buttonMap.select(layout)
+        events = self.events
+        for i in range(events.count):
+            event = events.event(i)
+            self.buttonMap.dispatch(event >> 1, event & PRESSED)
+
+    # Same for the joystick as four arrow buttons, pressed whenever it is
+    # outside the deadband in that direction
+    #
+    def _dispatchJoystick(self):
+        levels = 0
+        if self.dx < 0:
+            levels = 1
+        elif self.dx > 0:
+            levels = 2
+        if self.dy < 0:
+            levels |= 4
+        elif self.dy > 0:
+            levels |= 8
+
+        changed = levels ^ self.joy_levels
+        if changed:
+            self.joy_levels = levels
+            for bit in range(4):
+                if changed & (1 << bit):
+                    self.buttonMap.dispatch(_JOY_LEFT + bit, levels & (1 << bit))
+
+    # Per mode handling, only the active mode's handler runs
+    #
+    def _unwiredMode(self):
+        self.led.play(_UNWIRED_PATTERN)
+        if self.wiring is not None:
+            self.wiring.update()
+
+    def _joystickMode(self):
+        self.led.play(_JOYSTICK_PATTERN)
+
+        # Determine mouse wheel direction, _wheelTask turns it
         #
-        if self.state == _UNWIRED:
-            self.dotstar_led[0] = ((time.monotonic_ns() >> 23) % 256, 0, 0)
-            if dx == 0 and dy == 0:
-                self.state = _WAITING
-                #print("Transition to WAITING")
-                self.timer = time.monotonic()
-        elif self.state == _WAITING:
-            self.dotstar_led[0] = ((time.monotonic_ns() >> 23) % 256, 0, 0)
-            if dx != 0 or dy != 0:
-                #print("Transition to UNWIRED")
-                self.state = _UNWIRED
-            else:
-                if time.monotonic() - self.timer > 0.5:
-                    #print("Transition to JOYSTICK")
-                    self.state = _JOYSTICK
-        elif self.state == _JOYSTICK:
-            self.dotstar_led[0] = (0, 255, 0)
-            if self.joy_z.zPressed():
-                self.timer = time.monotonic()
-                #print("Transition to JWAITING")
-                self.state = _JWAITING
-        elif self.state == _JWAITING:
-            if not self.joy_z.zPressed():
-                #print("Transition to JOYSTICK")
-                self.state = _JOYSTICK
-            else:
-                if time.monotonic() - self.timer > 1.0:
-                    #print("Transition to KEYBOARD")
-                    self.state = _KEYBOARD
-                    self.releaseJoystickHID()
-        elif self.state == _KEYBOARD:
-            self.dotstar_led[0] = (0, 0, 255)
-            if self.joy_z.zPressed() and not self.minecraftbuttons.bottomPressed():
-                self.timer = time.monotonic()
-                #print("Transition to KWAITING_TO_J")
-                self.state = _KWAITING_TO_J
-            elif self.joy_z.zPressed() and self.minecraftbuttons.bottomPressed():
-                self.timer = time.monotonic()
-                #print("Transition to KWAITING_TO_MC")
-                self.state = _KWAITING_TO_MC
-        elif self.state == _KWAITING_TO_J:
-            if not self.joy_z.zPressed() or self.minecraftbuttons.bottomPressed():
-                #print("Transition to KEYBOARD")
-                self.state = _KEYBOARD
-                self.up_pressed = False
-                self.down_pressed = False
-                self.left_pressed = False
-                self.right_pressed = False
-            else:
-                if time.monotonic() - self.timer > 1.0:
-                    #print("Transition to JOYSTICK")
-                    self.state = _JOYSTICK
-                    self.releaseKeyboardHID()
-        elif self.state == _KWAITING_TO_MC:
-            if not self.joy_z.zPressed() or not self.minecraftbuttons.bottomPressed():
-                #print("Transition to KEYBOARD")
-                self.state = _KEYBOARD
-                self.up_pressed = False
-                self.down_pressed = False
-                self.left_pressed = False
-                self.right_pressed = False
-            else:
-                if time.monotonic() - self.timer > 1.0:
-                    #print("Transition to MINECRAFT")
-                    self.state = _MINECRAFT
-                    self.releaseKeyboardHID()
-        elif self.state == _MINECRAFT:
-            if self.mc_mode == _MC_DEFAULT :
-                self.dotstar_led[0] = (0, 255, 255) # cyan
-            elif self.mc_mode == _MC_FLYINGDOWN:
-                self.dotstar_led[0] = (255, 0, 255) # magenta
-            elif self.mc_mode == _MC_SPRINTING:
-                self.dotstar_led[0] = (255, 128, 128) # pink
-            elif self.mc_mode == _MC_CROUCHING:
-                self.dotstar_led[0] = (255, 165, 0) # orange
-            elif self.mc_mode == _MC_UTILITY:
-                self.dotstar_led[0] = (255, 255, 0) # yellow
-
-            if self.joy_z.zPressed() and self.dpad.upPressed() and self.dpad.downPressed() and self.dpad.leftPressed() and self.dpad.rightPressed():
-                self.timer = time.monotonic()
-                #print("Transition to MWAITING")
-                self.state = _MWAITING
-        elif self.state == _MWAITING:
-            if not self.joy_z.zPressed() or not self.dpad.upPressed() or not self.dpad.downPressed() or not self.dpad.leftPressed() or not self.dpad.rightPressed():
-                #print("Transition to MINECRAFT")
-                self.state = _MINECRAFT
-            else:
-                if time.monotonic() - self.timer > 1.0:
-                    #print("Transition to JOYSTICK")
-                    self.state = _JOYSTICK
-                    self.releaseMinecraftHID()
-
-        # Command Center Joystick Handling
+        dwheel = 0
+        if self.dpad.upPressed():
+            dwheel=-1
+        elif self.dpad.downPressed():
+            dwheel=1
+        self.dwheel = dwheel
+
+        # Mouse movement, at the same speed however fast the loop runs
         #
-        if self.state == _JOYSTICK or self.state == _JWAITING:
-            # Determine mouse wheel direction
-            #
-            dwheel = 0
-            if self.dpad.upPressed():
-                dwheel=-1
-            elif self.dpad.downPressed():
-                dwheel=1
-
-            # Initial quick and dirty mouse movement pacing
-            #
-            if time.monotonic() - self.last_mouse > 0.005:
-                self.last_mouse = time.monotonic()
-                self.mouse.move(x=dx, y=dy)
-
-            # Initial quick and dirty mouse scroll wheel pacing
-            #
-            if time.monotonic() - self.last_mouse_wheel > 0.1:
-                self.last_mouse_wheel = time.monotonic()
-                self.mouse.move(wheel=dwheel)
-
-            if self.dpad.leftPressedEvent():
-                    self.mouse.press(Mouse.LEFT_BUTTON)
-            elif self.dpad.leftReleasedEvent():
-                    self.mouse.release(Mouse.LEFT_BUTTON)
-
-            if self.dpad.rightPressedEvent():
-                    self.mouse.press(Mouse.RIGHT_BUTTON)
-            elif self.dpad.rightReleasedEvent():
-                    self.mouse.release(Mouse.RIGHT_BUTTON)
-
-        # Command Center Keyboard Handling
+        self.pointer.update(self.dx, self.dy)
+
+        self._dispatchButtons("mouse")
+
+    def _keyboardMode(self):
+        self.led.play(_KEYBOARD_PATTERN)
+
+        self._dispatchButtons("keyboard")
+        self._dispatchJoystick()
+
+    def _minecraftMode(self):
+        self.led.play(_MC_PATTERNS[self.mc_mode])
+
+        # Modifier button: while it's held the joystick button and DPAD pick
+        # the mode to switch to when it is released
+        #
+        modifier = self.minecraftbuttons.bottomPressed()
+        events = self.events
+        for i in range(events.count):
+            event = events.event(i)
+            if modifier:
+                if event & PRESSED and event >> 1 in _MC_REQUESTS:
+                    self.mc_request = _MC_REQUESTS[event >> 1]
+            elif event == SOURCE_BOTTOM << 1 | RELEASED:
+                self._setMinecraftMode(self.mc_request)
+                self.mc_request = _MC_DEFAULT
+
+        # Joystick functionality for mouse movement is always active
+        #
+        self.pointer.update(self.dx, self.dy)
+
+        # The modifier changes what the other buttons do
         #
-        if self.state == _KEYBOARD or self.state == _KWAITING_TO_J or self.state == _KWAITING_TO_MC:
-            if self.dpad.upPressedEvent():
-                self.keyboard.press(Keycode.SPACE)
-            elif self.dpad.upReleasedEvent():
-                self.keyboard.release(Keycode.SPACE)
-
-            if self.dpad.downPressedEvent():
-                self.keyboard.press(Keycode.X)
-            elif self.dpad.downReleasedEvent():
-                self.keyboard.release(Keycode.X)
-
-            if self.dpad.leftPressedEvent():
-                self.keyboard.press(Keycode.Z)
-            elif self.dpad.leftReleasedEvent():
-                self.keyboard.release(Keycode.Z)
-
-            if self.dpad.rightPressedEvent():
-                self.keyboard.press(Keycode.C)
-            elif self.dpad.rightReleasedEvent():
-                self.keyboard.release(Keycode.C)
-
-            if dx == 0:
-                if self.left_pressed:
-                    self.left_pressed = False
-                    self.keyboard.release(Keycode.LEFT_ARROW)
-                if self.right_pressed:
-                    self.right_pressed = False
-                    self.keyboard.release(Keycode.RIGHT_ARROW)
-            elif dx > 0:
-                if self.left_pressed:
-                    self.left_pressed = False
-                    self.keyboard.release(Keycode.LEFT_ARROW)
-                if not self.right_pressed:
-                    self.right_pressed = True
-                    self.keyboard.press(Keycode.RIGHT_ARROW)
-            elif dx < 0:
-                if not self.left_pressed:
-                    self.left_pressed = True
-                    self.keyboard.press(Keycode.LEFT_ARROW)
-                if self.right_pressed:
-                    self.right_pressed = False
-                    self.keyboard.release(Keycode.RIGHT_ARROW)
-
-            if dy == 0:
-                if self.up_pressed:
-                    self.up_pressed = False
-                    self.keyboard.release(Keycode.UP_ARROW)
-                if self.down_pressed:
-                    self.down_pressed = False
-                    self.keyboard.release(Keycode.DOWN_ARROW)
-            elif dy < 0:
-                if not self.up_pressed:
-                    self.up_pressed = True
-                    self.keyboard.press(Keycode.UP_ARROW)
-                if self.down_pressed:
-                    self.down_pressed = False
-                    self.keyboard.release(Keycode.DOWN_ARROW)
-            elif dy > 0:
-                if self.up_pressed:
-                    self.up_pressed = False
-                    self.keyboard.release(Keycode.UP_ARROW)
-                if not self.down_pressed:
-                    self.down_pressed = True
-                    self.keyboard.press(Keycode.DOWN_ARROW)
-
-        # Command Center Minecraft Handling
+        if modifier:
+            self._dispatchButtons(_MC_MODIFIER_LAYOUTS[self.mc_mode])
+        else:
+            self._dispatchButtons(_MC_LAYOUTS[self.mc_mode])
+
+    # Sprinting and crouching hold their key down for as long as they last
+    #
+    def _setMinecraftMode(self, mode):
+        self.releaseMinecraftHID()
+        self.mc_mode = mode
+        if mode == _MC_SPRINTING:
+            self.mcKeyboard.press(Keycode.CONTROL)
+        elif mode == _MC_CROUCHING:
+            self.mcKeyboard.press(Keycode.LEFT_SHIFT)
+
+    # Every button and both axes, sent by _hidTask as one report
+    #
+    def _gamepadMode(self):
+        self.led.play(_GAMEPAD_PATTERN)
+
+        self.gamepad.set_buttons(self.buttons.state)
+        self.gamepad.move_joysticks(self.dx * _GAMEPAD_AXIS // self.axisRange, self.dy * _GAMEPAD_AXIS // self.axisRange)
+
+    # Periodic tasks, run by the scheduler
+    #
+    def _inputTask(self):
+        # Events are only kept for one pass
+        self.events.clear()
+
+        # Debounce all the buttons at once, frequently
+        self.buttons.update()
+
+        self.dx = self.x_axis.readJoystickAxis()
+        self.dy = self.y_axis.readJoystickAxis()
+
+        # Command Center State Machine
         #
-        if self.state == _MINECRAFT:
-            # Modifier button
-            #
-            if self.minecraftbuttons.bottomPressed():
-                if self.joy_z.zPressedEvent():
-                    self.mc_flyingdown_req = True
-                    self.mc_sprinting_req  = False
-                    self.mc_crouching_req  = False
-                    self.mc_utility_req    = False
-                elif self.dpad.upPressedEvent():
-                    self.mc_flyingdown_req = False
-                    self.mc_sprinting_req  = True
-                    self.mc_crouching_req  = False
-                    self.mc_utility_req    = False
-                elif self.dpad.downPressedEvent():
-                    self.mc_flyingdown_req = False
-                    self.mc_sprinting_req  = False
-                    self.mc_crouching_req  = True
-                    self.mc_utility_req    = False
-                elif self.dpad.leftPressedEvent():
-                    self.mc_flyingdown_req = False
-                    self.mc_sprinting_req  = False
-                    self.mc_crouching_req  = False
-                    self.mc_utility_req    = True
-
-            if self.minecraftbuttons.bottomReleasedEvent():
-                self.releaseMinecraftHID()
-                if self.mc_flyingdown_req:
-                    self.mc_mode = _MC_FLYINGDOWN
-                    self.mc_flyingdown_req = False
-                elif self.mc_sprinting_req:
-                    self.mc_mode = _MC_SPRINTING
-                    self.mc_sprinting_req = False
-                    self.keyboard.press(Keycode.CONTROL)
-                elif self.mc_crouching_req:
-                    self.mc_mode = _MC_CROUCHING
-                    self.mc_crouching_req = False
-                    self.keyboard.press(Keycode.LEFT_SHIFT)
-                elif self.mc_utility_req:
-                    self.mc_mode = _MC_UTILITY
-                    self.mc_utility_req = False
-                else:
-                    self.mc_mode = _MC_DEFAULT
-
-            # Joystick functionality for mouse movement is always active
-            #
-            # Mouse movement is paced - may need to adjust
-            #
-            if time.monotonic() - self.last_mouse > 0.005:
-                self.last_mouse = time.monotonic()
-                self.mouse.move(x=dx, y=dy)
-
-            # Top and bottom buttons changed by mod key in default mode
-            #
-            if self.mc_mode == _MC_DEFAULT and self.minecraftbuttons.bottomPressed():
-                if self.minecraftbuttons.topPressedEvent():
-                    self.keyboard.press(Keycode.Q)
-                elif self.minecraftbuttons.topReleasedEvent():
-                    self.keyboard.release(Keycode.Q)
-
-                if self.minecraftbuttons.middlePressedEvent():
-                    self.mouse.press(Mouse.MIDDLE_BUTTON)
-                elif self.minecraftbuttons.middleReleasedEvent():
-                    self.mouse.release(Mouse.MIDDLE_BUTTON)
-            else:
-                if self.minecraftbuttons.topPressedEvent():
-                    self.mouse.press(Mouse.LEFT_BUTTON)
-                elif self.minecraftbuttons.topReleasedEvent():
-                    self.mouse.release(Mouse.LEFT_BUTTON)
-
-                if self.minecraftbuttons.middlePressedEvent():
-                    self.mouse.press(Mouse.RIGHT_BUTTON)
-                elif self.minecraftbuttons.middleReleasedEvent():
-                    self.mouse.release(Mouse.RIGHT_BUTTON)
-
-            # Don't generate key presses for buttons if modifier key is pressed
-            #
-            if not self.minecraftbuttons.bottomPressed():
-                # Joystick button changes based on minecraft mode
-                #
-                if self.joy_z.zPressedEvent():
-                    self.keyboard.press(_MC_JOYSTICK_Z[self.mc_mode])
-                elif self.joy_z.zReleasedEvent():
-                    self.keyboard.release(_MC_JOYSTICK_Z[self.mc_mode])
-
-                # DPAD buttons special in utility mode
-                #
-                if self.mc_mode == _MC_UTILITY:
-                    if self.dpad.upPressedEvent():
-                        self.mouse.move(wheel=-1)
-
-                    if self.dpad.downPressedEvent():
-                        self.mouse.move(wheel=1)
-
-                    if self.dpad.leftPressedEvent():
-                        self.keyboard.press(Keycode.E)
-                    elif self.dpad.leftReleasedEvent():
-                        self.keyboard.release(Keycode.E)
-
-                    if self.dpad.rightPressedEvent():
-                        self.keyboard.press(Keycode.ESCAPE)
-                    elif self.dpad.rightReleasedEvent():
-                        self.keyboard.release(Keycode.ESCAPE)
-                else:
-                    if self.dpad.upPressedEvent():
-                        self.keyboard.press(Keycode.W)
-                    elif self.dpad.upReleasedEvent():
-                            self.keyboard.release(Keycode.W)
-
-                    if self.dpad.downPressedEvent():
-                        self.keyboard.press(Keycode.S)
-                    elif self.dpad.downReleasedEvent():
-                        self.keyboard.release(Keycode.S)
-
-                    if self.dpad.leftPressedEvent():
-                        self.keyboard.press(Keycode.A)
-                    elif self.dpad.leftReleasedEvent():
-                        self.keyboard.release(Keycode.A)
-
-                    if self.dpad.rightPressedEvent():
-                        self.keyboard.press(Keycode.D)
-                    elif self.dpad.rightReleasedEvent():
-                        self.keyboard.release(Keycode.D)
+        self.stateMachine.process()
+
+    def _wheelTask(self):
+        if self.dwheel:
+            self.mouse.move(wheel=self.dwheel)
+
+    # One report per keyboard, mouse and gamepad for everything the other
+    # tasks changed
+    #
+    def _hidTask(self):
+        self.keyboard.flush()
+        if self.nkroKeyboard is not None:
+            self.nkroKeyboard.flush()
+        self.mouse.flush()
+        if self.gamepad is not None:
+            self.gamepad.flush()
+
+    # The animation only gets the time left before the next input scan
+    #
+    def _ledTask(self):
+        self.led.update(self.inputTask.due)
+
+    # Python statements typed or pasted on the serial console, one per line.
+    # Only the characters already received are read (input() would wait for
+    # the end of the line), so the other tasks keep running while a command
+    # is typed.
+    #
+    def _serialTask(self):
+        while supervisor.runtime.serial_bytes_available:
+            char = sys.stdin.read(1)
+            if char not in "\r\n":
+                self.serialLine += char
+                continue
+            cmd = self.serialLine
+            self.serialLine = ""
+            if cmd:
+                try:
+                    exec(cmd)
+                except Exception as e:
+                    print(repr(e))
+
+    # The last session's joystick response and Minecraft mode and, if it
+    # found the joystick wired, its mode straight away rather than waiting
+    # for the joystick to settle (see piper_snapshot.py)
+    #
+    def _restore(self):
+        snapshot = self.snapshot
+        if not snapshot.load():
+            return
+        snapshot.restoreAxes(self.x_axis, self.y_axis)
+        if snapshot.subMode < len(_MC_PATTERNS):
+            self.mc_mode = snapshot.subMode
+        if not snapshot.wired:
+            return
+        state = snapshot.state
+        if state == _MINECRAFT:
+            self._setMinecraftMode(self.mc_mode)
+        elif state not in (_KEYBOARD, _GAMEPAD) or (state == _GAMEPAD and self.gamepad is None):
+            state = _JOYSTICK
+        self.state = state
+
+    # Being past the unwired state shows the joystick is wired
+    #
+    def _snapshotTask(self):
+        state = self.state
+        self.snapshot.save(state, self.mc_mode, state != _UNWIRED, self.x_axis, self.y_axis)
+
+    def process(self):
+        self.scheduler.process()
+
+    # Run the tasks for ever, as asyncio tasks that sleep until they are due
+    # when the asyncio library is installed, otherwise by calling process()
+    # in a loop
+    #
+    def run(self):
+        if PiperAsyncRuntime is not None:
+            PiperAsyncRuntime(self.scheduler).run()
+        while True:
+            self.process()
 
 ################################################################################
 # Handle all built-in Piper Command Center functionality:
+# (code.py runs as __main__ on the board, importing it from the host
+# simulator only defines the classes)
 #
-pcc = PiperCommandCenter()
-while True:
-    pcc.process()
\ No newline at end of file
+if __name__ == "__main__":
+    pcc = PiperCommandCenter()
+    pcc.run()
\ No newline at end of file
@@ -0,0 +1,95 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Cooperative asyncio runtime for the tasks of a PiperScheduler.
+#
+# PiperScheduler.process() has to be called in a loop that never stops, so
+# the CPU spins even when no task is due for milliseconds. PiperAsyncRuntime
+# runs the same tasks as asyncio tasks instead: each one runs its function,
+# works out its next deadline on the same fixed grid (skipping and counting
+# the deadlines it missed, exactly like process()) and then awaits
+# asyncio.sleep until then. While every task is asleep the event loop waits
+# for the next deadline rather than spinning, and no task can be held up by
+# more than one run of another.
+#
+# Tasks that come due on the same millisecond tick run in the order they were
+# added, as with process(): a task that wakes while one added before it is
+# also due yields until that one has run. So the LED task, which defers its
+# frame while the input task is due, sees the input task already done for
+# the tick, and reports are built from the inputs read on the same tick.
+#
+# Needs the asyncio library (CircuitPython 7 and later, from the bundle).
+#
+# *** Usage:
+#
+# from piper_async import PiperAsyncRuntime
+#
+# scheduler = PiperScheduler()
+# scheduler.addTask(self._inputTask, 0.001)
+# scheduler.addTask(self._ledTask, 0.02)
+# PiperAsyncRuntime(scheduler).run()
+#
+################################################################################
+import asyncio
+from piper_clock import ticks_add, ticks_diff, ticks_ms
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+class PiperAsyncRuntime:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    async def _runTask(self, index):
+        scheduler = self.scheduler
+        tasks = scheduler.tasks
+        task = tasks[index]
+        while True:
+            now = ticks_ms()
+            if ticks_diff(task.due, now) <= 0:
+                earlier = 0
+                while earlier < index:
+                    if ticks_diff(tasks[earlier].due, now) <= 0:
+                        await asyncio.sleep(0)
+                        earlier = 0
+                    else:
+                        earlier += 1
+                task.function()
+                due = ticks_add(task.due, task.period)
+                late = ticks_diff(now, due)
+                if late >= 0:
+                    missed = late // task.period + 1
+                    due = ticks_add(due, missed * task.period)
+                    task.missed += missed
+                    scheduler.missed += missed
+                task.due = due
+            else:
+                due = task.due
+            await asyncio.sleep(max(0, ticks_diff(due, ticks_ms())) / 1000)
+
+    async def main(self):
+        await asyncio.gather(*[asyncio.create_task(self._runTask(index)) for index in range(len(self.scheduler.tasks))])
+
+    def run(self):
+        asyncio.run(self.main())
@@ -0,0 +1,313 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Joystick axis: maps an analog input to a signed mouse-sized step through a
+# cubic response curve with a deadband around center.
+# See http://www.mimirgames.com/articles/games/joystick-input-and-using-deadbands/
+# for the motivation and theory
+#
+# Besides the exact float curve an axis can read through a lookup table of
+# 2^lookupBits buckets, or compute each sample in Q13 fixed point
+# (fixedPoint) with small integers only. _Q13_ONE is 1.0 for the integer
+# version of the response curve.
+#
+# Optionally each read goes through a filter stage first, all in integer
+# ADC counts: the mean of oversample readings, then an exponential moving
+# average (each read moves the output 1/2^smoothing of the way to the new
+# sample), then hysteresis around deadbandCutoff: the axis only leaves the
+# deadband once it is hysteresis beyond the cutoff and only returns once it
+# is hysteresis inside it, reading at least +/-1 in between. That stops ADC
+# noise at the edge of the deadband toggling the output between 0 and 1.
+# hysteresis has to be smaller than deadbandCutoff (ValueError otherwise).
+#
+# deinit() and reclaim() free and reopen the pin (see piper_resources.py);
+# in between the axis reads centered.
+#
+# *** Usage:
+#
+# from piper_axis import PiperJoystickAxis
+#
+# x_axis = PiperJoystickAxis(board.A4, outputScale=20, lookupBits=10)
+# dx = x_axis.readJoystickAxis()
+#
+################################################################################
+from analogio import AnalogIn
+from array import array
+from math import copysign
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+_Q13_ONE = 1 << 13
+
+# Read instead of the ADC while the axis's pin is deinitialized (e.g. lent
+# to user code), so the axis stays centered
+#
+class _CenteredPin:
+    value = 32768
+
+    def deinit(self):
+        pass
+
+_CENTERED = _CenteredPin()
+
+def _checkHysteresis(deadbandCutoff, hysteresis):
+    if hysteresis > 0 and hysteresis >= deadbandCutoff:
+        raise ValueError("hysteresis must be smaller than deadbandCutoff")
+
+class PiperJoystickAxis:
+    def __init__(self, pin, outputScale=20.0, deadbandCutoff=0.1, weight=0.2, lookupBits=None, fixedPoint=False, oversample=1, smoothing=0, hysteresis=0.0):
+        _checkHysteresis(deadbandCutoff, hysteresis)
+        self.pin = AnalogIn(pin)
+        self._pin = pin
+        self._outputScale = outputScale
+        self._deadbandCutoff = deadbandCutoff
+        self._weight = weight
+        self._lookupBits = lookupBits
+        self._fixedPoint = fixedPoint
+        self._oversample = oversample
+        self._smoothing = smoothing
+        self._hysteresis = hysteresis
+        self._rebuild()
+
+    def deinit(self):
+        self.pin.deinit()
+        self.pin = _CENTERED
+
+    # Open the pin again after deinit(), the filter starting from a centered
+    # stick (see piper_resources.py)
+    #
+    def reclaim(self):
+        self.pin = AnalogIn(self._pin)
+        self._average = 32768 << self._smoothing
+        self._engaged = False
+
+    # Changing any of the response curve parameters rebuilds the lookup table
+    # (if one is in use) so that readJoystickAxis() never has to check
+    #
+    @property
+    def outputScale(self):
+        return self._outputScale
+
+    @outputScale.setter
+    def outputScale(self, value):
+        self._outputScale = value
+        self._rebuild()
+
+    @property
+    def deadbandCutoff(self):
+        return self._deadbandCutoff
+
+    @deadbandCutoff.setter
+    def deadbandCutoff(self, value):
+        _checkHysteresis(value, self._hysteresis)
+        self._deadbandCutoff = value
+        self._rebuild()
+
+    @property
+    def weight(self):
+        return self._weight
+
+    @weight.setter
+    def weight(self, value):
+        self._weight = value
+        self._rebuild()
+
+    # None computes every sample exactly, otherwise the 16 bit ADC range is
+    # quantized into 2^lookupBits buckets
+    #
+    @property
+    def lookupBits(self):
+        return self._lookupBits
+
+    @lookupBits.setter
+    def lookupBits(self, value):
+        self._lookupBits = value
+        self._rebuild()
+
+    # Without a lookup table, compute each sample with small integers only
+    # (no float or long int objects) instead of the float curve
+    #
+    @property
+    def fixedPoint(self):
+        return self._fixedPoint
+
+    @fixedPoint.setter
+    def fixedPoint(self, value):
+        self._fixedPoint = value
+        self._rebuild()
+
+    # Filter stage: ADC readings averaged per read, EMA shift (0 is off) and
+    # hysteresis as a fraction of full scale like deadbandCutoff (0 is off).
+    # Hysteresis has to be smaller than deadbandCutoff, or the axis would
+    # have to cross center to return to 0.
+    #
+    @property
+    def oversample(self):
+        return self._oversample
+
+    @oversample.setter
+    def oversample(self, value):
+        self._oversample = value
+        self._rebuild()
+
+    @property
+    def smoothing(self):
+        return self._smoothing
+
+    @smoothing.setter
+    def smoothing(self, value):
+        self._smoothing = value
+        self._rebuild()
+
+    @property
+    def hysteresis(self):
+        return self._hysteresis
+
+    @hysteresis.setter
+    def hysteresis(self, value):
+        _checkHysteresis(self._deadbandCutoff, value)
+        self._hysteresis = value
+        self._rebuild()
+
+    # Evaluate the response curve once per bucket (at the bucket midpoint) so
+    # that reading the axis is just a shift and an index
+    #
+    def _rebuild(self):
+        self.alpha = self._Cubic(self._deadbandCutoff)
+
+        # Q13 fixed point constants. Every intermediate product stays below
+        # 2^30 so it fits a MicroPython small int.
+        #
+        self._cutoffQ = int(self._deadbandCutoff * _Q13_ONE)
+        self._weightQ = int(self._weight * _Q13_ONE)
+        self._alphaQ = self._CubicQ13(self._cutoffQ)
+        self._scaleQ = int(self._outputScale * (1 << 20) / (_Q13_ONE - self._alphaQ))
+
+        if self._lookupBits is None:
+            self._table = None
+        else:
+            self._shift = 16 - self._lookupBits
+            half = (1 << self._shift) >> 1
+            values = [self._scaleAxis((i << self._shift) + half) for i in range(1 << self._lookupBits)]
+            # 16 bit entries unless the curve goes beyond them
+            typecode = "h" if -32768 <= min(values) and max(values) <= 32767 else "l"
+            self._table = array(typecode, values)
+
+        # Filter state restarts from a centered stick
+        #
+        self._filtering = self._oversample > 1 or self._smoothing > 0 or self._hysteresis > 0
+        self._average = 32768 << self._smoothing
+        self._engageCount = int((self._deadbandCutoff + self._hysteresis) * 32768)
+        self._releaseCount = int((self._deadbandCutoff - self._hysteresis) * 32768)
+        self._engaged = False
+
+    # Cubic function to map input to output in such a way as to give more precision
+    # for lower values
+    def _Cubic(self, x):
+        return self._weight * x ** 3 + (1.0 - self._weight) * x
+
+    def _CubicQ13(self, x):
+        x3 = (((x * x) >> 13) * x) >> 13
+        return (self._weightQ * x3 + (_Q13_ONE - self._weightQ) * x) >> 13
+
+    # Eliminate the jump present in the deadband, but use the cubic function to give
+    # more precision to lower values
+    #
+    def _cubicScaledDeadband(self, x):
+        if abs(x) < self._deadbandCutoff:
+            return 0
+        else:
+            return (self._Cubic(x) - (copysign(1,x)) * self.alpha) / (1.0-self.alpha)
+
+    # The analog joystick output is an unsigned number 0 to 2^16, which we
+    # will scale to -1 to +1 for compatibility with the cubic scaled
+    # deadband article. This will then remap and return a value
+    # still in the range -1 to +1. Finally we multiply by the requested scaler
+    # an return an integer which can be used with the mouse HID.
+    #
+    def _scaleAxis(self, value):
+        return int(self._cubicScaledDeadband((value / 2**15) - 1)*self._outputScale)
+
+    # Same pipeline in Q13 fixed point: center, deadband, cubic and scale
+    # on the magnitude, then restore the sign so rounding matches int()
+    #
+    def _scaleAxisFixed(self, value):
+        x = (value - 32768) >> 2
+        if x < 0:
+            x = -x
+            if x < self._cutoffQ:
+                return 0
+            return -(((self._CubicQ13(x) - self._alphaQ) * self._scaleQ) >> 20)
+        if x < self._cutoffQ:
+            return 0
+        return ((self._CubicQ13(x) - self._alphaQ) * self._scaleQ) >> 20
+
+    # Oversample, smooth, then apply the hysteresis and the mapping. Kept in
+    # one method with locals as this runs twice per loop.
+    #
+    def _readFiltered(self):
+        pin = self.pin
+        value = pin.value
+        count = self._oversample
+        if count > 1:
+            for _ in range(count - 1):
+                value += pin.value
+            value //= count
+        shift = self._smoothing
+        if shift:
+            average = self._average
+            average += value - (average >> shift)
+            self._average = average
+            value = average >> shift
+        if self._hysteresis > 0:
+            offset = value - 32768
+            if offset < 0:
+                offset = -offset
+            if self._engaged:
+                if offset < self._releaseCount:
+                    self._engaged = False
+                    return 0
+            elif offset < self._engageCount:
+                return 0
+            else:
+                self._engaged = True
+        if self._table is not None:
+            result = self._table[value >> self._shift]
+        elif self._fixedPoint:
+            result = self._scaleAxisFixed(value)
+        else:
+            result = self._scaleAxis(value)
+        if result == 0 and self._engaged:
+            result = 1 if value >= 32768 else -1
+        return result
+
+    def readJoystickAxis(self):
+        if self._filtering:
+            return self._readFiltered()
+        if self._table is not None:
+            return self._table[self.pin.value >> self._shift]
+        if self._fixedPoint:
+            return self._scaleAxisFixed(self.pin.value)
+        return self._scaleAxis(self.pin.value)
@@ -30,6 +30,9 @@ import adafruit_mcp9808
 import adafruit_tcs34725
 import adafruit_dotstar
 
+# Joystick axes (TODO - add digital view support)
+from piper_axis import PiperJoystickAxis
+
 # TODO - Global lives where? Should be inserted by code generator
 digital_view = True
 
@@ -167,44 +170,6 @@ class piperDotStar:
         if (digital_view == True):
             print(chr(17), "DS|", str(color), chr(16), end="")
 
-################################################################################
-# This function allows a user to manage joystick handling themselves.
-# See http://www.mimirgames.com/articles/games/joystick-input-and-using-deadbands/
-# for the motivation and theory
-#
-# TODO - add digital view support here
-#
-class PiperJoystickAxis:
-    def __init__(self, pin, outputScale=20.0, deadbandCutoff=0.1, weight=0.2):
-        self.pin = AnalogIn(pin)
-        self.outputScale = outputScale
-        self.deadbandCutoff = deadbandCutoff
-        self.weight = weight
-        self.alpha = self._Cubic(self.deadbandCutoff)
-
-    # Cubic function to map input to output in such a way as to give more precision
-    # for lower values
-    def _Cubic(self, x):
-        return self.weight * x ** 3 + (1.0 - self.weight) * x
-
-    # Eliminate the jump present in the deadband, but use the cubic function to give
-    # more precision to lower values
-    #
-    def _cubicScaledDeadband(self, x):
-        if abs(x) < self.deadbandCutoff:
-            return 0
-        else:
-            return (self._Cubic(x) - (copysign(1,x)) * self.alpha) / (1.0-self.alpha)
-
-    # The analog joystick output is an unsigned number 0 to 2^16, which we
-    # will scale to -1 to +1 for compatibility with the cubic scaled
-    # deadband article. This will then remap and return a value
-    # still in the range -1 to +1. Finally we multiply by the requested scaler
-    # an return an integer which can be used with the mouse HID.
-    #
-    def readJoystickAxis(self):
-        return int(self._cubicScaledDeadband((self.pin.value / 2**15) - 1)*self.outputScale)
-
 ################################################################################
 # Blocky support functions
 #
@@ -0,0 +1,91 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Integer time base shared by the piper_* modules.
+#
+# CircuitPython floats are 30 bits, so time.monotonic() loses resolution as
+# uptime grows: after an hour it only moves in steps of about 1ms, after a
+# day in steps of 31ms, and after a week 250ms, which breaks anything paced
+# or timed in milliseconds on a controller that stays plugged in. Every
+# timer in the command center therefore works in integers instead:
+#
+#   monotonic_ns()   nanoseconds, exact for as long as the board runs
+#   nanoseconds(s)   a period given in seconds converted once, up front
+#   ticks_ms()       milliseconds wrapping at 2**29 (supervisor.ticks_ms()
+#                    where the firmware has it), a small int, so cheap to
+#                    store, for timestamps that only need to be compared
+#                    with ticks_diff() over less than a few days
+#   milliseconds(s)  a period in seconds as whole milliseconds, for
+#                    ticks_add() and ticks_diff()
+#
+# monotonic_ns() returns a long int, which CircuitPython allocates on the
+# heap, so checks made on every pass of the main loop use ticks_ms() and
+# leave nanoseconds to code that needs the resolution and runs less often.
+#
+# *** Usage:
+#
+# from piper_clock import monotonic_ns, nanoseconds, ticks_ms, ticks_diff
+#
+# hold = nanoseconds(0.5)
+# start = monotonic_ns()
+# ...
+# if monotonic_ns() - start > hold:
+#     ...
+#
+################################################################################
+import time
+
+try:
+    from supervisor import ticks_ms
+except ImportError:
+    ticks_ms = None
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+TICKS_PERIOD = 1 << 29
+TICKS_MASK = TICKS_PERIOD - 1
+_TICKS_HALF = TICKS_PERIOD // 2
+
+monotonic_ns = time.monotonic_ns
+
+def nanoseconds(seconds):
+    return round(seconds * 1000000000)
+
+def milliseconds(seconds):
+    return int(seconds * 1000 + 0.5)
+
+if ticks_ms is None:
+    def ticks_ms():
+        return (time.monotonic_ns() // 1000000) & TICKS_MASK
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MASK
+
+# Milliseconds from start to end, correct across the wrap as long as they
+# are less than TICKS_PERIOD / 2 apart
+#
+def ticks_diff(end, start):
+    diff = (end - start) & TICKS_MASK
+    return ((diff + _TICKS_HALF) & TICKS_MASK) - _TICKS_HALF
@@ -0,0 +1,393 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# HID output engines that send one report per pass of the main loop.
+#
+# adafruit_hid's Keyboard and Mouse send a USB report for every press(),
+# release() and move() call, and each send blocks until the host has polled
+# the previous one. PiperKeyboard and PiperMouse have the same interface, but
+# the calls only edit the report; flush() then sends it once, and only if it
+# differs from the last report sent. Handlers can therefore describe the keys
+# they want held this pass in any number of calls, and release_all() followed
+# by new presses (a mode switch) goes out as a single report. PiperMouse adds
+# up the moves of a pass and sends them with the buttons, so a pass costs at
+# most one mouse report (more only for motion beyond +/-127). Both count the
+# reports they have sent in reports.
+#
+# PiperPointer turns joystick deflection into pointer motion independent of
+# how fast the main loop runs. Velocities are given in 1/2^fractionBits
+# counts per period (so an axis with outputScale 20 << fractionBits moves up
+# to 20 counts every 5ms, whatever the loop rate), integrated over the time
+# that actually elapsed since the last update, and the fractional counts are
+# carried over to the next report rather than truncated away. Motion is sent
+# at most once per period, at most +/-127 per report; any excess is carried
+# too (up to one more report's worth, so a long stall cannot queue up a
+# runaway cursor).
+#
+# PiperNKROKeyboard is PiperKeyboard for the N-key rollover keyboard that
+# piper_usb.py registers in boot.py: press() and release() set and clear bits
+# of the key bitmap in place, so any number of keys can be held, and flush()
+# sends the bitmap once per pass like PiperKeyboard.
+#
+# PiperGamepad drives the gamepad piper_usb.py registers in boot.py the same
+# way: press()/release() take a bitmask of buttons (or set_buttons() all of
+# them), move_joysticks() sets both axes, and flush() sends the one report if
+# anything changed. Button changes go out straight away, a moving stick at
+# most once per period (as a host polling at that rate would see it).
+# Creating it raises ValueError if boot.py did not enable the gamepad.
+#
+# PiperHIDQueue sits between these and usb_hid so that flush() never blocks
+# the loop. usb_hid's send_report() waits until the host has taken the
+# previous report, and while the host is suspended it waits for a timeout
+# and raises OSError, stalling debouncing and every timer meanwhile. The
+# queue's devices stand in for usb_hid.devices; their send_report() sends
+# straight away if it can and otherwise returns False. Reports go out at most
+# once per interval across all the devices (they share one endpoint, which
+# the host polls every 8ms), never while the host is suspended, and not for
+# retry seconds after a send failed. A send that still had to wait means the
+# host is polling more slowly than that, so the time since the previous send
+# becomes the interval (up to maxInterval) until sends stop waiting, when it
+# shrinks back by 1/32 (at least 1ms) per report. Times are kept in
+# ticks_ms(), so a send costs no long int allocations. A flush() that gets
+# False keeps its report pending and tries again on the next pass, by which
+# time newer key changes and motion have been merged into it, so only the
+# latest state goes out. The queue counts the reports sent, the sends held
+# back to be coalesced that way, and the ones dropped because the host did
+# not take them. PiperMouse keeps at most one report's worth of motion
+# pending (any more is counted in its dropped), so the cursor does not run
+# away once the host catches up.
+#
+# Anything that relies on each call being sent straight away, such as
+# Keyboard.send(), Mouse.click() or KeyboardLayoutUS.write(), should use a
+# plain Keyboard or Mouse on usb_hid.devices instead.
+#
+# *** Usage:
+#
+# from piper_hid import PiperHIDQueue, PiperKeyboard, PiperMouse
+#
+# queue = PiperHIDQueue(usb_hid.devices)
+# keyboard = PiperKeyboard(queue.devices)
+# mouse = PiperMouse(queue.devices)
+# pointer = PiperPointer(mouse)
+# while True:
+#     ...
+#     keyboard.release_all()
+#     keyboard.press(Keycode.CONTROL)
+#     pointer.update(dx, dy)
+#     mouse.move(wheel=dwheel)
+#     keyboard.flush()
+#     mouse.flush()
+#
+################################################################################
+from adafruit_hid import find_device
+from adafruit_hid.keyboard import Keyboard
+from adafruit_hid.mouse import Mouse
+from piper_clock import milliseconds, ticks_add, ticks_diff, ticks_ms
+from piper_usb import GAMEPAD_REPORT_LENGTH, NKRO_KEYS, NKRO_REPORT_LENGTH, findNKROKeyboard
+
+try:
+    from supervisor import runtime
+except ImportError:
+    runtime = None
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+class PiperHIDPort:
+    def __init__(self, queue, device):
+        self.queue = queue
+        self.device = device
+        self.usage_page = device.usage_page
+        self.usage = device.usage
+
+    def send_report(self, report, report_id=None):
+        return self.queue.send(self.device, report)
+
+class PiperHIDQueue:
+    def __init__(self, devices, interval=0.008, maxInterval=0.1, retry=0.1, waitLimit=0.001):
+        self.devices = [PiperHIDPort(self, device) for device in devices]
+        self._interval = milliseconds(interval)
+        self._maxInterval = milliseconds(maxInterval)
+        self._retry = milliseconds(retry)
+        self._waitLimit = milliseconds(waitLimit)
+        self._gap = self._interval
+        self._next = ticks_ms()
+        self._last = self._next
+        # Firmware without runtime.usb_connected can't tell us it's suspended
+        self._runtime = runtime if hasattr(runtime, "usb_connected") else None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.waited = 0
+
+    # True if the report went out, False if it is left for the next try
+    #
+    def send(self, device, report):
+        now = ticks_ms()
+        if ticks_diff(self._next, now) > 0 or (self._runtime is not None and not self._runtime.usb_connected):
+            self.coalesced += 1
+            return False
+        try:
+            device.send_report(report)
+        except OSError:
+            self._next = ticks_add(ticks_ms(), self._retry)
+            self.dropped += 1
+            return False
+        sent = ticks_ms()
+        gap = self._gap
+        if ticks_diff(sent, now) > self._waitLimit:
+            self.waited += 1
+            gap = min(self._maxInterval, max(gap, ticks_diff(sent, self._last)))
+        elif gap > self._interval:
+            gap = max(self._interval, gap - ((gap >> 5) or 1))
+        self._gap = gap
+        self._last = sent
+        self._next = ticks_add(sent, gap)
+        self.sent += 1
+        return True
+
+class PiperKeyboard(Keyboard):
+    def __init__(self, devices):
+        super().__init__(devices)
+        self._sent = bytearray(8)
+        self.reports = 0
+
+    def press(self, *keycodes):
+        for keycode in keycodes:
+            self._add_keycode_to_report(keycode)
+
+    def release(self, *keycodes):
+        for keycode in keycodes:
+            self._remove_keycode_from_report(keycode)
+
+    def release_all(self):
+        for i in range(8):
+            self.report[i] = 0
+
+    # Send the keys held now if they changed since the last report
+    #
+    def flush(self):
+        if self.report != self._sent:
+            if self._keyboard_device.send_report(self.report) is False:
+                return
+            self._sent[:] = self.report
+            self.reports += 1
+
+class PiperNKROKeyboard:
+    def __init__(self, devices):
+        self._keyboard_device = findNKROKeyboard(devices)
+        self.report = bytearray(NKRO_REPORT_LENGTH)
+        self._sent = bytearray(NKRO_REPORT_LENGTH)
+        self.reports = 0
+
+    # Modifiers (0xE0 to 0xE7) are the bits of the first byte, other key
+    # codes index the bitmap after it
+    #
+    def press(self, *keycodes):
+        report = self.report
+        for keycode in keycodes:
+            if keycode >= 0xE0:
+                report[0] |= 1 << (keycode - 0xE0)
+            elif keycode < NKRO_KEYS:
+                report[1 + (keycode >> 3)] |= 1 << (keycode & 7)
+
+    def release(self, *keycodes):
+        report = self.report
+        for keycode in keycodes:
+            if keycode >= 0xE0:
+                report[0] &= ~(1 << (keycode - 0xE0))
+            elif keycode < NKRO_KEYS:
+                report[1 + (keycode >> 3)] &= ~(1 << (keycode & 7))
+
+    def release_all(self):
+        for i in range(NKRO_REPORT_LENGTH):
+            self.report[i] = 0
+
+    # Send the keys held now if they changed since the last report
+    #
+    def flush(self):
+        if self.report != self._sent:
+            if self._keyboard_device.send_report(self.report) is False:
+                return
+            self._sent[:] = self.report
+            self.reports += 1
+
+class PiperMouse(Mouse):
+    def __init__(self, devices):
+        super().__init__(devices)
+        self._sentButtons = 0
+        self._x = 0
+        self._y = 0
+        self._wheel = 0
+        self._pending = False
+        self.reports = 0
+        self.dropped = 0
+
+    def press(self, buttons):
+        self.report[0] |= buttons
+        self._pending = True
+
+    def release(self, buttons):
+        self.report[0] &= ~buttons
+        self._pending = True
+
+    def release_all(self):
+        self.report[0] = 0
+        self._pending = True
+
+    def move(self, x=0, y=0, wheel=0):
+        self._x += x
+        self._y += y
+        self._wheel += wheel
+        self._pending = True
+
+    # Send the buttons and the motion of this pass, if either changed. If the
+    # device holds a report back the rest stays pending, trimmed to one
+    # report's worth of motion.
+    #
+    def flush(self):
+        if not self._pending:
+            return
+        x = self._x
+        y = self._y
+        wheel = self._wheel
+        report = self.report
+        if report[0] == self._sentButtons and x == 0 and y == 0 and wheel == 0:
+            self._pending = False
+            return
+        while True:
+            partial_x = min(127, max(-127, x))
+            partial_y = min(127, max(-127, y))
+            partial_wheel = min(127, max(-127, wheel))
+            report[1] = partial_x & 0xFF
+            report[2] = partial_y & 0xFF
+            report[3] = partial_wheel & 0xFF
+            if self._mouse_device.send_report(report) is False:
+                self.dropped += abs(x - partial_x) + abs(y - partial_y) + abs(wheel - partial_wheel)
+                self._x = partial_x
+                self._y = partial_y
+                self._wheel = partial_wheel
+                return
+            self._sentButtons = report[0]
+            self.reports += 1
+            x -= partial_x
+            y -= partial_y
+            wheel -= partial_wheel
+            if x == 0 and y == 0 and wheel == 0:
+                break
+        self._x = 0
+        self._y = 0
+        self._wheel = 0
+        self._pending = False
+
+class PiperGamepad:
+    def __init__(self, devices, period=0.008):
+        self._gamepad_device = find_device(devices, usage_page=0x1, usage=0x05)
+        self.report = bytearray(GAMEPAD_REPORT_LENGTH)
+        self._sent = bytearray(GAMEPAD_REPORT_LENGTH)
+        self._period = milliseconds(period)
+        self._last = ticks_ms()
+        self.buttons = 0
+        self.reports = 0
+
+    def press(self, buttons):
+        self.set_buttons(self.buttons | buttons)
+
+    def release(self, buttons):
+        self.set_buttons(self.buttons & ~buttons)
+
+    def release_all(self):
+        self.set_buttons(0)
+        self.move_joysticks(0, 0)
+
+    def set_buttons(self, buttons):
+        self.buttons = buttons
+        self.report[0] = buttons & 0xFF
+        self.report[1] = (buttons >> 8) & 0xFF
+
+    # Axes from -32767 to 32767, clamped
+    #
+    def move_joysticks(self, x, y):
+        x = min(32767, max(-32767, x))
+        y = min(32767, max(-32767, y))
+        report = self.report
+        report[2] = x & 0xFF
+        report[3] = (x >> 8) & 0xFF
+        report[4] = y & 0xFF
+        report[5] = (y >> 8) & 0xFF
+
+    # Send the buttons and axes if they changed since the last report, axes
+    # alone no more than once per period
+    #
+    def flush(self):
+        report = self.report
+        sent = self._sent
+        if report == sent:
+            return
+        now = ticks_ms()
+        if report[0] == sent[0] and report[1] == sent[1] and ticks_diff(now, self._last) < self._period:
+            return
+        if self._gamepad_device.send_report(report) is False:
+            return
+        sent[:] = report
+        self._last = now
+        self.reports += 1
+
+class PiperPointer:
+    def __init__(self, mouse, period=0.005, fractionBits=4, maxElapsed=0.1):
+        self.mouse = mouse
+        self._period = milliseconds(period)
+        self._divisor = self._period << fractionBits
+        self._maxElapsed = milliseconds(maxElapsed)
+        self._limit = 127 * self._divisor
+        self._x = 0
+        self._y = 0
+        self._sinceReport = 0
+        self._last = ticks_ms()
+
+    # Integrate velocity (vx, vy) over the milliseconds since the last call.
+    # A gap longer than maxElapsed (a stalled loop, or a mode that does not
+    # move the pointer) restarts the integration instead of throwing the
+    # cursor.
+    #
+    def update(self, vx, vy):
+        now = ticks_ms()
+        elapsed = ticks_diff(now, self._last)
+        self._last = now
+        if elapsed > self._maxElapsed:
+            elapsed = 0
+        self._x += vx * elapsed
+        self._y += vy * elapsed
+        self._sinceReport += elapsed
+        if self._sinceReport < self._period:
+            return
+        self._sinceReport = 0
+        dx = self._x // self._divisor
+        dy = self._y // self._divisor
+        if dx or dy:
+            dx = min(127, max(-127, dx))
+            dy = min(127, max(-127, dy))
+            self._x = min(self._limit, max(-self._limit, self._x - dx * self._divisor))
+            self._y = min(self._limit, max(-self._limit, self._y - dy * self._divisor))
+            self.mouse.move(x=dx, y=dy)
@@ -0,0 +1,421 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Button debouncing and input events for the Command Center.
+#
+# PiperButtons debounces all the digital inputs together. Each update reads
+# every pin into one integer, one bit per source (1 = pressed), and runs a
+# two bit vertical counter per bit with a handful of integer operations: a
+# button only changes state once its pin has disagreed with the debounced
+# state on four consecutive samples. Samples are taken every interval / 4
+# seconds (rounded to whole milliseconds), so a change is accepted after
+# interval to 3/4 interval of stable input. Every edge found on one update
+# shares a single timestamp.
+#
+# On CircuitPython 7 and later PiperKeypadButtons does the same job with
+# keypad.Keys, which scans the pins in the background and timestamps each
+# edge when it happens, so a slow pass through the main loop (LED writes, HID
+# back pressure, user code) delays presses but can't lose them. newButtons()
+# picks it when the keypad module is available.
+#
+# Instead of every mode polling pressed/released predicates for every button
+# on every pass, PiperButtons pushes an event when a button changes, and the
+# mode handlers look at just those events. Events are kept in a fixed ring
+# buffer (no allocation once created) as
+#
+#   source << 1 | edge      edge is PRESSED (1) or RELEASED (0)
+#
+# plus a millisecond timestamp (wrapping at 2**29, like supervisor.ticks_ms).
+# If more events arrive than the queue holds between clear() calls the
+# oldest are overwritten and counted in dropped.
+#
+# *** Usage:
+#
+# from piper_inputs import newButtons, PiperEventQueue, PRESSED, SOURCE_LEFT
+#
+# events = PiperEventQueue()
+# buttons = newButtons(events=events)
+# buttons.add(SOURCE_LEFT, board.D3)       # button to ground, pulled up
+# while True:
+#     events.clear()
+#     buttons.update()
+#     for i in range(events.count):
+#         event = events.event(i)
+#         if event == SOURCE_LEFT << 1 | PRESSED:
+#             print("left pressed at", events.time(i))
+#
+################################################################################
+from array import array
+from digitalio import DigitalInOut, Direction, Pull
+from piper_clock import milliseconds, ticks_diff, ticks_ms
+
+try:
+    import keypad
+except ImportError:
+    keypad = None
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+# Event edges
+#
+RELEASED = 0
+PRESSED  = 1
+
+# Input sources, numbered in this order by all the Command Center programs
+#
+SOURCE_UP     = 0
+SOURCE_DOWN   = 1
+SOURCE_LEFT   = 2
+SOURCE_RIGHT  = 3
+SOURCE_Z      = 4
+SOURCE_TOP    = 5
+SOURCE_MIDDLE = 6
+SOURCE_BOTTOM = 7
+
+SOURCE_NAMES = ("up", "down", "left", "right", "z", "top", "middle", "bottom")
+
+# Bit for each source in PiperButtons.state and PiperButtons.changed
+#
+BIT_UP     = 1 << SOURCE_UP
+BIT_DOWN   = 1 << SOURCE_DOWN
+BIT_LEFT   = 1 << SOURCE_LEFT
+BIT_RIGHT  = 1 << SOURCE_RIGHT
+BIT_Z      = 1 << SOURCE_Z
+BIT_TOP    = 1 << SOURCE_TOP
+BIT_MIDDLE = 1 << SOURCE_MIDDLE
+BIT_BOTTOM = 1 << SOURCE_BOTTOM
+
+class PiperEventQueue:
+    def __init__(self, size=16):
+        self.size = size
+        self._events = array("H", [0] * size)
+        self._times = array("L", [0] * size)
+        self._head = 0
+        self.count = 0
+        self.dropped = 0
+
+    def push(self, source, edge, timestamp=None):
+        index = self._head + self.count
+        if index >= self.size:
+            index -= self.size
+        if self.count == self.size:
+            # Full, overwrite the oldest event
+            self._head = index + 1 if index + 1 < self.size else 0
+            self.dropped += 1
+        else:
+            self.count += 1
+        self._events[index] = source << 1 | edge
+        if timestamp is None:
+            timestamp = ticks_ms()
+        self._times[index] = timestamp
+
+    # The i'th pending event (0 is the oldest) and its timestamp in ms
+    #
+    def event(self, i):
+        i += self._head
+        if i >= self.size:
+            i -= self.size
+        return self._events[i]
+
+    def time(self, i):
+        i += self._head
+        if i >= self.size:
+            i -= self.size
+        return self._times[i]
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+
+class PiperButtons:
+    def __init__(self, events=None, interval=0.010):
+        self.events = events
+        self.interval = interval
+        self._pins = []
+        self._pinIds = []
+        self._sources = []
+        self._disabled = 0
+        self._mask = 0
+        self._count0 = 0
+        self._count1 = 0
+        self._sampled = ticks_ms()
+
+        # Debounced state and the bits that changed on the last update, one
+        # bit per source, plus the time of that update in ms
+        #
+        self.state = 0
+        self.changed = 0
+        self.time = 0
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @interval.setter
+    def interval(self, interval):
+        self._interval = interval
+        self._period = milliseconds(interval / 4)
+
+    # Debounce a button from pin to ground as the given source
+    #
+    def add(self, source, pin):
+        bit = 1 << source
+        self._pins.append((bit, self._open(pin)))
+        self._pinIds.append(pin)
+        self._sources.append((source, bit))
+        self._mask |= bit
+        self._count0 |= bit
+        self._count1 |= bit
+
+    def _open(self, pin):
+        io = DigitalInOut(pin)
+        io.direction = Direction.INPUT
+        io.pull = Pull.UP
+        return io
+
+    # Free the pins, reclaim() opens them again (see piper_resources.py)
+    #
+    def deinit(self):
+        for bit, io in self._pins:
+            io.deinit()
+        self._pins = []
+
+    # Every button starts out released, held ones are pressed again once
+    # debounced
+    #
+    def reclaim(self):
+        pins = []
+        try:
+            for i in range(len(self._pinIds)):
+                bit = self._sources[i][1]
+                if not self._disabled & bit:
+                    pins.append((bit, self._open(self._pinIds[i])))
+        except ValueError:
+            for bit, io in pins:
+                io.deinit()
+            raise
+        self._pins = pins
+        self._count0 = self._mask
+        self._count1 = self._mask
+        self.state = 0
+        self.changed = 0
+
+    # Stop reading a source and free its pin, e.g. while user code has it.
+    # The button reads as not pressed, so if it was held it is released
+    # once debounced. enable() reads it again (ValueError if the pin is
+    # still in use).
+    #
+    def disable(self, source):
+        bit = 1 << source
+        if self._disabled & bit:
+            return
+        self._disabled |= bit
+        pins = []
+        for entry in self._pins:
+            if entry[0] == bit:
+                entry[1].deinit()
+            else:
+                pins.append(entry)
+        self._pins = pins
+
+    def enable(self, source):
+        bit = 1 << source
+        if not self._disabled & bit:
+            return
+        for i in range(len(self._sources)):
+            if self._sources[i][1] == bit:
+                self._pins.append((bit, self._open(self._pinIds[i])))
+        self._disabled &= ~bit
+
+    def update(self):
+        now = ticks_ms()
+        if ticks_diff(now, self._sampled) < self._period:
+            self.changed = 0
+            return
+        self._sampled = now
+
+        raw = 0
+        for bit, io in self._pins:
+            if not io.value:
+                raw |= bit
+
+        # Vertical counters: (count1, count0) is reset to 3 for bits that
+        # agree with the debounced state and counts down for those that
+        # don't, toggling the state when it wraps
+        #
+        delta = self.state ^ raw
+        self._count0 = ~(self._count0 & delta) & self._mask
+        self._count1 = self._count0 ^ (self._count1 & delta)
+        changed = delta & self._count0 & self._count1
+        self.changed = changed
+        if changed:
+            self.state ^= changed
+            self.time = now
+            if self.events is not None:
+                for source, bit in self._sources:
+                    if changed & bit:
+                        self.events.push(source, PRESSED if self.state & bit else RELEASED, self.time)
+
+    def pressed(self, source):
+        return self.state & (1 << source) != 0
+
+    def pressedEvent(self, source):
+        return self.changed & self.state & (1 << source) != 0
+
+    def releasedEvent(self, source):
+        return self.changed & ~self.state & (1 << source) != 0
+
+class PiperKeypadButtons:
+    def __init__(self, events=None, interval=0.010):
+        self.events = events
+        self.interval = interval
+        self._pins = []
+        self._sources = []
+        self._keySources = ()
+        self._disabled = 0
+        self._dropped = 0
+        self._keys = None
+        self._event = keypad.Event()
+        self.state = 0
+        self.changed = 0
+        self.time = 0
+
+    # Buttons from pin to ground. keypad.Keys takes all its pins at once so
+    # scanning starts on the first update()
+    #
+    def add(self, source, pin):
+        if self._keys is not None:
+            raise RuntimeError("buttons already scanning")
+        self._pins.append(pin)
+        self._sources.append(source)
+
+    # Free the pins, reclaim() opens them again (see piper_resources.py)
+    #
+    def deinit(self):
+        if self._keys is not None:
+            self._keys.deinit()
+            self._keys = None
+
+    # Every button starts out released, keypad reports held ones as pressed
+    # on its first scan
+    #
+    def reclaim(self):
+        self._open()
+        self.state = 0
+        self.changed = 0
+
+    # Scan the pins of the sources that aren't disabled, the key numbers
+    # mapping to sources through _keySources
+    #
+    def _open(self):
+        pins = []
+        sources = []
+        for i in range(len(self._pins)):
+            if not self._disabled & (1 << self._sources[i]):
+                pins.append(self._pins[i])
+                sources.append(self._sources[i])
+        self._keys = keypad.Keys(pins, value_when_pressed=False, pull=True, interval=self.interval)
+        self._keySources = sources
+
+    # Stop scanning a source and free its pin, e.g. while user code has it.
+    # If it was held it is released on the next update(). enable() scans it
+    # again (ValueError if the pin is still in use). keypad.Keys can't
+    # change its pins, so both start a new scan of the remaining ones.
+    #
+    def disable(self, source):
+        bit = 1 << source
+        if self._disabled & bit:
+            return
+        self._disabled |= bit
+        self._dropped |= bit
+        if self._keys is not None:
+            self._keys.deinit()
+            self._open()
+
+    def enable(self, source):
+        bit = 1 << source
+        if not self._disabled & bit:
+            return
+        self._disabled &= ~bit
+        if self._keys is not None:
+            self._keys.deinit()
+            try:
+                self._open()
+            except ValueError:
+                self._disabled |= bit
+                self._open()
+                raise
+
+    # Take the edges the background scan has queued since the last update,
+    # in order. If the event queue is short of room the rest are left for
+    # the next update rather than dropped.
+    #
+    def update(self):
+        if self._keys is None:
+            self._open()
+        changed = 0
+        event = self._event
+        events = self.events
+        if self._dropped:
+            changed = self._dropped & self.state
+            self._dropped = 0
+            if changed:
+                self.state &= ~changed
+                self.time = ticks_ms()
+                if events is not None:
+                    for source in self._sources:
+                        if changed & (1 << source):
+                            events.push(source, RELEASED, self.time)
+        while events is None or events.count < events.size:
+            if not self._keys.events.get_into(event):
+                break
+            source = self._keySources[event.key_number]
+            bit = 1 << source
+            changed |= bit
+            if event.pressed:
+                self.state |= bit
+            else:
+                self.state &= ~bit
+            self.time = event.timestamp
+            if events is not None:
+                events.push(source, PRESSED if event.pressed else RELEASED, event.timestamp)
+        self.changed = changed
+
+    def pressed(self, source):
+        return self.state & (1 << source) != 0
+
+    def pressedEvent(self, source):
+        return self.changed & self.state & (1 << source) != 0
+
+    def releasedEvent(self, source):
+        return self.changed & ~self.state & (1 << source) != 0
+
+# Background scanned buttons where the keypad module is available (and
+# background is set), otherwise polled ones
+#
+def newButtons(events=None, interval=0.010, background=True):
+    if background and keypad is not None:
+        return PiperKeypadButtons(events=events, interval=interval)
+    return PiperButtons(events=events, interval=interval)
@@ -0,0 +1,175 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# LED animation engine for the status DotStar (or any DotStar/NeoPixel strip,
+# which shows the same pattern on every pixel).
+#
+# A pattern is a table of colors, computed once when the pattern is defined,
+# played at a fixed frame time. Modes just say which pattern to play:
+#
+#   led.play(_JOYSTICK_PATTERN)
+#
+# and update(), run from a scheduler task, works out the frame from the time
+# since the pattern started, so the animation runs at the same speed however
+# fast or slow the loop is. Nothing is written unless the frame changed, so a
+# solid color costs one write when the mode is entered.
+#
+# The frames are also scaled by the brightness once per pattern (the first
+# time it is played, or up front for the patterns passed in) and the strip
+# kept at full brightness, as adafruit_dotstar otherwise copies and scales its
+# whole buffer on every write.
+#
+# Input comes first: update() takes a deadline, normally when the input task
+# is next due, and if it has already passed the frame is left for a later
+# update() rather than delaying the input scan by an SPI transfer (counted in
+# deferred). As the frame comes from the clock, a deferred update only shows
+# the animation a little late, it never slows it down. Extra strips, such as
+# an external NeoPixel strip, are passed as strips and show the same frames.
+#
+# *** Usage:
+#
+# from piper_led import PiperLED, rampPattern, solidPattern
+#
+# _UNWIRED_PATTERN = rampPattern((255, 0, 0), 2.0)
+# _JOYSTICK_PATTERN = solidPattern((0, 255, 0))
+#
+# led = PiperLED(adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1),
+#                brightness=0.2, patterns=(_UNWIRED_PATTERN, _JOYSTICK_PATTERN))
+# led.play(_UNWIRED_PATTERN)
+# while True:
+#     led.update(deadline)
+#
+################################################################################
+from piper_clock import milliseconds, ticks_add, ticks_diff, ticks_ms
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+class PiperPattern:
+    def __init__(self, frames, frameTime=0):
+        self.frames = tuple(frames)
+        # All the frames in ms, as update() works in ticks_ms()
+        self.period = milliseconds(frameTime * len(self.frames))
+
+def solidPattern(color):
+    return PiperPattern((color,))
+
+# Fade up from off to color over period seconds in steps frames, then
+# start over
+#
+def rampPattern(color, period, steps=64):
+    frames = [(color[0] * i // steps, color[1] * i // steps, color[2] * i // steps) for i in range(steps)]
+    return PiperPattern(frames, period / steps)
+
+class PiperLED:
+    def __init__(self, pixels, brightness=1.0, patterns=(), strips=()):
+        self.pixels = pixels
+        self.strips = tuple(strips)
+        pixels.brightness = 1.0
+        for strip in self.strips:
+            strip.brightness = 1.0
+        self._brightness = brightness
+        self._scaled = {}
+        for pattern in patterns:
+            self._scaled[pattern] = self._scale(pattern)
+        self.pattern = None
+        self._frames = None
+        self._frame = -1
+        self._start = 0
+        self._waited = False
+        self.writes = 0
+        self.deferred = 0
+
+    # Show the frames on new pixels, such as the DotStar opened again after
+    # user code had it
+    #
+    def attach(self, pixels):
+        self.pixels = pixels
+        pixels.brightness = 1.0
+        self._frame = -1
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, brightness):
+        self._brightness = brightness
+        for pattern in self._scaled:
+            self._scaled[pattern] = self._scale(pattern)
+        if self.pattern is not None:
+            self._frames = self._scaled[self.pattern]
+            self._frame = -1
+
+    def _scale(self, pattern):
+        brightness = self._brightness
+        return tuple((int(r * brightness), int(g * brightness), int(b * brightness)) for r, g, b in pattern.frames)
+
+    # Start a pattern from its first frame, unless it is already playing
+    #
+    def play(self, pattern):
+        if pattern is self.pattern:
+            return
+        frames = self._scaled.get(pattern)
+        if frames is None:
+            frames = self._scale(pattern)
+            self._scaled[pattern] = frames
+        self.pattern = pattern
+        self._frames = frames
+        self._frame = -1
+        self._start = ticks_ms()
+
+    # Show the current frame if it changed, unless the clock has already
+    # reached deadline (a ticks_ms() value, such as a scheduler task's due
+    # time, None for no limit). A frame is put off only once, so that an
+    # input task that is always due can't stop the LED.
+    #
+    def update(self, deadline=None):
+        frames = self._frames
+        if frames is None:
+            return
+        if len(frames) == 1:
+            frame = 0
+        else:
+            period = self.pattern.period
+            elapsed = ticks_diff(ticks_ms(), self._start)
+            if not 0 <= elapsed < period:
+                # Move the start on by whole periods so that elapsed stays
+                # far from where ticks_ms() wraps
+                self._start = ticks_add(self._start, elapsed - elapsed % period)
+                elapsed %= period
+            frame = elapsed * len(frames) // period
+        if frame == self._frame:
+            return
+        if deadline is not None and not self._waited and ticks_diff(deadline, ticks_ms()) <= 0:
+            self._waited = True
+            self.deferred += 1
+            return
+        self._waited = False
+        self._frame = frame
+        color = frames[frame]
+        self.pixels.fill(color)
+        for strip in self.strips:
+            strip.fill(color)
+        self.writes += 1
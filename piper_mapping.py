@@ -0,0 +1,135 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Declarative button to HID mapping tables.
+#
+# A layout maps input sources (names chosen by the program, e.g. "up" or
+# "z") to a list of actions. Actions are:
+#
+#   Keycode names         "SPACE", "W", "LEFT_ARROW" ...  held while pressed
+#   Mouse buttons         "MOUSE_LEFT", "MOUSE_MIDDLE", "MOUSE_RIGHT"
+#   Scroll wheel          "WHEEL_UP", "WHEEL_DOWN"  one click per press
+#
+# Key actions go to keyboard, unless the layout is in keyboards (a dict of
+# layout name to keyboard), which picks a different keyboard for it, e.g.
+# the N-key rollover one for layouts that hold many keys at once.
+#
+# Layouts are compiled once into a flat dispatch array, two entries per
+# source (press, release), each a tuple of (function, argument) pairs. At run
+# time the program only calls dispatch() for inputs that actually changed.
+#
+# Layouts can be added or replaced without editing code by putting a JSON
+# file on CIRCUITPY, by default /mappings.json:
+#
+#   {"keyboard": {"up": ["SPACE"], "down": ["X"], "left": ["Z"], "right": ["C"]}}
+#
+# *** Usage:
+#
+# from piper_mapping import PiperButtonMap, loadLayouts
+#
+# layouts = {"player1": {"fire": ["SPACE"]}, "player2": {"fire": ["LEFT_SHIFT"]}}
+# layouts.update(loadLayouts())
+# buttonMap = PiperButtonMap(("up", "fire"), layouts, keyboard=keyboard)
+# buttonMap.select("player1")
+# ...
+# if fire.fell:
+#     buttonMap.dispatch(1, True)
+#
+################################################################################
+from adafruit_hid.keycode import Keycode
+from adafruit_hid.mouse import Mouse
+import json
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+_MOUSE_BUTTONS = {
+    "MOUSE_LEFT": Mouse.LEFT_BUTTON,
+    "MOUSE_MIDDLE": Mouse.MIDDLE_BUTTON,
+    "MOUSE_RIGHT": Mouse.RIGHT_BUTTON,
+}
+
+_WHEEL = {
+    "WHEEL_UP": -1,
+    "WHEEL_DOWN": 1,
+}
+
+# Read extra layouts from a JSON file; a missing file just means none
+#
+def loadLayouts(path="/mappings.json"):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+class PiperButtonMap:
+    def __init__(self, sources, layouts, keyboard=None, mouse=None, keyboards=None):
+        self.sources = tuple(sources)
+        self.keyboard = keyboard
+        self.mouse = mouse
+        self.keyboards = {} if keyboards is None else keyboards
+        self._compiled = {}
+        for name in layouts:
+            self._compiled[name] = self._compile(layouts[name], self.keyboards.get(name, keyboard))
+        self._dispatch = None
+        self.layout = None
+
+    def _compile(self, layout, keyboard):
+        dispatch = [()] * (2 * len(self.sources))
+        for source in layout:
+            index = self.sources.index(source)
+            press = []
+            release = []
+            for action in layout[source]:
+                if action in _MOUSE_BUTTONS:
+                    press.append((self.mouse.press, _MOUSE_BUTTONS[action]))
+                    release.append((self.mouse.release, _MOUSE_BUTTONS[action]))
+                elif action in _WHEEL:
+                    press.append((self._wheel, _WHEEL[action]))
+                else:
+                    keycode = getattr(Keycode, action)
+                    press.append((keyboard.press, keycode))
+                    release.append((keyboard.release, keycode))
+            dispatch[2 * index] = tuple(press)
+            dispatch[2 * index + 1] = tuple(release)
+        return dispatch
+
+    def _wheel(self, amount):
+        self.mouse.move(wheel=amount)
+
+    def select(self, name):
+        self._dispatch = self._compiled[name]
+        self.layout = name
+
+    # Run the actions for a source (index into sources) being pressed or
+    # released in the selected layout
+    #
+    def dispatch(self, source, pressed):
+        if pressed:
+            actions = self._dispatch[2 * source]
+        else:
+            actions = self._dispatch[2 * source + 1]
+        for function, argument in actions:
+            function(argument)
@@ -0,0 +1,163 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Registry of the hardware a program has open, so that all of it can be
+# handed over to other code (usercode.py) and taken back without restarting
+# the board.
+#
+# Each resource is an object with deinit(), which frees its pins, and
+# reclaim(), which opens the same pins again in place, so everything that
+# holds a reference to it keeps working. release() deinits every resource,
+# the last added first, and reclaim() opens them again in the order they were
+# added. If a pin can't be had back because the other code still has it,
+# reclaim() deinits whatever it had reopened and raises the ValueError from
+# opening it; only a restart frees the pin then.
+#
+# PiperDevice makes a resource of anything opened by a function, such as a
+# DigitalInOut or a DotStar, calling attach (if given) with the new object
+# each time it is reopened.
+#
+# PiperPinTable records who owns each pin, so that single pins can be lent
+# to user code running alongside the program. The program adds the pins it
+# uses with functions that stop and restart its use of each one (a pin
+# without them can't be lent). claim() by another owner stops the program's
+# use of the pin, and release() hands it back, or, for a pin the program
+# doesn't use, just forgets it. If the borrower still has the pin open,
+# restarting fails with ValueError and the pin stays with the borrower.
+#
+# *** Usage:
+#
+# from piper_resources import PiperDevice, PiperResources
+#
+# resources = PiperResources()
+# x_axis = resources.add(PiperJoystickAxis(board.A4))
+# ground = resources.add(PiperDevice(lambda: DigitalInOut(board.A5)))
+# resources.release()
+# ...                                  # other code uses the pins
+# resources.reclaim()
+#
+# pins = PiperPinTable()
+# pins.add(board.D3, "controller", lambda: buttons.disable(SOURCE_LEFT), lambda: buttons.enable(SOURCE_LEFT))
+# pins.claim(board.D3, "usercode")     # the controller stops reading D3
+# ...
+# pins.releaseAll("usercode")          # and reads it again
+#
+################################################################################
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+class PiperDevice:
+    def __init__(self, open, attach=None):
+        self.open = open
+        self.attach = attach
+        self.device = open()
+
+    def deinit(self):
+        self.device.deinit()
+
+    def reclaim(self):
+        self.device = self.open()
+        if self.attach is not None:
+            self.attach(self.device)
+
+class PiperResources:
+    def __init__(self):
+        self.resources = []
+        self.released = False
+
+    def add(self, resource):
+        self.resources.append(resource)
+        return resource
+
+    def release(self):
+        if self.released:
+            return
+        for resource in reversed(self.resources):
+            resource.deinit()
+        self.released = True
+
+    def reclaim(self):
+        if not self.released:
+            return
+        reclaimed = 0
+        try:
+            for resource in self.resources:
+                resource.reclaim()
+                reclaimed += 1
+        except ValueError:
+            for i in range(reclaimed - 1, -1, -1):
+                self.resources[i].deinit()
+            raise
+        self.released = False
+
+class PiperPinTable:
+    def __init__(self):
+        self.owners = {}
+        self._users = {}
+        self._lent = {}
+
+    # A pin the program uses, with the functions to stop and restart that
+    # use (None if it can't do without the pin)
+    #
+    def add(self, pin, owner, stop=None, restart=None):
+        self.owners[pin] = owner
+        self._users[pin] = (stop, restart)
+
+    def owner(self, pin):
+        return self.owners.get(pin)
+
+    def claim(self, pin, owner):
+        current = self.owners.get(pin)
+        if current == owner:
+            return
+        if current is not None:
+            user = self._users.get(pin)
+            if pin in self._lent or user is None or user[0] is None:
+                raise ValueError("%s is in use by %s" % (pin, current))
+            user[0]()
+            self._lent[pin] = current
+        self.owners[pin] = owner
+
+    def release(self, pin):
+        if pin not in self._lent:
+            if pin not in self._users:
+                self.owners.pop(pin, None)
+            return
+        self._users[pin][1]()
+        self.owners[pin] = self._lent.pop(pin)
+
+    # Every pin of an owner, ValueError for the first that couldn't be
+    # handed back after trying them all
+    #
+    def releaseAll(self, owner):
+        error = None
+        for pin in [pin for pin in self.owners if self.owners[pin] == owner]:
+            try:
+                self.release(pin)
+            except ValueError as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
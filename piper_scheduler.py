@@ -0,0 +1,108 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Fixed rate scheduler used by PiperCommandCenter.
+#
+# Work is split into periodic tasks, each with its own rate: scanning the
+# inputs and running the mode logic, flushing HID reports, the scroll wheel,
+# the LED. process() runs every task that is due, in the order they were
+# added, and returns straight away when none is, so the main loop can call it
+# as often as it likes. Times are piper_clock.ticks_ms() milliseconds, small
+# ints, so a pass allocates nothing; periods are rounded to whole
+# milliseconds.
+#
+# A task is due once per period on a fixed grid (its next deadline is the
+# previous one plus the period, not the time it actually ran plus the
+# period), so a late run does not shift the ones after it. If a task is late
+# by a whole period or more the deadlines it could not meet are skipped
+# rather than run back to back, and counted in the task's missed count and
+# the scheduler's total, which is what to watch when adding work to the
+# loop.
+#
+# *** Usage:
+#
+# from piper_scheduler import PiperScheduler
+#
+# scheduler = PiperScheduler()
+# scheduler.addTask(self._inputTask, 0.001)
+# scheduler.addTask(self._ledTask, 0.02)
+# while True:
+#     scheduler.process()
+# print(scheduler.missed)
+#
+################################################################################
+from piper_clock import milliseconds, ticks_ms, TICKS_MASK, TICKS_PERIOD
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+_TICKS_HALF = TICKS_PERIOD // 2
+
+class PiperTask:
+    def __init__(self, function, period, due):
+        self.function = function
+        self.period = period
+        self.due = due
+        self.missed = 0
+
+class PiperScheduler:
+    def __init__(self):
+        self.tasks = []
+        self.missed = 0
+
+    # Period in seconds, the first run is on the next process()
+    #
+    def addTask(self, function, period):
+        task = PiperTask(function, milliseconds(period), ticks_ms())
+        self.tasks.append(task)
+        return task
+
+    # Make every task due now, without counting the deadlines that passed
+    # while none of them could run (e.g. while user code had the board).
+    # Can be called from a task.
+    #
+    def restart(self):
+        now = ticks_ms()
+        for task in self.tasks:
+            task.due = now
+
+    # The tick arithmetic is ticks_diff() written out, to save a call per
+    # task per pass
+    #
+    def process(self):
+        now = ticks_ms()
+        for task in self.tasks:
+            wait = (task.due - now) & TICKS_MASK
+            if 0 < wait < _TICKS_HALF:
+                continue
+            task.function()
+            period = task.period
+            due = (task.due + period) & TICKS_MASK
+            late = (now - due) & TICKS_MASK
+            if late < _TICKS_HALF:
+                missed = late // period + 1
+                due = (due + missed * period) & TICKS_MASK
+                task.missed += missed
+                self.missed += missed
+            task.due = due
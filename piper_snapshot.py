@@ -0,0 +1,190 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Controller state kept across a restart.
+#
+# supervisor.reload() (and a crash or an edit to a file on CIRCUITPY) starts
+# the program over: the controller comes back waiting for the joystick to
+# settle, in its first mode, with the default joystick response. A snapshot
+# of the mode, a sub-mode (e.g. the Minecraft one) and each axis's response
+# (outputScale, deadbandCutoff and weight) is kept in 18 bytes of memory
+# that survives the restart, so the next session can carry on where this
+# one stopped:
+#
+#   byte  0       magic "P"
+#   byte  1       layout version
+#   byte  2       flags (bit 0: the joystick was found to be wired)
+#   bytes 3-4     mode, sub-mode
+#   bytes 5-16    per axis, little endian 16 bits: outputScale in 1/16,
+#                 deadbandCutoff and weight in 1/65535
+#   byte  17      checksum of bytes 0-16
+#
+# alarm.sleep_memory is used where the firmware has it (RAM kept across
+# restarts and deep sleep, lost when the power goes), otherwise
+# microcontroller.nvm (flash: kept across power cycles, and worn by
+# writing, so save() only writes when something changed), otherwise
+# nothing is kept. load() rejects memory that doesn't hold a snapshot of
+# this layout, such as sleep_memory just after power up.
+#
+# wired is only believed after a restart (supervisor.runtime.run_reason),
+# never after power up or on firmware that can't tell the two apart: the
+# joystick may have been unplugged meanwhile. The axis response isn't
+# restored after a restart caused by saving a file to CIRCUITPY, so that
+# new settings in the program take effect.
+#
+# *** Usage:
+#
+# from piper_snapshot import PiperSnapshot
+#
+# snapshot = PiperSnapshot()
+# if snapshot.load():
+#     snapshot.restoreAxes(x_axis, y_axis)
+#     if snapshot.wired:
+#         state = snapshot.state
+# ...
+# snapshot.save(state, subMode, wired, x_axis, y_axis)   # every so often
+#
+################################################################################
+import struct
+
+try:
+    from alarm import sleep_memory
+except ImportError:
+    sleep_memory = None
+
+try:
+    from microcontroller import nvm
+except ImportError:
+    nvm = None
+
+try:
+    from supervisor import RunReason, runtime
+except ImportError:
+    # No run_reason (CircuitPython 6 and earlier)
+    RunReason = None
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+_MAGIC          = 0x50
+_VERSION        = 1
+_FORMAT         = "<BBBBBHHHHHH"
+_SIZE           = struct.calcsize(_FORMAT) + 1
+_WIRED          = 0x01
+
+# Fixed point units of the axis fields
+#
+_SCALE_ONE      = 16
+_FRACTION_ONE   = 65535
+
+def _checksum(buffer, length):
+    total = 0xA5
+    for i in range(length):
+        total = ((total << 1) + buffer[i]) & 0xFF
+    return total
+
+# Rounded to the nearest unit, within 16 bits
+#
+def _fixed(value, one):
+    value = int(value * one + 0.5)
+    if value < 0:
+        return 0
+    return value if value < 0xFFFF else 0xFFFF
+
+def _encodeAxis(axis):
+    return (_fixed(axis.outputScale, _SCALE_ONE), _fixed(axis.deadbandCutoff, _FRACTION_ONE), _fixed(axis.weight, _FRACTION_ONE))
+
+class PiperSnapshot:
+    def __init__(self, memory=None, offset=0):
+        if memory is None:
+            memory = sleep_memory if sleep_memory is not None else nvm
+        if memory is not None and len(memory) < offset + _SIZE:
+            memory = None
+        self.memory = memory
+        self.offset = offset
+        self._buffer = bytearray(_SIZE)
+        reason = None if RunReason is None else runtime.run_reason
+        self.reloaded = reason is not None and reason != RunReason.STARTUP
+        self.edited = reason is not None and reason == RunReason.AUTO_RELOAD
+
+        # What load() found
+        #
+        self.state = None
+        self.subMode = 0
+        self.wired = False
+        self.axes = ()
+
+    # Read the snapshot, False if there is none
+    #
+    def load(self):
+        memory = self.memory
+        if memory is None:
+            return False
+        buffer = self._buffer
+        for i in range(_SIZE):
+            buffer[i] = memory[self.offset + i]
+        if buffer[0] != _MAGIC or buffer[1] != _VERSION or buffer[_SIZE - 1] != _checksum(buffer, _SIZE - 1):
+            return False
+        fields = struct.unpack_from(_FORMAT, buffer)
+        self.wired = fields[2] & _WIRED != 0 and self.reloaded
+        self.state = fields[3]
+        self.subMode = fields[4]
+        self.axes = (fields[5:8], fields[8:11])
+        return True
+
+    # Give the axes the loaded response, changing only what differs (each
+    # change rebuilds the axis's lookup table), unless the program was just
+    # edited
+    #
+    def restoreAxes(self, *axes):
+        if self.edited:
+            return
+        for axis, saved in zip(axes, self.axes):
+            current = _encodeAxis(axis)
+            if saved[0] != current[0]:
+                axis.outputScale = saved[0] / _SCALE_ONE
+            if saved[1] != current[1]:
+                axis.deadbandCutoff = saved[1] / _FRACTION_ONE
+            if saved[2] != current[2]:
+                axis.weight = saved[2] / _FRACTION_ONE
+
+    # Write a snapshot if it differs from the one in memory, True if it did
+    #
+    def save(self, state, subMode, wired, xAxis, yAxis):
+        memory = self.memory
+        if memory is None:
+            return False
+        buffer = self._buffer
+        struct.pack_into(_FORMAT, buffer, 0, _MAGIC, _VERSION, _WIRED if wired else 0, state, subMode,
+            _fixed(xAxis.outputScale, _SCALE_ONE), _fixed(xAxis.deadbandCutoff, _FRACTION_ONE), _fixed(xAxis.weight, _FRACTION_ONE),
+            _fixed(yAxis.outputScale, _SCALE_ONE), _fixed(yAxis.deadbandCutoff, _FRACTION_ONE), _fixed(yAxis.weight, _FRACTION_ONE))
+        buffer[_SIZE - 1] = _checksum(buffer, _SIZE - 1)
+        offset = self.offset
+        for i in range(_SIZE):
+            if memory[offset + i] != buffer[i]:
+                break
+        else:
+            return False
+        memory[offset:offset + _SIZE] = buffer
+        return True
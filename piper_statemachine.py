@@ -0,0 +1,125 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Table driven state machine used by PiperCommandCenter.
+#
+# Each state has a handler, called on every process() while the state is
+# active, and a list of transition rules. A rule fires once its condition has
+# been true continuously for holdTime seconds (straight away for 0): its
+# action runs and the machine moves to the target state. If the condition
+# drops before then the rule's timer starts over. A condition of None is
+# always true.
+#
+# Only the rules of the active state are evaluated, and if the state has a
+# guard (a condition shared by all of its rules, such as the joystick button
+# being held) they are skipped entirely while the guard is false. The clock is
+# only read while a condition is true, and hold times are kept in integer
+# nanoseconds (see piper_clock.py).
+#
+# *** Usage:
+#
+# from piper_statemachine import PiperStateMachine, PiperTransition
+#
+# machine = PiperStateMachine(_UNWIRED)
+# machine.addState(_UNWIRED, self._unwiredMode, (
+#     PiperTransition(self._joystickCentered, _JOYSTICK, holdTime=0.5),
+# ))
+# machine.addState(_JOYSTICK, self._joystickMode, (
+#     PiperTransition(None, _KEYBOARD, holdTime=1.0, action=self.releaseJoystickHID),
+# ), guard=self.joy_z.zPressed)
+# while True:
+#     machine.process()
+#
+################################################################################
+from piper_clock import monotonic_ns, nanoseconds
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+class PiperTransition:
+    def __init__(self, condition, target, holdTime=0, action=None):
+        self.condition = condition
+        self.target = target
+        self.holdTime = holdTime
+        self.holdNs = nanoseconds(holdTime)
+        self.action = action
+        self.since = None
+
+class PiperStateMachine:
+    def __init__(self, state):
+        self._states = {}
+        self._state = state
+        self._handler = None
+        self._transitions = ()
+        self._guard = None
+        self._timing = False
+
+    def addState(self, state, handler, transitions=(), guard=None):
+        self._states[state] = (handler, tuple(transitions), guard)
+        if state == self._state:
+            self.state = state
+
+    # Setting the state directly skips the transition actions
+    #
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        self._handler, self._transitions, self._guard = self._states[state]
+        self._resetTimers()
+        self._state = state
+
+    def _resetTimers(self):
+        for transition in self._transitions:
+            transition.since = None
+        self._timing = False
+
+    def process(self):
+        if self._guard is not None and not self._guard():
+            if self._timing:
+                self._resetTimers()
+            self._handler()
+            return
+
+        now = None
+        for transition in self._transitions:
+            if transition.condition is not None and not transition.condition():
+                transition.since = None
+                continue
+            if transition.holdNs:
+                if now is None:
+                    now = monotonic_ns()
+                if transition.since is None:
+                    transition.since = now
+                    self._timing = True
+                    continue
+                if now - transition.since <= transition.holdNs:
+                    continue
+            if transition.action is not None:
+                transition.action()
+            self.state = transition.target
+            break
+        self._handler()
@@ -0,0 +1,156 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Custom USB HID devices for the command center, registered from boot.py.
+#
+# The gamepad sends the whole controller in one 6 byte report: 16 buttons
+# (button n is bit n-1, so the piper_inputs BIT_* masks can be used as they
+# are) followed by the X and Y axes as signed 16 bit values, -32767 to 32767.
+# Compared with emulating a controller by holding keyboard keys, every
+# button and the full analog deflection of both axes go out together in a
+# single report, however many of them changed.
+#
+# The N-key rollover keyboard reports every key as one bit of a bitmap: a
+# modifier byte followed by 15 bytes for key codes 0 to 119 (every key on a
+# US keyboard, including F13 to F24). The stock boot protocol keyboard only
+# has room for 6 keys besides the modifiers. The NKRO keyboard has the same
+# usage as the stock one, and the devices in usb_hid.devices neither are the
+# usb_hid.Device objects given to enable() nor tell their report lengths, so
+# it is told apart by position: enableDevices() enables it after the stock
+# keyboard, making it the second keyboard (findNKROKeyboard()). The boot
+# keyboard stays enabled for hosts that only speak the boot protocol (BIOS
+# setup, some consoles).
+#
+# usb_hid.enable() only exists from CircuitPython 7 and only works in
+# boot.py. On older firmware enableDevices() does nothing and returns False,
+# and the programs run without the gamepad and the NKRO keyboard
+# (PiperGamepad and PiperNKROKeyboard can't find them).
+#
+# *** Usage (boot.py):
+#
+# import piper_usb
+# piper_usb.enableDevices()
+#
+################################################################################
+import usb_hid
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+GAMEPAD_REPORT_ID = 4
+GAMEPAD_REPORT_LENGTH = 6
+
+GAMEPAD_REPORT_DESCRIPTOR = bytes((
+    0x05, 0x01,         # Usage Page (Generic Desktop)
+    0x09, 0x05,         # Usage (Game Pad)
+    0xA1, 0x01,         # Collection (Application)
+    0x85, GAMEPAD_REPORT_ID, #   Report ID
+    0x05, 0x09,         #   Usage Page (Button)
+    0x19, 0x01,         #   Usage Minimum (Button 1)
+    0x29, 0x10,         #   Usage Maximum (Button 16)
+    0x15, 0x00,         #   Logical Minimum (0)
+    0x25, 0x01,         #   Logical Maximum (1)
+    0x75, 0x01,         #   Report Size (1)
+    0x95, 0x10,         #   Report Count (16)
+    0x81, 0x02,         #   Input (Data, Variable, Absolute)
+    0x05, 0x01,         #   Usage Page (Generic Desktop)
+    0x09, 0x30,         #   Usage (X)
+    0x09, 0x31,         #   Usage (Y)
+    0x16, 0x01, 0x80,   #   Logical Minimum (-32767)
+    0x26, 0xFF, 0x7F,   #   Logical Maximum (32767)
+    0x75, 0x10,         #   Report Size (16)
+    0x95, 0x02,         #   Report Count (2)
+    0x81, 0x02,         #   Input (Data, Variable, Absolute)
+    0xC0,               # End Collection
+))
+
+NKRO_REPORT_ID = 5
+NKRO_KEYS = 120
+NKRO_REPORT_LENGTH = 1 + NKRO_KEYS // 8
+
+NKRO_REPORT_DESCRIPTOR = bytes((
+    0x05, 0x01,         # Usage Page (Generic Desktop)
+    0x09, 0x06,         # Usage (Keyboard)
+    0xA1, 0x01,         # Collection (Application)
+    0x85, NKRO_REPORT_ID, #   Report ID
+    0x05, 0x07,         #   Usage Page (Keyboard)
+    0x19, 0xE0,         #   Usage Minimum (Left Control)
+    0x29, 0xE7,         #   Usage Maximum (Right GUI)
+    0x15, 0x00,         #   Logical Minimum (0)
+    0x25, 0x01,         #   Logical Maximum (1)
+    0x75, 0x01,         #   Report Size (1)
+    0x95, 0x08,         #   Report Count (8)
+    0x81, 0x02,         #   Input (Data, Variable, Absolute)
+    0x19, 0x00,         #   Usage Minimum (0)
+    0x29, NKRO_KEYS - 1, #   Usage Maximum (119)
+    0x95, NKRO_KEYS,    #   Report Count (120)
+    0x81, 0x02,         #   Input (Data, Variable, Absolute)
+    0xC0,               # End Collection
+))
+
+def gamepadDevice():
+    return usb_hid.Device(
+        report_descriptor=GAMEPAD_REPORT_DESCRIPTOR,
+        usage_page=0x01,
+        usage=0x05,
+        report_ids=(GAMEPAD_REPORT_ID,),
+        in_report_lengths=(GAMEPAD_REPORT_LENGTH,),
+        out_report_lengths=(0,),
+    )
+
+def nkroKeyboardDevice():
+    return usb_hid.Device(
+        report_descriptor=NKRO_REPORT_DESCRIPTOR,
+        usage_page=0x01,
+        usage=0x06,
+        report_ids=(NKRO_REPORT_ID,),
+        in_report_lengths=(NKRO_REPORT_LENGTH,),
+        out_report_lengths=(0,),
+    )
+
+# The enabled NKRO keyboard (the second keyboard, see above), ValueError if
+# there isn't one, as before CircuitPython 7 with only the stock keyboard
+#
+def findNKROKeyboard(devices):
+    keyboards = 0
+    for device in devices:
+        if device.usage_page == 0x01 and device.usage == 0x06:
+            keyboards += 1
+            if keyboards == 2:
+                return device
+    raise ValueError("NKRO keyboard not enabled in boot.py")
+
+# The stock keyboard, mouse and consumer control, plus the gamepad and the
+# NKRO keyboard (which has to come after the stock keyboard)
+#
+def enableDevices(gamepad=True, nkro=True):
+    if not hasattr(usb_hid, "enable"):
+        return False
+    devices = [usb_hid.Device.KEYBOARD, usb_hid.Device.MOUSE, usb_hid.Device.CONSUMER_CONTROL]
+    if gamepad:
+        devices.append(gamepadDevice())
+    if nkro:
+        devices.append(nkroKeyboardDevice())
+    usb_hid.enable(tuple(devices))
+    return True
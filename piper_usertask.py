@@ -0,0 +1,116 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Runs a user program alongside the command center, a time slice at a time.
+#
+# The program is a generator: it does a little work and yields, and step(),
+# run by a scheduler task once per frame, resumes it up to the next yield.
+# Nothing can stop Python code part way through, so the slice is a budget
+# rather than a limit: a step that takes longer than timeSlice is counted as
+# an overrun (with the longest one in worst), and reported on the console at
+# most once every reportInterval seconds, as the command center's own tasks
+# were held up meanwhile. Waiting is done with yield from wait(seconds)
+# instead of time.sleep().
+#
+# The program ends when the generator returns or raises (the exception is
+# printed), or stop() closes it.
+#
+# *** Usage:
+#
+# from piper_usertask import PiperUserTask, wait
+#
+# def blink(led):
+#     while True:
+#         led.value = not led.value
+#         yield from wait(0.5)
+#
+# userTask = PiperUserTask(timeSlice=0.002)
+# userTask.start(blink(led))
+# scheduler.addTask(userTask.step, 0.01)
+#
+################################################################################
+from piper_clock import monotonic_ns, nanoseconds
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+# Yield until seconds have passed
+#
+def wait(seconds):
+    end = monotonic_ns() + nanoseconds(seconds)
+    while monotonic_ns() < end:
+        yield
+
+class PiperUserTask:
+    def __init__(self, timeSlice=0.002, reportInterval=1.0):
+        self.timeSlice = nanoseconds(timeSlice)
+        self.reportInterval = nanoseconds(reportInterval)
+        self.generator = None
+        self.steps = 0
+        self.overruns = 0
+        self.worst = 0
+        self._reported = None
+
+    @property
+    def running(self):
+        return self.generator is not None
+
+    def start(self, generator):
+        self.stop()
+        self.generator = generator
+        self.steps = 0
+        self.overruns = 0
+        self.worst = 0
+        self._reported = None
+
+    def stop(self):
+        if self.generator is not None:
+            self.generator.close()
+            self.generator = None
+
+    # Resume the program for one step, False once it has ended
+    #
+    def step(self):
+        generator = self.generator
+        if generator is None:
+            return False
+        start = monotonic_ns()
+        try:
+            next(generator)
+        except StopIteration:
+            self.generator = None
+        except Exception as e:
+            print("User task stopped:", repr(e))
+            self.generator = None
+        now = monotonic_ns()
+        elapsed = now - start
+        self.steps += 1
+        if elapsed > self.timeSlice:
+            self.overruns += 1
+            if elapsed > self.worst:
+                self.worst = elapsed
+            if self._reported is None or now - self._reported >= self.reportInterval:
+                self._reported = now
+                print("User task step took %d us, over its %d us slice (%d of %d steps)" % (elapsed // 1000, self.timeSlice // 1000, self.overruns, self.steps))
+        return self.generator is not None
@@ -0,0 +1,167 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+#
+# Tells from the joystick's ADC readings whether it is wired, and whether it
+# is centered, in a few tens of milliseconds.
+#
+# A wired joystick axis is a potentiometer: its readings sit still apart from
+# a little ADC noise. An unwired (floating) analog input picks up whatever
+# is around it, so it jumps or wanders over much of the range. Rather than
+# wait for every single reading to stay inside the deadband for a while,
+# update() takes a burst of samples readings from each axis, and every
+# bursts bursts (a window) the detector classifies the joystick:
+#
+#   UNWIRED    an axis was noisy (the mean variance within its bursts, the
+#              fast noise, over noise^2) or the means of its bursts spanned
+#              over spread counts (slow drift), during the window and the
+#              CENTERED windows just before it while confirming
+#   WIRED      neither, but an axis's mean was outside its deadbandCutoff
+#              (held off center, or resting at the end of its travel)
+#   CENTERED   neither, and both means inside the deadband
+#
+# result is UNKNOWN until the first window is complete. centered becomes
+# true once confirm windows in a row were CENTERED, and stays so until a
+# window that wasn't. With update() once per millisecond the defaults take
+# 96ms. Confirming over fewer windows is quicker, but lets through more
+# floating inputs that drift slowly and happen to pause near the middle.
+# A floating input that happens to hold still near the middle for that
+# long is indistinguishable from a centered joystick (as it is for any
+# length of time the joystick is required to read centered).
+#
+# Noise and spread are in 16 bit ADC counts. The statistics are kept in
+# small integers (readings >> 5 from center), so nothing is allocated for
+# up to 16 samples per burst. The axes are objects with pin (an AnalogIn)
+# and deadbandCutoff, such as PiperJoystickAxis; pin is looked up on every
+# burst, so an axis can swap it.
+#
+# *** Usage:
+#
+# from piper_wiring import PiperWiringDetector
+#
+# wiring = PiperWiringDetector((x_axis, y_axis))
+# while not wiring.centered:
+#     wiring.update()             # once per pass
+#
+################################################################################
+
+__repo__ = "https://github.com/derhexenmeister/CommandCenter.git"
+
+# Classifications
+#
+UNKNOWN         = 0
+UNWIRED         = 1
+WIRED           = 2
+CENTERED        = 3
+
+# Readings are scaled down by this many bits for the statistics, so that
+# sums of squares stay small ints
+#
+_SHIFT          = 5
+_CENTER         = 32768 >> _SHIFT
+
+class PiperWiringDetector:
+    def __init__(self, axes, samples=16, bursts=16, noise=1024, spread=1024, confirm=6):
+        self.axes = axes
+        self.samples = samples
+        self.bursts = bursts
+        self.noise = noise
+        self.spread = spread
+        self.confirm = confirm
+        count = len(axes)
+        self._low = [0] * count
+        self._high = [0] * count
+        self._total = [0] * count
+        self._variance = [0] * count
+        self.reset()
+
+    # Start over, e.g. after the joystick has been unplugged
+    #
+    def reset(self):
+        self.result = UNKNOWN
+        self.windows = 0
+        self._restart(True)
+
+    @property
+    def centered(self):
+        return self.windows >= self.confirm
+
+    # The spread of the burst means carries on over the windows that
+    # confirm the joystick is centered
+    #
+    def _restart(self, spread):
+        self._burst = 0
+        for i in range(len(self.axes)):
+            if spread:
+                self._low[i] = 65535
+                self._high[i] = -65535
+            self._total[i] = 0
+            self._variance[i] = 0
+
+    # One burst from every axis, classifying the window once it is complete.
+    # Returns the latest result.
+    #
+    def update(self):
+        samples = self.samples
+        low = self._low
+        high = self._high
+        total = self._total
+        variance = self._variance
+        for i in range(len(self.axes)):
+            pin = self.axes[i].pin
+            offsets = 0
+            squares = 0
+            for _ in range(samples):
+                offset = (pin.value >> _SHIFT) - _CENTER
+                offsets += offset
+                squares += offset * offset
+            if offsets < low[i]:
+                low[i] = offsets
+            if offsets > high[i]:
+                high[i] = offsets
+            total[i] += offsets
+            variance[i] += (samples * squares - offsets * offsets) // (samples * samples)
+        self._burst += 1
+        if self._burst >= self.bursts:
+            self._classify()
+            self._restart(self.windows == 0 or self.windows >= self.confirm)
+        return self.result
+
+    def _classify(self):
+        bursts = self.bursts
+        count = self.samples * bursts
+        noiseLimit = ((self.noise >> _SHIFT) ** 2) * bursts
+        spreadLimit = (self.spread >> _SHIFT) * self.samples
+        result = CENTERED
+        for i in range(len(self.axes)):
+            if self._variance[i] > noiseLimit or self._high[i] - self._low[i] > spreadLimit:
+                result = UNWIRED
+                break
+            offset = (self._total[i] << _SHIFT) // count
+            if offset < 0:
+                offset = -offset
+            if offset >= int(self.axes[i].deadbandCutoff * 32768):
+                result = WIRED
+        self.result = result
+        self.windows = self.windows + 1 if result == CENTERED else 0
@@ -0,0 +1,143 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Host-side simulation of the CircuitPython environment used by the Piper
+# Command Center, so that code.py and the demos can be driven on a PC
+# without flashing a board.
+#
+# Stand-ins are provided for board, analogio, digitalio, keypad, usb_hid,
+# supervisor, asyncio, alarm, microcontroller, adafruit_dotstar and
+# micropython (simulator/modules), plus a fake monotonic clock that replaces
+# the time module. Inputs are scripted through simulator.hardware, HID
+# reports land on counting/recording usb_hid devices and DotStar writes are
+# counted.
+#
+# *** Usage:
+#
+# import simulator
+# from simulator import board, hardware
+#
+# cc = simulator.load("code.py")
+# pcc = cc.PiperCommandCenter()
+# hardware.at(1.0, hardware.set_analog, board.A4, 60000)   # push right after 1s
+# simulator.run(pcc, seconds=2.0, step=0.001)              # 1ms per iteration
+# print(simulator.usb_hid.Device.MOUSE.reports_sent)
+#
+# The pure Python Adafruit libraries are used unmodified and need to be
+# installed on the host:
+#
+#   pip install --no-deps adafruit-circuitpython-hid adafruit-circuitpython-debouncer \
+#       adafruit-circuitpython-ticks adafruit-circuitpython-typing
+#
+################################################################################
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules")
+
+################################################################################
+# Put the stand-in modules (and the repository root, for code imported by the
+# programs) ahead of anything else on the import path and switch the time
+# module over to the fake clock
+#
+def install():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    if MODULES not in sys.path:
+        sys.path.insert(0, MODULES)
+    sys.modules["time"] = clock
+
+from simulator import clock, hardware
+
+install()
+
+import board
+import usb_hid
+
+################################################################################
+# Load a CircuitPython program (relative to the repository root) as a module.
+# Programs guard their main loop with __name__ == "__main__" so this only
+# defines their classes.
+#
+def load(path, name=None):
+    path = os.path.join(ROOT, path)
+    if name is None:
+        name = "sim_" + os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+################################################################################
+# Put the board back to power-on state: clock at zero, no pins claimed,
+# inputs released, the default HID devices with their counters cleared,
+# sleep_memory and nvm blank
+#
+def reset(start_ns=0):
+    clock.reset(start_ns)
+    hardware.reset()
+    usb_hid.reset()
+
+################################################################################
+# Start the program over as supervisor.reload() does (see hardware.restart())
+# and load it afresh. Returns the new module.
+#
+def restart(path, name=None, reason="SUPERVISOR_RELOAD"):
+    hardware.restart(reason)
+    return load(path, name)
+
+################################################################################
+# Drive target.process() (or a plain callable) for a number of iterations or
+# of simulated seconds, advancing the clock by step seconds per iteration and
+# applying scripted input changes as they come due. Returns the number of
+# iterations run.
+#
+def run(target, iterations=None, seconds=None, step=0.001):
+    process = getattr(target, "process", target)
+    step_ns = int(step * 1000000000)
+    if seconds is not None:
+        end = clock.monotonic_ns() + int(seconds * 1000000000)
+    count = 0
+    while True:
+        if iterations is not None and count >= iterations:
+            break
+        if seconds is not None and clock.monotonic_ns() >= end:
+            break
+        hardware.apply_script()
+        process()
+        clock.advance_ns(step_ns)
+        count += 1
+    return count
+
+################################################################################
+# Run a coroutine (e.g. PiperAsyncRuntime(pcc.scheduler).main()) on the
+# asyncio stand-in for a number of simulated seconds. Returns the idle and
+# busy nanoseconds of the event loop.
+#
+def run_async(coro, seconds):
+    import asyncio
+    asyncio.run(coro, until_ns=clock.monotonic_ns() + int(seconds * 1000000000))
+    return asyncio.stats["idle_ns"], asyncio.stats["busy_ns"]
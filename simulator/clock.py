@@ -0,0 +1,82 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Fake monotonic clock. install() puts this module in sys.modules["time"] so
+# every "import time" in CircuitPython code (and in the Adafruit libraries)
+# sees simulated time. Anything other than monotonic(), monotonic_ns() and
+# sleep() falls through to the host's time module, so time.perf_counter()
+# still measures real elapsed time for benchmarks.
+#
+# The clock only moves when told to: advance() directly, sleep() from the
+# code under test, or simulator.run() stepping it between iterations.
+#
+# CircuitPython floats are 30 bits (a 32 bit float with the two lowest
+# mantissa bits dropped). With circuitpython_floats set, monotonic() returns
+# what the board would, so code that times things with it shows the same
+# loss of resolution as uptime grows (see simulator.reset(start_ns=...)).
+# Arithmetic on the result is still done in host floats.
+#
+# The clock does not move while the code under test runs. Loops that want
+# work to take time (simulator.run_async(), benchmarks/async_runtime.py)
+# advance it by the host time taken times cpu_scale, roughly how much slower
+# the board's interpreter is than the host's.
+#
+################################################################################
+import struct
+import time as _host_time
+
+_now_ns = 0
+
+circuitpython_floats = False
+
+cpu_scale = 0
+
+def reset(start_ns=0):
+    global _now_ns
+    _now_ns = start_ns
+
+def advance(seconds):
+    advance_ns(int(seconds * 1000000000))
+
+def advance_ns(ns):
+    global _now_ns
+    _now_ns += ns
+
+def monotonic_ns():
+    return _now_ns
+
+def _float30(value):
+    bits = struct.unpack("<I", struct.pack("<f", value))[0] & ~3
+    return struct.unpack("<f", struct.pack("<I", bits))[0]
+
+def monotonic():
+    if circuitpython_floats:
+        return _float30(_now_ns / 1000000000)
+    return _now_ns / 1000000000
+
+def sleep(seconds):
+    advance(seconds)
+
+def __getattr__(name):
+    return getattr(_host_time, name)
@@ -0,0 +1,191 @@
+################################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Keith Evans
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+################################################################################
+# Simulated board state shared by the stand-in modules. Benchmarks script the
+# inputs through these functions.
+#
+################################################################################
+from simulator import clock
+
+# Pins currently owned by a DigitalInOut/AnalogIn/DotStar, as on the board
+# claiming a pin twice raises ValueError
+#
+claimed = set()
+
+# ADC value for each analog pin (0..65535). A callable is invoked on every
+# read so a recorded trace can be replayed.
+#
+analog = {}
+
+# Logic level forced onto a pin from outside, e.g. a pressed button pulling
+# an input low. Pins not in here float to their pull.
+#
+levels = {}
+
+# Readings returned by the sensor stand-ins used by piper_blockly.py
+#
+sensors = {"distance": 100.0, "temperature": 21.0, "color": (0, 0, 0)}
+
+# Every HID report sent as (time_ns, device name, report bytes), or None when
+# only the per-device counters are wanted (the default, so long runs do not
+# grow without bound)
+#
+hid_log = None
+
+# How the host polls the HID endpoint, shared by all the devices as on the
+# board. With hid_poll_interval (ns) set, a report sent before the host has
+# taken the previous one blocks until the next poll, and while hid_suspended
+# send_report() blocks for hid_timeout (ns) and raises OSError. The time
+# spent blocked advances the clock and is added up in hid_blocked_ns. The
+# default is a host that takes every report straight away.
+#
+hid_poll_interval = 0
+hid_suspended = False
+hid_timeout = 2000000000
+hid_blocked_ns = 0
+
+# Scripted input changes as [time_ns, action, args], kept sorted by time
+#
+_script = []
+
+# Inputs scanned independently of the program (keypad.Keys), as callables
+# taking a time in ns. Each is run with the levels that held up to the time
+# of every scripted change before that change is applied, so background
+# scanning sees changes that happen while the program's loop is stalled.
+#
+scanners = []
+
+# Memory kept across a restart: alarm.sleep_memory (lost at power up) and
+# microcontroller.nvm (flash, erased to 0xFF). The stand-in modules share
+# these objects, so they are only ever changed in place.
+#
+sleep_memory = bytearray(4096)
+nvm = bytearray(b"\xff" * 8192)
+
+# Why the program last started, as supervisor.runtime.run_reason (a
+# supervisor.RunReason name)
+#
+run_reason = "STARTUP"
+
+# Raised by supervisor.reload() so the caller can see the program restart.
+# Like the board's, it isn't an Exception, so "except Exception" in the
+# program doesn't stop it.
+#
+class ReloadRequested(BaseException):
+    pass
+
+def claim(pin):
+    if pin in claimed:
+        raise ValueError("%s in use" % pin)
+    claimed.add(pin)
+
+def release(pin):
+    claimed.discard(pin)
+
+def reset():
+    global hid_log, hid_poll_interval, hid_suspended, hid_blocked_ns, run_reason
+    claimed.clear()
+    analog.clear()
+    levels.clear()
+    hid_log = None
+    hid_poll_interval = 0
+    hid_suspended = False
+    hid_blocked_ns = 0
+    del _script[:]
+    del scanners[:]
+    sleep_memory[:] = bytes(len(sleep_memory))
+    nvm[:] = b"\xff" * len(nvm)
+    run_reason = "STARTUP"
+
+# The program starting over after supervisor.reload(): its pins and
+# background scanning are gone, but the clock, the inputs, the HID devices
+# and the memory kept across a restart carry on
+#
+def restart(reason="SUPERVISOR_RELOAD"):
+    global run_reason
+    claimed.clear()
+    del scanners[:]
+    run_reason = reason
+
+def record_hid(enabled=True):
+    global hid_log
+    hid_log = [] if enabled else None
+
+# Slow (or normal again, with 0) host polling in seconds, e.g.
+# at(1.0, slow_host, 0.05)
+#
+def slow_host(interval):
+    global hid_poll_interval
+    hid_poll_interval = int(interval * 1000000000)
+
+def suspend_host(suspended=True):
+    global hid_suspended
+    hid_suspended = suspended
+
+def set_analog(pin, value):
+    analog[pin] = value
+
+def analog_value(pin):
+    value = analog.get(pin, 32768)
+    if callable(value):
+        value = value()
+    return value
+
+# Buttons are wired to ground with the internal pull-up enabled
+#
+def press(pin):
+    levels[pin] = False
+
+def unpress(pin):
+    levels.pop(pin, None)
+
+# Replay a recorded list of ADC samples, one per read, looping at the end
+#
+def trace(samples):
+    position = [-1]
+    count = len(samples)
+    def read():
+        position[0] = (position[0] + 1) % count
+        return samples[position[0]]
+    return read
+
+# Run action(*args) once simulated time reaches the given number of seconds
+# from now, e.g. at(1.5, press, board.D2)
+#
+def at(seconds, action, *args):
+    due = clock.monotonic_ns() + int(seconds * 1000000000)
+    index = len(_script)
+    while index > 0 and _script[index - 1][0] > due:
+        index -= 1
+    _script.insert(index, (due, action, args))
+
+def apply_script():
+    now = clock.monotonic_ns()
+    while _script and _script[0][0] <= now:
+        due, action, args = _script.pop(0)
+        for scan in scanners:
+            scan(due)
+        action(*args)
+    for scan in scanners:
+        scan(now)
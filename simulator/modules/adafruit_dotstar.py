@@ -0,0 +1,44 @@
+# Stand-in for the adafruit_dotstar library. Every pixel assignment counts
+# as a write (with auto_write that is an SPI transfer on the board).
+#
+from simulator import hardware
+
+class DotStar:
+    def __init__(self, clock, data, n, brightness=1.0, auto_write=True, pixel_order=None, baudrate=4000000):
+        hardware.claim(clock)
+        hardware.claim(data)
+        self._pins = (clock, data)
+        self._pixels = [(0, 0, 0)] * n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self.writes = 0
+
+    def deinit(self):
+        for pin in self._pins:
+            hardware.release(pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = tuple(color)
+        if self.auto_write:
+            self.writes += 1
+
+    def fill(self, color):
+        for i in range(len(self._pixels)):
+            self._pixels[i] = tuple(color)
+        if self.auto_write:
+            self.writes += 1
+
+    def show(self):
+        self.writes += 1
@@ -0,0 +1,11 @@
+# Stand-in for the adafruit_mcp9808 library
+#
+from simulator import hardware
+
+class MCP9808:
+    def __init__(self, i2c_bus, address=0x18):
+        self.i2c_bus = i2c_bus
+
+    @property
+    def temperature(self):
+        return hardware.sensors["temperature"]
@@ -0,0 +1,11 @@
+# Stand-in for the adafruit_tcs34725 library
+#
+from simulator import hardware
+
+class TCS34725:
+    def __init__(self, i2c_bus, address=0x29):
+        self.i2c_bus = i2c_bus
+
+    @property
+    def color_rgb_bytes(self):
+        return hardware.sensors["color"]
@@ -0,0 +1,6 @@
+# Stand-in for the CircuitPython alarm module (just the memory kept across
+# restarts)
+#
+from simulator import hardware
+
+sleep_memory = hardware.sleep_memory
@@ -0,0 +1,22 @@
+# Stand-in for the CircuitPython analogio module
+#
+from simulator import hardware
+
+class AnalogIn:
+    def __init__(self, pin):
+        hardware.claim(pin)
+        self._pin = pin
+        self.reference_voltage = 3.3
+
+    def deinit(self):
+        hardware.release(self._pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    @property
+    def value(self):
+        return hardware.analog_value(self._pin)
@@ -0,0 +1,115 @@
+# Stand-in for the CircuitPython asyncio library (run, create_task, gather,
+# sleep and sleep_ms), running on the fake clock. When every task is
+# sleeping the clock jumps to the next wake-up and the gap is counted as idle
+# time, which on the board is time the CPU waits instead of spinning.
+# Scripted input changes are applied as the clock passes them.
+#
+# Like the board's, the event loop keeps time in whole ticks_ms: a task
+# sleeping for n ms wakes at the start of the nth millisecond tick after the
+# current one, not exactly n ms later.
+#
+# With clock.cpu_scale set, each step of a task also advances the clock by
+# the host time it took times cpu_scale, so slow work makes other tasks late
+# as it would on the board.
+#
+# run() goes on until the main coroutine returns, or for simulator.run_async()
+# until the given time; the idle and busy nanoseconds are kept in stats.
+#
+from simulator import clock, hardware
+
+stats = {"idle_ns": 0, "busy_ns": 0}
+
+class _Sleep:
+    def __init__(self, ms):
+        self.ms = ms
+
+    def __await__(self):
+        yield self
+
+def sleep(seconds):
+    return _Sleep(max(0, int(seconds * 1000)))
+
+def sleep_ms(ms):
+    return _Sleep(max(0, int(ms)))
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.done = False
+        self.result = None
+        self.waiting = []
+
+    def __await__(self):
+        if not self.done:
+            yield self
+        return self.result
+
+# Ready tasks by wake-up time, first come first served within the same time
+#
+_queue = []
+
+def _schedule(task, wake):
+    index = len(_queue)
+    while index > 0 and _queue[index - 1][0] > wake:
+        index -= 1
+    _queue.insert(index, (wake, task))
+
+def create_task(coro):
+    task = Task(coro)
+    _schedule(task, clock.monotonic_ns())
+    return task
+
+async def _gather(tasks):
+    results = []
+    for task in tasks:
+        results.append(await task)
+    return results
+
+def gather(*awaitables):
+    return _gather([aw if isinstance(aw, Task) else create_task(aw) for aw in awaitables])
+
+def _step(task):
+    try:
+        waiting_for = task.coro.send(None)
+    except StopIteration as stop:
+        task.done = True
+        task.result = stop.value
+        for waiter in task.waiting:
+            _schedule(waiter, clock.monotonic_ns())
+        return
+    if isinstance(waiting_for, _Sleep):
+        ms = waiting_for.ms
+        if ms:
+            _schedule(task, (clock.monotonic_ns() // 1000000 + ms) * 1000000)
+        else:
+            _schedule(task, clock.monotonic_ns())
+    elif isinstance(waiting_for, Task) and not waiting_for.done:
+        waiting_for.waiting.append(task)
+    else:
+        _schedule(task, clock.monotonic_ns())
+
+def run(main, until_ns=None):
+    del _queue[:]
+    stats["idle_ns"] = 0
+    stats["busy_ns"] = 0
+    main_task = create_task(main)
+    while _queue and not main_task.done:
+        wake, task = _queue[0]
+        now = clock.monotonic_ns()
+        if until_ns is not None and max(wake, now) >= until_ns:
+            if until_ns > now:
+                stats["idle_ns"] += until_ns - now
+                clock.advance_ns(until_ns - now)
+            break
+        if wake > now:
+            stats["idle_ns"] += wake - now
+            clock.advance_ns(wake - now)
+        _queue.pop(0)
+        hardware.apply_script()
+        start = clock.thread_time_ns()
+        before = clock.monotonic_ns()
+        _step(task)
+        clock.advance_ns(int((clock.thread_time_ns() - start) * clock.cpu_scale))
+        stats["busy_ns"] += clock.monotonic_ns() - before
+    del _queue[:]
+    return main_task.result
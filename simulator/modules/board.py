@@ -0,0 +1,34 @@
+# Stand-in for the CircuitPython board module (ItsyBitsy M4 Express pinout)
+#
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+A0 = Pin("A0")
+A1 = Pin("A1")
+A2 = Pin("A2")
+A3 = Pin("A3")
+A4 = Pin("A4")
+A5 = Pin("A5")
+D0 = RX = Pin("D0")
+D1 = TX = Pin("D1")
+D2 = Pin("D2")
+D3 = Pin("D3")
+D4 = Pin("D4")
+D5 = Pin("D5")
+D7 = Pin("D7")
+D9 = Pin("D9")
+D10 = Pin("D10")
+D11 = Pin("D11")
+D12 = Pin("D12")
+D13 = LED = Pin("D13")
+SCK = Pin("SCK")
+MOSI = Pin("MOSI")
+MISO = Pin("MISO")
+SDA = Pin("SDA")
+SCL = Pin("SCL")
+APA102_SCK = Pin("APA102_SCK")
+APA102_MOSI = Pin("APA102_MOSI")
@@ -0,0 +1,53 @@
+# Stand-in for the CircuitPython digitalio module
+#
+from simulator import hardware
+
+class Direction:
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+class Pull:
+    UP = "UP"
+    DOWN = "DOWN"
+
+class DriveMode:
+    PUSH_PULL = "PUSH_PULL"
+    OPEN_DRAIN = "OPEN_DRAIN"
+
+class DigitalInOut:
+    def __init__(self, pin):
+        hardware.claim(pin)
+        self._pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self._value = False
+
+    def deinit(self):
+        hardware.release(self._pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self._value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    @property
+    def value(self):
+        if self.direction == Direction.OUTPUT:
+            return self._value
+        level = hardware.levels.get(self._pin)
+        if level is None:
+            return self.pull == Pull.UP
+        return level
+
+    @value.setter
+    def value(self, value):
+        self._value = bool(value)
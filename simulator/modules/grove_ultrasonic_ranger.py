@@ -0,0 +1,12 @@
+# Stand-in for the grove_ultrasonic_ranger library
+#
+from simulator import hardware
+
+class GroveUltrasonicRanger:
+    def __init__(self, pin):
+        hardware.claim(pin)
+        self._pin = pin
+
+    @property
+    def distance(self):
+        return hardware.sensors["distance"]
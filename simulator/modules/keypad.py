@@ -0,0 +1,101 @@
+# Stand-in for the CircuitPython 7 keypad module (Keys only). On the board
+# the keys are scanned in the background every interval seconds; here the
+# scan is registered with simulator.hardware, which runs it at the scripted
+# input changes, so edges are seen at scan time even while the program's
+# loop is stalled.
+#
+from simulator import clock, hardware
+
+_TICKS_MASK = (1 << 29) - 1
+
+class Event:
+    def __init__(self, key_number=0, pressed=True):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = 0
+
+    @property
+    def released(self):
+        return not self.pressed
+
+class EventQueue:
+    def __init__(self, max_events):
+        self._max_events = max_events
+        self._events = []
+        self.overflowed = False
+
+    def _put(self, key_number, pressed, timestamp):
+        if len(self._events) >= self._max_events:
+            self.overflowed = True
+            return
+        self._events.append((key_number, pressed, timestamp))
+
+    def get(self):
+        if not self._events:
+            return None
+        event = Event()
+        self.get_into(event)
+        return event
+
+    def get_into(self, event):
+        if not self._events:
+            return False
+        event.key_number, event.pressed, event.timestamp = self._events.pop(0)
+        return True
+
+    def clear(self):
+        del self._events[:]
+        self.overflowed = False
+
+    def __len__(self):
+        return len(self._events)
+
+    def __bool__(self):
+        return bool(self._events)
+
+class Keys:
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.020, max_events=64):
+        for pin in pins:
+            hardware.claim(pin)
+        self._pins = tuple(pins)
+        self._value_when_pressed = value_when_pressed
+        self._pull = pull
+        self._interval_ns = int(interval * 1000000000)
+        self._next_ns = clock.monotonic_ns()
+        self._pressed = [False] * len(self._pins)
+        self.events = EventQueue(max_events)
+        hardware.scanners.append(self._scan)
+
+    @property
+    def key_count(self):
+        return len(self._pins)
+
+    def deinit(self):
+        if self._scan in hardware.scanners:
+            hardware.scanners.remove(self._scan)
+        for pin in self._pins:
+            hardware.release(pin)
+
+    def reset(self):
+        self._pressed = [False] * len(self._pins)
+
+    def _level(self, pin):
+        level = hardware.levels.get(pin)
+        if level is None:
+            # Pulled away from the pressed level when pull is set
+            return not self._value_when_pressed if self._pull else False
+        return level
+
+    # Pin levels have been constant since the last change, so of the scans
+    # due up to now_ns only the first can see anything new
+    #
+    def _scan(self, now_ns):
+        if now_ns < self._next_ns:
+            return
+        timestamp = (self._next_ns // 1000000) & _TICKS_MASK
+        for key_number, pin in enumerate(self._pins):
+            pressed = self._level(pin) == self._value_when_pressed
+            if pressed != self._pressed[key_number]:
+                self._pressed[key_number] = pressed
+                self.events._put(key_number, pressed, timestamp)
+        self._next_ns += ((now_ns - self._next_ns) // self._interval_ns + 1) * self._interval_ns
@@ -0,0 +1,6 @@
+# Stand-in for the CircuitPython microcontroller module (just the
+# non-volatile memory)
+#
+from simulator import hardware
+
+nvm = hardware.nvm
@@ -0,0 +1,30 @@
+# Stand-in for the CircuitPython supervisor module
+#
+from simulator import clock, hardware
+
+class RunReason:
+    STARTUP = "STARTUP"
+    AUTO_RELOAD = "AUTO_RELOAD"
+    SUPERVISOR_RELOAD = "SUPERVISOR_RELOAD"
+    REPL_RELOAD = "REPL_RELOAD"
+
+class _Runtime:
+    serial_connected = True
+    serial_bytes_available = False
+
+    # False while the host has suspended the bus, as on the board
+    @property
+    def usb_connected(self):
+        return not hardware.hid_suspended
+
+    @property
+    def run_reason(self):
+        return getattr(RunReason, hardware.run_reason)
+
+runtime = _Runtime()
+
+def reload():
+    raise hardware.ReloadRequested()
+
+def ticks_ms():
+    return (clock.monotonic_ns() // 1000000) & ((1 << 29) - 1)
@@ -0,0 +1,103 @@
+# Stand-in for the CircuitPython usb_hid module. Each device counts the
+# reports sent and keeps the last one; hardware.record_hid() additionally
+# logs every report with its timestamp.
+#
+# send_report() blocks like the board's when the host polls slowly or is
+# suspended (see hardware.slow_host() and hardware.suspend_host()).
+#
+# enable() (CircuitPython 7, normally called from boot.py) swaps the device
+# set straight away, as if the board had been reset with that boot.py;
+# simulator.reset() goes back to the default keyboard, mouse and consumer
+# control. As on the board, the enabled devices are new objects rather than
+# the ones passed to enable(), and send_report() raises ValueError for a
+# report of the wrong length.
+#
+from simulator import clock, hardware
+
+# Names for the devices piper_usb.py defines, by usage page and usage
+#
+_NAMES = {(0x01, 0x05): "GAMEPAD", (0x01, 0x06): "NKRO_KEYBOARD"}
+
+class Device:
+    def __init__(self, usage_page, usage, name=None, report_descriptor=None, report_ids=(0,), in_report_lengths=(0,), out_report_lengths=(0,)):
+        self.usage_page = usage_page
+        self.usage = usage
+        if name is None:
+            name = _NAMES.get((usage_page, usage), "0x%02x:0x%02x" % (usage_page, usage))
+        self.name = name
+        self.report_descriptor = report_descriptor
+        self.report_ids = tuple(report_ids)
+        self.in_report_lengths = tuple(in_report_lengths)
+        self.out_report_lengths = tuple(out_report_lengths)
+        self.reset()
+
+    def __repr__(self):
+        return "usb_hid.Device." + self.name
+
+    def reset(self):
+        self.last_report = None
+        self.reports_sent = 0
+        self.bytes_sent = 0
+
+    def send_report(self, report, report_id=None):
+        length = self.in_report_lengths[0]
+        if length and len(report) != length:
+            raise ValueError("Buffer incorrect size. Should be %d bytes." % length)
+        _wait()
+        self.last_report = bytes(report)
+        self.reports_sent += 1
+        self.bytes_sent += len(report)
+        if hardware.hid_log is not None:
+            hardware.hid_log.append((clock.monotonic_ns(), self.name, self.last_report))
+
+    def get_last_received_report(self, report_id=None):
+        return None
+
+    def _copy(self):
+        return Device(self.usage_page, self.usage, self.name, self.report_descriptor, self.report_ids, self.in_report_lengths, self.out_report_lengths)
+
+Device.KEYBOARD = Device(0x01, 0x06, "KEYBOARD", in_report_lengths=(8,), out_report_lengths=(1,))
+Device.MOUSE = Device(0x01, 0x02, "MOUSE", in_report_lengths=(4,))
+Device.CONSUMER_CONTROL = Device(0x0C, 0x01, "CONSUMER_CONTROL", in_report_lengths=(2,))
+
+# The host takes the report waiting on the endpoint at each poll
+#
+_busy_until = 0
+
+def _block(ns):
+    clock.advance_ns(ns)
+    hardware.hid_blocked_ns += ns
+
+def _wait():
+    global _busy_until
+    if hardware.hid_suspended:
+        _block(hardware.hid_timeout)
+        raise OSError("USB busy")
+    interval = hardware.hid_poll_interval
+    if interval == 0:
+        _busy_until = 0
+        return
+    now = clock.monotonic_ns()
+    if now < _busy_until:
+        _block(_busy_until - now)
+        now = _busy_until
+    _busy_until = (now // interval + 1) * interval
+
+_DEFAULT = (Device.KEYBOARD, Device.MOUSE, Device.CONSUMER_CONTROL)
+
+devices = list(_DEFAULT)
+
+# The list is updated in place so modules that imported it see the change
+#
+def enable(new_devices, boot_device=0):
+    devices[:] = [device._copy() for device in new_devices]
+
+def disable():
+    devices[:] = []
+
+def reset():
+    global _busy_until
+    _busy_until = 0
+    devices[:] = _DEFAULT
+    for device in devices:
+        device.reset()
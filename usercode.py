@@ -1,25 +1,46 @@
 # User's program goes here
 #
+# code.py runs main() when the joystick button is held for a second in
+# joystick mode, with every pin released, and goes back to joystick mode when
+# it returns. Release every pin before returning (with blocks do that),
+# otherwise the board has to restart to get them back. A usercode.py without
+# main() runs when it is imported instead.
+#
+# To keep the mouse working while it runs, define task(pcc) as a generator
+# instead: it runs alongside joystick mode, one step (up to the next yield)
+# every 10ms, each meant to take no more than 2ms, until it returns or the
+# joystick button is held again. pcc.claimPin(pin) takes a pin from the
+# command center before opening it, e.g.
+#
+#   from piper_usertask import wait
+#
+#   def task(pcc):
+#       pcc.claimPin(board.D3)
+#       with DigitalInOut(board.D3) as left:
+#           left.switch_to_input(pull=Pull.UP)
+#           while left.value:
+#               yield from wait(0.1)
+#
 import adafruit_dotstar
 from analogio import AnalogIn
 import board
 from digitalio import DigitalInOut, Direction, Pull
 import time
 
-dotstar_led = adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1)
-dotstar_led[0] = (255, 0, 255)
-
-# Do this just to make sure that the pins are available for use - deinited by code.py
-#
-left_pin = DigitalInOut(board.D3)
-right_pin = DigitalInOut(board.D4)
-up_pin = DigitalInOut(board.D1)
-down_pin = DigitalInOut(board.D0)
-joy_z_pin = DigitalInOut(board.D2)
-ypin = AnalogIn(board.A3)
-xpin = AnalogIn(board.A4)
-gpin = DigitalInOut(board.A5)
+def main():
+    # Open the pins code.py released
+    #
+    with adafruit_dotstar.DotStar(board.APA102_SCK, board.APA102_MOSI, 1) as dotstar_led, \
+            DigitalInOut(board.D3) as left_pin, \
+            DigitalInOut(board.D4) as right_pin, \
+            DigitalInOut(board.D1) as up_pin, \
+            DigitalInOut(board.D0) as down_pin, \
+            DigitalInOut(board.D2) as joy_z_pin, \
+            AnalogIn(board.A3) as ypin, \
+            AnalogIn(board.A4) as xpin, \
+            DigitalInOut(board.A5) as gpin:
+        dotstar_led[0] = (255, 0, 255)
 
-print("Running user code")
-time.sleep(2)
-print("Exiting user code")
+        print("Running user code")
+        time.sleep(2)
+        print("Exiting user code")